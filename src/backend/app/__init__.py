@@ -69,6 +69,12 @@ def create_app(config_class=Config):
         db.create_all()
         _init_default_data()
 
+        # 进程中断遗留的未完成导入标记为 failed，供续传
+        from .services.import_job_service import fail_stale_imports
+        stale_count = fail_stale_imports(config_class.IMPORT_STALE_MINUTES)
+        if stale_count:
+            app.logger.warning(f"{stale_count} 个未完成的导入已中断，标记为 failed")
+
     return app
 
 def _init_default_data():
@@ -100,6 +106,7 @@ def _init_default_data():
     default_configs = [
         ('import.max_file_size', '10', 'number', 'import', '单次导入最大文件大小(MB)', 1),
         ('import.max_rows', '1000', 'number', 'import', '单次导入最大行数', 1),
+        ('import.chunk_size', '1000', 'number', 'import', '分块导入每块行数', 1),
         ('import.duplicate_strategy', 'skip', 'string', 'import', '重复数据处理策略(skip/cover)', 1),
         ('check.standard_hours', '8', 'number', 'check', '标准工作时长(小时)', 1),
         ('check.min_hours', '4', 'number', 'check', '最小工作时长(小时)', 1),
@@ -9,11 +9,23 @@
 5. employees 表增加 employee_status 列（在职/离职，用于跳过离职员工的周报检查与通知）
 6. 创建 notification_logs 表（若不存在）
 7. notification_logs 表增加 content 列（存储消息体）
+8. import_records 表增加 import_status、processed_rows、file_path 列（分块导入进度与续传）
+9. import_records 表增加 error_message 列（后台导入失败原因）
+10. 创建 check_record_details 表，并把 check_records.check_details 中的旧版 JSON 详情拆分迁入
+11. 创建 work_hour_search 全文索引（FTS5 trigram，覆盖项目、姓名、项目经理）及同步触发器，并重建索引；
+    SQLite 不支持 FTS5 trigram 时跳过（不影响其他迁移）
+12. 创建 work_hour_rollups 工时周汇总表，并由现有工时数据生成汇总
+13. import_records 表增加 updated_at 列（判断进程中断后遗留的未完成导入）
+14. work_hour_rollups 改为按单条工时跨度分组（旧版按组内最大跨度），删除后重新生成
+15. work_hour_data 增加 (user_name, start_time) 复合索引（汇总按员工、周重算），
+    以 (project_id, start_time) 复合索引替换 project_id 单列索引（汇总回查日期范围两端的明细）
+16. 创建 work_hour_project_rollups 项目周汇总表（不含员工维度），并由 work_hour_rollups 生成
 
 使用方式：
 - 应用启动时自动调用：由 app.create_app() 调用 run_migrations()
 - 命令行手动执行：python migrate_db.py（带备份）
 """
+import json
 import os
 import shutil
 import sqlite3
@@ -29,6 +41,11 @@ def column_exists(cursor, table, column):
     return any(row[1] == column for row in cursor.fetchall())
 
 
+def index_exists(cursor, name):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name=?", (name,))
+    return cursor.fetchone() is not None
+
+
 def migrate_sys_users(cursor, log):
     if not table_exists(cursor, 'sys_users'):
         return
@@ -157,6 +174,240 @@ def ensure_notification_logs_content_column(cursor, log):
         log("notification_logs 表新增 content 列")
 
 
+def ensure_import_records_columns(cursor, log):
+    """幂等加分块导入进度列（历史记录均为已完成的整表导入，状态默认 success）"""
+    if not table_exists(cursor, 'import_records'):
+        return
+    if not column_exists(cursor, 'import_records', 'import_status'):
+        cursor.execute(
+            "ALTER TABLE import_records ADD COLUMN import_status VARCHAR(20) NOT NULL DEFAULT 'success'"
+        )
+        log("import_records 表新增 import_status 列")
+    if not column_exists(cursor, 'import_records', 'processed_rows'):
+        cursor.execute(
+            "ALTER TABLE import_records ADD COLUMN processed_rows INTEGER NOT NULL DEFAULT 0"
+        )
+        log("import_records 表新增 processed_rows 列")
+    if not column_exists(cursor, 'import_records', 'file_path'):
+        cursor.execute("ALTER TABLE import_records ADD COLUMN file_path VARCHAR(255)")
+        log("import_records 表新增 file_path 列")
+    if not column_exists(cursor, 'import_records', 'error_message'):
+        cursor.execute("ALTER TABLE import_records ADD COLUMN error_message TEXT")
+        log("import_records 表新增 error_message 列")
+    if not column_exists(cursor, 'import_records', 'updated_at'):
+        cursor.execute("ALTER TABLE import_records ADD COLUMN updated_at DATETIME")
+        cursor.execute("UPDATE import_records SET updated_at = created_at")
+        log("import_records 表新增 updated_at 列")
+
+
+def ensure_check_record_details(cursor, log):
+    """创建核对详情明细表（幂等），并把 check_records.check_details 的整块 JSON 拆分为逐条记录"""
+    if not table_exists(cursor, 'check_records'):
+        return
+    if not table_exists(cursor, 'check_record_details'):
+        log("创建 check_record_details 表")
+        cursor.execute("""
+            CREATE TABLE check_record_details (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                check_no VARCHAR(50) NOT NULL,
+                seq INTEGER NOT NULL,
+                user_name VARCHAR(50),
+                issue_type VARCHAR(20),
+                detail TEXT NOT NULL
+            )
+        """)
+        for name, cols in (('check_seq', 'check_no, seq'), ('check_user', 'check_no, user_name'),
+                           ('check_issue', 'check_no, issue_type')):
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_check_record_details_{name} ON check_record_details ({cols})"
+            )
+
+    cursor.execute("SELECT id, check_no, check_details FROM check_records WHERE check_details IS NOT NULL")
+    legacy = cursor.fetchall()
+    for record_id, check_no, raw in legacy:
+        try:
+            items = json.loads(raw) or []
+        except ValueError:
+            items = []
+        cursor.execute("DELETE FROM check_record_details WHERE check_no = ?", (check_no,))
+        cursor.executemany(
+            "INSERT INTO check_record_details (check_no, seq, user_name, issue_type, detail) VALUES (?, ?, ?, ?, ?)",
+            [
+                (check_no, seq, item.get('userName'), item.get('issueType') or item.get('status'),
+                 json.dumps(item))
+                for seq, item in enumerate(items, 1)
+            ]
+        )
+        cursor.execute("UPDATE check_records SET check_details = NULL WHERE id = ?", (record_id,))
+    if legacy:
+        log(f"check_records 旧版详情已迁入 check_record_details: {len(legacy)} 条核对记录")
+
+
+# work_hour_data 子串检索索引：外部内容 FTS5 表，由触发器随增删改同步。
+# 新库由 WorkHourData 建表后的 after_create 事件执行，旧库由 ensure_work_hour_search_index 补建。
+# 部门取值少、子串匹配命中面大，走索引反而比扫描慢，不纳入。
+WORK_HOUR_SEARCH_COLUMNS = ('project_name', 'user_name', 'project_manager')
+_SEARCH_COLS = ', '.join(WORK_HOUR_SEARCH_COLUMNS)
+_SEARCH_NEW = ', '.join(f'new.{c}' for c in WORK_HOUR_SEARCH_COLUMNS)
+_SEARCH_OLD = ', '.join(f'old.{c}' for c in WORK_HOUR_SEARCH_COLUMNS)
+WORK_HOUR_SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS work_hour_search USING fts5(
+        {_SEARCH_COLS}, content='work_hour_data', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS work_hour_search_ai AFTER INSERT ON work_hour_data BEGIN
+        INSERT INTO work_hour_search(rowid, {_SEARCH_COLS}) VALUES (new.id, {_SEARCH_NEW});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS work_hour_search_ad AFTER DELETE ON work_hour_data BEGIN
+        INSERT INTO work_hour_search(work_hour_search, rowid, {_SEARCH_COLS}) VALUES ('delete', old.id, {_SEARCH_OLD});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS work_hour_search_au AFTER UPDATE OF {_SEARCH_COLS} ON work_hour_data BEGIN
+        INSERT INTO work_hour_search(work_hour_search, rowid, {_SEARCH_COLS}) VALUES ('delete', old.id, {_SEARCH_OLD});
+        INSERT INTO work_hour_search(rowid, {_SEARCH_COLS}) VALUES (new.id, {_SEARCH_NEW});
+    END""",
+]
+
+
+def ensure_work_hour_search_index(cursor, log):
+    """
+    创建工时数据子串检索索引及同步触发器（幂等），新建时按现有数据重建索引
+
+    在单独的 SAVEPOINT 中执行：SQLite 未编译 FTS5 或低于 3.34（没有 trigram 分词器）时
+    只回滚本项并跳过，不影响其他迁移，关键字筛选继续使用 LIKE。
+    """
+    if not table_exists(cursor, 'work_hour_data') or table_exists(cursor, 'work_hour_search'):
+        return
+    log("创建 work_hour_search 全文索引")
+    cursor.execute("SAVEPOINT work_hour_search")
+    try:
+        for statement in WORK_HOUR_SEARCH_DDL:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO work_hour_search(work_hour_search) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        cursor.execute("ROLLBACK TO work_hour_search")
+        cursor.execute("RELEASE work_hour_search")
+        log(f"当前 SQLite {sqlite3.sqlite_version} 不支持 FTS5 trigram 索引，跳过 work_hour_search（关键字筛选使用 LIKE）: {e}")
+        return
+    cursor.execute("RELEASE work_hour_search")
+    log("work_hour_search 索引重建完成")
+
+
+# 工时周汇总：按 (ISO 周, 员工, 部门, 项目, 项目经理, 工时类型, 跨度) 聚合，{where} 为空时全量生成。
+# 跨度 span_days 为单条工时结束日期距 week_start 的天数，同组内相同，读取时可逐组判断是否完全落在日期范围内。
+# 迁移全量回填与 rollup_service 按员工/按周重算共用这一条语句。
+WORK_HOUR_ROLLUP_INSERT = """
+    INSERT INTO work_hour_rollups (
+        week_start, user_name, dept_name, project_id, project_name, project_manager, work_type,
+        row_count, work_hours, overtime_hours, span_days
+    )
+    SELECT week_start, user_name, dept_name, project_id, project_name, project_manager, work_type,
+           COUNT(*), SUM(work_hours), SUM(overtime_hours), span_days
+    FROM (
+        SELECT week_start, user_name, dept_name, project_id, project_name, project_manager, work_type,
+               work_hours, overtime_hours,
+               CAST(julianday(end_time) - julianday(week_start) AS INTEGER) AS span_days
+        FROM (
+            SELECT date(start_time, 'weekday 0', '-6 days') AS week_start, user_name, dept_name,
+                   COALESCE(project_id, 0) AS project_id, project_name,
+                   COALESCE(project_manager, '') AS project_manager, work_type,
+                   work_hours, overtime_hours, end_time
+            FROM work_hour_data {where}
+        )
+    )
+    GROUP BY week_start, user_name, dept_name, project_id, project_name, project_manager, work_type, span_days
+"""
+
+
+def ensure_work_hour_rollups(cursor, log):
+    """
+    创建工时周汇总表（幂等），新建时由现有工时数据全量生成
+
+    旧版汇总按组内最大跨度记录 span_days（带 ix_work_hour_rollups_span_days 索引），
+    无法逐组判断日期范围，删除后按当前分组重新生成。
+    """
+    if not table_exists(cursor, 'work_hour_data'):
+        return
+    if table_exists(cursor, 'work_hour_rollups'):
+        if not index_exists(cursor, 'ix_work_hour_rollups_span_days'):
+            return
+        log("work_hour_rollups 改为按工时跨度分组，重新生成")
+        cursor.execute("DROP TABLE work_hour_rollups")
+        cursor.execute("DROP TABLE IF EXISTS work_hour_project_rollups")
+    log("创建 work_hour_rollups 表")
+    cursor.execute("""
+        CREATE TABLE work_hour_rollups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            week_start DATE NOT NULL,
+            user_name VARCHAR(50) NOT NULL,
+            dept_name VARCHAR(50) NOT NULL,
+            project_id INTEGER NOT NULL,
+            project_name VARCHAR(100) NOT NULL,
+            project_manager VARCHAR(50) NOT NULL,
+            work_type VARCHAR(20) NOT NULL,
+            row_count INTEGER NOT NULL,
+            work_hours FLOAT NOT NULL,
+            overtime_hours FLOAT NOT NULL,
+            span_days INTEGER NOT NULL
+        )
+    """)
+    for name, cols in (('user_week', 'user_name, week_start'), ('week_start', 'week_start'),
+                       ('project_week', 'project_id, week_start')):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS ix_work_hour_rollups_{name} ON work_hour_rollups ({cols})")
+    cursor.execute(WORK_HOUR_ROLLUP_INSERT.format(where=''))
+    log(f"work_hour_rollups 汇总生成完成: {cursor.rowcount} 行")
+
+
+# 项目周汇总：由员工周汇总去掉员工、部门、项目经理维度再聚合，{where} 为空时全量生成。
+# 迁移全量回填与 rollup_service 按 (周, 项目) 重算共用这一条语句。
+WORK_HOUR_PROJECT_ROLLUP_INSERT = """
+    INSERT INTO work_hour_project_rollups (
+        week_start, project_id, project_name, work_type, row_count, work_hours, overtime_hours, span_days
+    )
+    SELECT week_start, project_id, project_name, work_type,
+           SUM(row_count), SUM(work_hours), SUM(overtime_hours), span_days
+    FROM work_hour_rollups {where}
+    GROUP BY week_start, project_id, project_name, work_type, span_days
+"""
+
+
+def ensure_work_hour_project_rollups(cursor, log):
+    """创建项目周汇总表（幂等），新建时由 work_hour_rollups 全量生成"""
+    if not table_exists(cursor, 'work_hour_rollups') or table_exists(cursor, 'work_hour_project_rollups'):
+        return
+    log("创建 work_hour_project_rollups 表")
+    cursor.execute("""
+        CREATE TABLE work_hour_project_rollups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            week_start DATE NOT NULL,
+            project_id INTEGER NOT NULL,
+            project_name VARCHAR(100) NOT NULL,
+            work_type VARCHAR(20) NOT NULL,
+            row_count INTEGER NOT NULL,
+            work_hours FLOAT NOT NULL,
+            overtime_hours FLOAT NOT NULL,
+            span_days INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_work_hour_project_rollups_week_start "
+                   "ON work_hour_project_rollups (week_start)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_work_hour_project_rollups_project_week "
+                   "ON work_hour_project_rollups (project_id, week_start)")
+    cursor.execute(WORK_HOUR_PROJECT_ROLLUP_INSERT.format(where=''))
+    log(f"work_hour_project_rollups 汇总生成完成: {cursor.rowcount} 行")
+
+
+def ensure_work_hour_data_range_indexes(cursor, log):
+    """work_hour_data 增加按员工、按项目取日期范围的复合索引（幂等）"""
+    if not table_exists(cursor, 'work_hour_data'):
+        return
+    if not index_exists(cursor, 'ix_work_hour_data_user_start'):
+        log("创建 ix_work_hour_data_user_start 索引")
+        cursor.execute("CREATE INDEX ix_work_hour_data_user_start ON work_hour_data (user_name, start_time)")
+    if not index_exists(cursor, 'ix_work_hour_data_project_start'):
+        log("创建 ix_work_hour_data_project_start 索引")
+        cursor.execute("CREATE INDEX ix_work_hour_data_project_start ON work_hour_data (project_id, start_time)")
+        cursor.execute("DROP INDEX IF EXISTS ix_work_hour_data_project_id")
+
+
 def run_migrations(db_path, backup=False, verbose=False, logger=None):
     """运行所有迁移。幂等。
 
@@ -196,6 +447,12 @@ def run_migrations(db_path, backup=False, verbose=False, logger=None):
         ensure_employees_status_column(cursor, log)
         ensure_notification_logs_table(cursor, log)
         ensure_notification_logs_content_column(cursor, log)
+        ensure_import_records_columns(cursor, log)
+        ensure_check_record_details(cursor, log)
+        ensure_work_hour_search_index(cursor, log)
+        ensure_work_hour_rollups(cursor, log)
+        ensure_work_hour_project_rollups(cursor, log)
+        ensure_work_hour_data_range_indexes(cursor, log)
         conn.commit()
     except Exception:
         conn.rollback()
@@ -5,11 +5,15 @@ from .db import db
 from .user import User
 from .work_hour_data import WorkHourData
 from .import_record import ImportRecord
-from .check_record import CheckRecord
+from .check_record import CheckRecord, CheckRecordDetail
 from .sys_config import SysConfig
 from .employee import Employee
 from .holiday import Holiday
 from .project_budget import ProjectBudget
 from .project import Project
+from .integrity_state import IntegrityUserState, IntegrityCheckCache
+from .work_hour_rollup import WorkHourRollup, WorkHourProjectRollup
+from .data_dict_version import DataDictVersion
 
-__all__ = ['db', 'User', 'WorkHourData', 'ImportRecord', 'CheckRecord', 'SysConfig', 'Employee', 'Holiday', 'ProjectBudget', 'Project']
+__all__ = ['db', 'User', 'WorkHourData', 'ImportRecord', 'CheckRecord', 'CheckRecordDetail', 'SysConfig', 'Employee', 'Holiday', 'ProjectBudget', 'Project',
+           'IntegrityUserState', 'IntegrityCheckCache', 'WorkHourRollup', 'WorkHourProjectRollup', 'DataDictVersion']
@@ -17,7 +17,7 @@ class CheckRecord(db.Model):
     user_name = db.Column(db.String(50), index=True)
     check_config = db.Column(db.Text, nullable=False)  # JSON格式配置
     check_result = db.Column(db.Text, nullable=False)  # JSON格式结果
-    check_details = db.Column(db.Text, nullable=True)  # JSON格式详细列表（可选）
+    check_details = db.Column(db.Text, nullable=True)  # 旧版 JSON 详细列表，现存于 check_record_details
     trigger_type = db.Column(db.String(20), nullable=False, default='manual')  # manual/scheduled/import
     check_user = db.Column(db.String(50), nullable=False)
     check_time = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
@@ -38,3 +38,20 @@ class CheckRecord(db.Model):
             'checkUser': self.check_user,
             'checkTime': self.check_time.isoformat() if self.check_time else None
         }
+
+
+class CheckRecordDetail(db.Model):
+    """核对详情明细表（每条问题/工单一行，按 seq 保持原始顺序，支持分页与筛选）"""
+    __tablename__ = 'check_record_details'
+    __table_args__ = (
+        db.Index('ix_check_record_details_check_seq', 'check_no', 'seq'),
+        db.Index('ix_check_record_details_check_user', 'check_no', 'user_name'),
+        db.Index('ix_check_record_details_check_issue', 'check_no', 'issue_type'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    check_no = db.Column(db.String(50), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    user_name = db.Column(db.String(50))
+    issue_type = db.Column(db.String(20))  # 周报检查：missing/duplicate；工作时长检查：normal/short/excess
+    detail = db.Column(db.Text, nullable=False)  # JSON格式单条详情
@@ -0,0 +1,18 @@
+"""
+数据字典版本号表
+
+数据字典（/data/dict）按 scope 记录各数据来源的版本号，写入方在同一事务内递增：
+- work_hours_insert：导入新增工时
+- work_hours_change：删除工时、覆盖导入（已有的部门/人员/项目名称可能消失）
+- projects：项目增删改（含导入时自动创建、更新项目）
+各 gunicorn worker、后台导入线程与调度进程共享该表，进程内缓存据此判断是否失效。
+"""
+from .db import db
+
+
+class DataDictVersion(db.Model):
+    """数据字典版本号"""
+    __tablename__ = 'data_dict_versions'
+
+    scope = db.Column(db.String(30), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
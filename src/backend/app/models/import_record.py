@@ -22,7 +22,12 @@ class ImportRecord(db.Model):
     report_path = db.Column(db.String(255))
     error_details = db.Column(db.Text)  # JSON格式存储错误详情
     repeat_details = db.Column(db.Text)  # JSON格式存储重复数据详情
+    import_status = db.Column(db.String(20), nullable=False, default='success')  # queued/scanning/importing/success/failed
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)  # 分块导入已提交的行数（续传起点）
+    file_path = db.Column(db.String(255))  # 分块导入未完成时保留的上传文件，完成后清空
+    error_message = db.Column(db.Text)  # 分块/后台导入失败原因
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)  # 每次状态/进度提交时刷新
 
     def to_dict(self):
         """转换为字典"""
@@ -44,5 +49,8 @@ class ImportRecord(db.Model):
             'fileSize': self.file_size,
             'duplicateStrategy': self.duplicate_strategy,
             'errorDetails': self.error_details,
-            'repeatDetails': self.repeat_details
+            'repeatDetails': self.repeat_details,
+            'importStatus': self.import_status,
+            'processedRows': self.processed_rows,
+            'errorMessage': self.error_message
         }
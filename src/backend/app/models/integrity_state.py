@@ -0,0 +1,42 @@
+"""
+完整性检查增量状态表
+
+- integrity_user_states：每个员工已提交工单的覆盖区间（排序合并后的日期段）及版本号；
+  导入新增工时时把新区间并入覆盖段，覆盖已有工时时先标记待重建（digest 置空）、导入结束时重建，
+  删除工时时按受影响员工重建，工单内容有变化才递增 revision
+- integrity_check_cache：按 (员工, 部门, 核对窗口) 缓存的单人检查结果，
+  revision 与员工当前状态一致时直接复用，免去重新加载工单和计算
+"""
+from datetime import datetime
+from .db import db
+
+
+class IntegrityUserState(db.Model):
+    """员工工单覆盖状态"""
+    __tablename__ = 'integrity_user_states'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_name = db.Column(db.String(50), unique=True, nullable=False, index=True)
+    revision = db.Column(db.Integer, nullable=False, default=1)
+    digest = db.Column(db.String(40), nullable=False)      # 工单集合摘要，用于判断是否真的变化；空串表示待重建
+    coverage = db.Column(db.Text, nullable=False)          # JSON：[[起始日期, 结束日期], ...]，升序且互不相邻
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+
+class IntegrityCheckCache(db.Model):
+    """单人完整性检查结果缓存"""
+    __tablename__ = 'integrity_check_cache'
+    __table_args__ = (
+        db.UniqueConstraint('user_name', 'dept_name', 'window_key', name='uq_integrity_cache_user_window'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_name = db.Column(db.String(50), nullable=False)
+    dept_name = db.Column(db.String(50), nullable=False, default='')
+    window_key = db.Column(db.String(40), nullable=False, index=True)  # 核对区间+工作日+部门过滤+节假日的摘要
+    revision = db.Column(db.Integer, nullable=False)
+    missing_days = db.Column(db.Integer, nullable=False, default=0)
+    duplicate_days = db.Column(db.Integer, nullable=False, default=0)
+    details = db.Column(db.Text, nullable=False)          # JSON 格式单人详情
+    checked_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
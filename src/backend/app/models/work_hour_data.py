@@ -1,12 +1,35 @@
 """
 工时数据主表
 """
+import logging
+import re
 from datetime import datetime, date
+from sqlalchemy import event, select, text, table, column
+from sqlalchemy.exc import DBAPIError
 from .db import db
+from app.migrations import WORK_HOUR_SEARCH_COLUMNS, WORK_HOUR_SEARCH_DDL
+
+logger = logging.getLogger(__name__)
+
+# trigram 分词：关键字含连续 SEARCH_INDEX_MIN_CHARS 个以上非通配符字符时才走索引
+# （更短的片段 FTS5 不返回结果，只能扫描）
+SEARCH_INDEX_MIN_CHARS = 3
+_SEARCHABLE = re.compile(rf'[^%_]{{{SEARCH_INDEX_MIN_CHARS}}}')
+
+# 子串检索索引（FTS5 虚拟表，不由 db.create_all() 管理）
+work_hour_search = table('work_hour_search', column('rowid'), *[column(c) for c in WORK_HOUR_SEARCH_COLUMNS])
+
+# 各数据库的索引是否可用（按连接地址缓存）
+_search_index_ready = {}
+
 
 class WorkHourData(db.Model):
     """工时数据主表"""
     __tablename__ = 'work_hour_data'
+    __table_args__ = (
+        db.Index('ix_work_hour_data_user_start', 'user_name', 'start_time'),  # 按员工、日期范围取工时
+        db.Index('ix_work_hour_data_project_start', 'project_id', 'start_time'),  # 按项目、日期范围取工时
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
 
@@ -29,7 +52,7 @@ class WorkHourData(db.Model):
     # 系统扩展字段
     import_batch_no = db.Column(db.String(50), nullable=False, index=True)
     import_time = db.Column(db.DateTime, nullable=False, default=datetime.now)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=True, index=True)  # 关联项目表
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=True)  # 关联项目表
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
@@ -67,3 +90,53 @@ class WorkHourData(db.Model):
             'approvalStatus': self.approval_status,
             'importTime': import_time_str
         }
+
+    @classmethod
+    def search_filter(cls, field, keyword):
+        """
+        按子串匹配 field 的过滤条件
+
+        LIKE '%关键字%' 用不上 B-tree 索引。field 在检索索引中、关键字含连续
+        SEARCH_INDEX_MIN_CHARS 个以上非通配符字符且当前库建有索引时，改为在
+        work_hour_search trigram 索引中匹配再按 id 回表，其余情况（含 SQLite 不支持
+        FTS5 trigram 而未建索引）仍用 LIKE；两者语义一致（不区分 ASCII 大小写，%、_ 仍为通配符）。
+
+        索引对选择性高的关键字有效；命中大部分行的宽泛关键字回表代价高，会比扫描慢。
+        同步触发器使批量写入工时的耗时约增加一倍。
+        """
+        pattern = f'%{keyword}%'
+        if field not in WORK_HOUR_SEARCH_COLUMNS or not _SEARCHABLE.search(keyword) \
+                or not _search_index_available():
+            return getattr(cls, field).like(pattern)
+        return cls.id.in_(
+            select(work_hour_search.c.rowid).where(work_hour_search.c[field].like(pattern))
+        )
+
+
+def _search_index_available():
+    url = str(db.engine.url)
+    if url not in _search_index_ready:
+        _search_index_ready[url] = db.engine.dialect.name == 'sqlite' and db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='work_hour_search'")
+        ).first() is not None
+    return _search_index_ready[url]
+
+
+@event.listens_for(WorkHourData.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    """
+    新建 work_hour_data 时一并创建子串检索索引及同步触发器（仅 SQLite）
+
+    SQLite 不支持 FTS5 trigram 时回滚到 SAVEPOINT 并跳过，建表照常完成，关键字筛选使用 LIKE。
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    savepoint = connection.begin_nested()
+    try:
+        for statement in WORK_HOUR_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+    except DBAPIError as e:
+        savepoint.rollback()
+        logger.warning(f"当前 SQLite 不支持 FTS5 trigram 索引，关键字筛选使用 LIKE: {e.orig}")
+        return
+    savepoint.commit()
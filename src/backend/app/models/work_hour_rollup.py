@@ -0,0 +1,48 @@
+"""
+工时周汇总表
+
+按 (ISO 周, 员工, 部门, 项目, 项目经理, 工时类型, 跨度) 预聚合工时记录数与工时合计，
+导入/删除工时时按受影响的 (员工, 周) 重算。项目统计、预算统计与查询汇总从这里读取，不再扫描明细表。
+项目周汇总再去掉员工维度，只按项目、工时类型统计时读取，行数随项目数与周数增长。
+"""
+from .db import db
+
+
+class WorkHourRollup(db.Model):
+    """工时周汇总"""
+    __tablename__ = 'work_hour_rollups'
+    __table_args__ = (
+        db.Index('ix_work_hour_rollups_project_week', 'project_id', 'week_start'),
+        db.Index('ix_work_hour_rollups_user_week', 'user_name', 'week_start'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    week_start = db.Column(db.Date, nullable=False, index=True)       # 工时开始日期所在 ISO 周的周一
+    user_name = db.Column(db.String(50), nullable=False)
+    dept_name = db.Column(db.String(50), nullable=False)
+    project_id = db.Column(db.Integer, nullable=False, default=0)     # 未关联项目为 0
+    project_name = db.Column(db.String(100), nullable=False)
+    project_manager = db.Column(db.String(50), nullable=False, default='')
+    work_type = db.Column(db.String(20), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    work_hours = db.Column(db.Float, nullable=False, default=0)
+    overtime_hours = db.Column(db.Float, nullable=False, default=0)
+    span_days = db.Column(db.Integer, nullable=False, default=0)  # 工时结束日期距 week_start 的天数（同组相同）
+
+
+class WorkHourProjectRollup(db.Model):
+    """工时项目周汇总（由工时周汇总按 (周, 项目, 工时类型, 跨度) 再聚合）"""
+    __tablename__ = 'work_hour_project_rollups'
+    __table_args__ = (
+        db.Index('ix_work_hour_project_rollups_project_week', 'project_id', 'week_start'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    week_start = db.Column(db.Date, nullable=False, index=True)
+    project_id = db.Column(db.Integer, nullable=False, default=0)     # 未关联项目为 0
+    project_name = db.Column(db.String(100), nullable=False)
+    work_type = db.Column(db.String(20), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    work_hours = db.Column(db.Float, nullable=False, default=0)
+    overtime_hours = db.Column(db.Float, nullable=False, default=0)
+    span_days = db.Column(db.Integer, nullable=False, default=0)
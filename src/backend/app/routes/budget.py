@@ -5,45 +5,41 @@ from flask import Blueprint, request
 from app.models.db import db
 from app.models.employee import Employee
 from app.models.project_budget import ProjectBudget
-from app.models.work_hour_data import WorkHourData
 from app.utils.response import success_response, error_response, paginated_response
 from app.utils.jwt_utils import auth_required
 from app.utils.helpers import calculate_date_range
-from sqlalchemy import func, and_
+from app.services.rollup_service import rollup_source
+from sqlalchemy import func, and_, or_
 from decimal import Decimal
 from datetime import datetime
+from itertools import groupby
 
 budget_bp = Blueprint('budget', __name__)
 
 
-def _apply_date_range_filter(query, start_date_str, end_date_str):
-    """为工时查询应用时间范围过滤（完全包含逻辑）
+def _parse_date_range(start_date_str, end_date_str):
+    """解析统计时间范围（完全包含逻辑：工时开始、结束日期都在范围内）
 
     参数:
-        query: SQLAlchemy Query 对象
         start_date_str: 开始日期字符串 (YYYY-MM-DD) 或空字符串
         end_date_str: 结束日期字符串 (YYYY-MM-DD) 或空字符串
 
     返回:
-        (query, error_response): 过滤后的查询对象；若校验失败第二个元素为错误响应
+        (start, end, error_response): 未指定范围时 start/end 为 None；若校验失败第三个元素为错误响应
     """
     start_date_str = (start_date_str or '').strip()
     end_date_str = (end_date_str or '').strip()
 
     if not start_date_str and not end_date_str:
-        return query, None
+        return None, None, None
 
     is_valid, error_msg, *_ = calculate_date_range(start_date_str, end_date_str)
     if not is_valid:
-        return None, error_response(4001, error_msg, http_status=400)
+        return None, None, error_response(4001, error_msg, http_status=400)
 
     start = datetime.strptime(start_date_str, '%Y-%m-%d').date()
     end = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-    query = query.filter(
-        WorkHourData.start_time >= start,
-        WorkHourData.end_time <= end
-    )
-    return query, None
+    return start, end, None
 
 
 # ==================== 员工角色管理 ====================
@@ -348,34 +344,34 @@ def get_statistics_summary():
 
         total_budget_hours = float(budget_result[0]) if budget_result and budget_result[0] else 0
 
-        # 构建实际工时查询（含加班时长）
-        work_hours_query = db.session.query(
-            func.sum(WorkHourData.work_hours),
-            func.sum(WorkHourData.overtime_hours)
-        )
-
         # 直接按 work_type 统计（不再关联员工表）
         work_type_list = ['project_delivery', 'product_research', 'presales_support']
-        work_hours_query = work_hours_query.filter(
-            WorkHourData.work_type.in_(work_type_list)
-        )
 
-        # 按项目筛选
+        # 按项目筛选：通过 project_code 找到项目，使用 project_id 进行关联
+        project_id = None
         if project_code:
-            # 通过 project_code 找到项目，使用 project_id 进行关联
             from app.models.project import Project
             project = Project.query.filter_by(project_code=project_code).first()
             if project:
-                work_hours_query = work_hours_query.filter(
-                    WorkHourData.project_id == project.id
-                )
+                project_id = project.id
 
         # 按时间范围筛选
-        work_hours_query, error = _apply_date_range_filter(work_hours_query, start_date, end_date)
+        start, end, error = _parse_date_range(start_date, end_date)
         if error:
             return error
 
-        actual_result = work_hours_query.first()
+        def criteria(c):
+            conditions = [c.work_type.in_(work_type_list)]
+            if project_id:
+                conditions.append(c.project_id == project_id)
+            return conditions
+
+        # 实际工时（含加班时长），读项目周汇总
+        source = rollup_source(criteria, start, end, by_user=False)
+        actual_result = db.session.query(
+            func.sum(source.c.work_hours),
+            func.sum(source.c.overtime_hours)
+        ).first()
         total_work = float(actual_result[0]) if actual_result and actual_result[0] else 0
         total_overtime = float(actual_result[1]) if actual_result and actual_result[1] else 0
         # 转换为"人天"（1人天 = 8小时），实际工时含加班
@@ -426,55 +422,58 @@ def get_statistics_by_project():
         projects = Project.query.filter(Project.project_code.in_(project_codes)).all()
         project_map = {p.project_code: p for p in projects}
 
+        start, end, error = _parse_date_range(start_date, end_date)
+        if error:
+            return error
+
+        # 根据预算类型确定对应的员工角色；该角色没有员工时不按角色筛选（统计项目全部交付工时）
+        budget_type_to_role = {
+            'project_manager': 'project_manager',
+            'data_collection': 'data_collection',
+            'software_dev': 'software_dev'
+        }
+        existing_roles = {row[0] for row in db.session.query(Employee.role).distinct()}
+
+        # 一次聚合全部预算涉及项目的项目交付工时（含加班），按 (项目ID, 项目名称, 员工角色) 分组：
+        # 关联到项目的预算按 project_id 匹配，找不到项目的按 project_name 匹配（兜底逻辑）
+        project_ids = [p.id for p in projects]
+        fallback_names = [b.project_name for b in budgets if b.project_code not in project_map]
+
+        def criteria(c):
+            return [
+                c.work_type == 'project_delivery',
+                or_(c.project_id.in_(project_ids), c.project_name.in_(fallback_names))
+            ]
+
+        source = rollup_source(criteria, start, end)
+        grouped = db.session.query(
+            source.c.project_id,
+            source.c.project_name,
+            Employee.role,
+            func.sum(source.c.work_hours),
+            func.sum(source.c.overtime_hours)
+        ).outerjoin(
+            Employee, Employee.employee_name == source.c.user_name
+        ).group_by(
+            source.c.project_id, source.c.project_name, Employee.role
+        ).all()
+
         for budget in budgets:
-            # 根据预算类型确定对应的员工角色
-            budget_type_to_role = {
-                'project_manager': 'project_manager',
-                'data_collection': 'data_collection',
-                'software_dev': 'software_dev'
-            }
             target_role = budget_type_to_role.get(budget.budget_type)
-
-            # 查询该角色的所有员工姓名
-            employee_names = []
-            if target_role:
-                role_employees = Employee.query.filter_by(role=target_role).all()
-                employee_names = [emp.employee_name for emp in role_employees]
-
-            # 查询实际工时（含加班）：根据员工角色统计项目交付工时
-            actual_hours_query = db.session.query(
-                func.sum(WorkHourData.work_hours),
-                func.sum(WorkHourData.overtime_hours)
-            ).filter(
-                WorkHourData.work_type == 'project_delivery'
-            )
-
-            # 按员工角色筛选
-            if employee_names:
-                actual_hours_query = actual_hours_query.filter(
-                    WorkHourData.user_name.in_(employee_names)
-                )
-
-            # 通过 project_code 找到对应的 project，使用 project_id 筛选
-            if budget.project_code in project_map:
-                project = project_map[budget.project_code]
-                actual_hours_query = actual_hours_query.filter(
-                    WorkHourData.project_id == project.id
-                )
-            else:
-                # 如果找不到项目，通过 project_name 匹配（兜底逻辑）
-                actual_hours_query = actual_hours_query.filter(
-                    WorkHourData.project_name == budget.project_name
-                )
-
-            # 按时间范围筛选
-            actual_hours_query, error = _apply_date_range_filter(actual_hours_query, start_date, end_date)
-            if error:
-                return error
-
-            actual_result = actual_hours_query.first()
-            work_sum = float(actual_result[0]) if actual_result and actual_result[0] else 0
-            overtime_sum = float(actual_result[1]) if actual_result and actual_result[1] else 0
+            role_filter = target_role if target_role in existing_roles else None
+            project = project_map.get(budget.project_code)
+
+            work_sum = 0
+            overtime_sum = 0
+            for project_id, project_name, role, hours, overtime in grouped:
+                if project is not None and project_id != project.id:
+                    continue
+                if project is None and project_name != budget.project_name:
+                    continue
+                if role_filter and role != role_filter:
+                    continue
+                work_sum += float(hours or 0)
+                overtime_sum += float(overtime or 0)
             # 转换为"人天"（1人天 = 8小时），实际工时含加班
             actual_hours = (work_sum + overtime_sum) / 8
             overtime_hours = overtime_sum / 8
@@ -510,16 +509,26 @@ def get_statistics_by_employee():
         start_date = request.args.get('startDate', '')
         end_date = request.args.get('endDate', '')
 
-        # 构建员工查询：统计所有有项目交付工时记录的员工
-        subquery = db.session.query(
-            WorkHourData.user_name
-        ).filter(
-            WorkHourData.work_type == 'project_delivery'
-        ).distinct().subquery()
+        # 获取项目信息（用于筛选）
+        project = None
+        if project_code:
+            from app.models.project import Project
+            project = Project.query.filter_by(project_code=project_code).first()
+
+        start, end, error = _parse_date_range(start_date, end_date)
+        if error:
+            return error
 
-        employee_query = Employee.query.filter(
-            Employee.employee_name.in_(subquery)
-        )
+        # 项目交付工时（含加班），按项目筛选
+        def criteria(c):
+            conditions = [c.work_type == 'project_delivery']
+            if project:
+                conditions.append(c.project_id == project.id)
+            return conditions
+
+        # 一次按 (员工, 项目) 分组统计，关联员工表（角色筛选放在关联条件上）
+        source = rollup_source(criteria, start, end)
+        join_on = Employee.employee_name == source.c.user_name
 
         # 如果指定了角色筛选，直接按员工角色筛选
         if role:
@@ -531,80 +540,45 @@ def get_statistics_by_employee():
             }
             target_role = role_map.get(role)
             if target_role:
-                employee_query = employee_query.filter(Employee.role == target_role)
-
-        employees = employee_query.all()
+                join_on = and_(join_on, Employee.role == target_role)
+
+        grouped = db.session.query(
+            Employee.id,
+            source.c.project_name,
+            func.sum(source.c.work_hours),
+            func.sum(source.c.overtime_hours)
+        ).join(
+            source, join_on
+        ).group_by(
+            Employee.id, source.c.project_name
+        ).order_by(
+            Employee.id, source.c.project_name
+        ).all()
+
+        employee_ids = sorted({row[0] for row in grouped})
+        employees = {e.id: e for e in Employee.query.filter(Employee.id.in_(employee_ids))}
 
         result = []
-
-        # 获取项目信息（用于筛选）
-        project = None
-        if project_code:
-            from app.models.project import Project
-            project = Project.query.filter_by(project_code=project_code).first()
-
-        for employee in employees:
-            # 查询该员工的实际工时（含加班，项目交付类型）
-            work_hours_query = db.session.query(
-                func.sum(WorkHourData.work_hours),
-                func.sum(WorkHourData.overtime_hours)
-            ).filter(
-                WorkHourData.user_name == employee.employee_name,
-                WorkHourData.work_type == 'project_delivery'
-            )
-
-            # 按项目筛选
-            if project:
-                work_hours_query = work_hours_query.filter(
-                    WorkHourData.project_id == project.id
-                )
-
-            # 按时间范围筛选
-            work_hours_query, error = _apply_date_range_filter(work_hours_query, start_date, end_date)
-            if error:
-                return error
-
-            work_hours_result = work_hours_query.first()
-            work_sum = float(work_hours_result[0]) if work_hours_result and work_hours_result[0] else 0
-            overtime_sum = float(work_hours_result[1]) if work_hours_result and work_hours_result[1] else 0
+        for employee_id, rows in groupby(grouped, key=lambda row: row[0]):
+            employee = employees[employee_id]
+            work_sum = 0
+            overtime_sum = 0
+            # 该员工在各项目的工时分布（含加班）
+            projects = []
+            for _, project_name, hours, overtime in rows:
+                hours = float(hours or 0)
+                overtime = float(overtime or 0)
+                work_sum += hours
+                overtime_sum += overtime
+                projects.append({
+                    'projectName': project_name,
+                    'hours': round((hours + overtime) / 8, 2),
+                    'overtimeHours': round(overtime / 8, 2)
+                })
             # 转换为"人天"（1人天 = 8小时），实际工时含加班
             total_hours = (work_sum + overtime_sum) / 8
             overtime_hours = overtime_sum / 8
 
-            # 查询该员工在各项目的工时分布（含加班）
-            project_distribution = db.session.query(
-                WorkHourData.project_name,
-                func.sum(WorkHourData.work_hours).label('hours'),
-                func.sum(WorkHourData.overtime_hours).label('overtime')
-            ).filter(
-                WorkHourData.user_name == employee.employee_name,
-                WorkHourData.work_type == 'project_delivery'
-            )
-
-            # 应用项目筛选
-            if project:
-                project_distribution = project_distribution.filter(
-                    WorkHourData.project_id == project.id
-                )
-
-            # 应用时间范围筛选
-            project_distribution, error = _apply_date_range_filter(project_distribution, start_date, end_date)
-            if error:
-                return error
-
-            project_distribution = project_distribution.group_by(
-                WorkHourData.project_name
-            ).all()
-
-            projects = [
-                {
-                    'projectName': item[0],
-                    'hours': round((float(item[1]) + float(item[2])) / 8, 2),
-                    'overtimeHours': round(float(item[2]) / 8, 2)
-                }
-                for item in project_distribution
-            ]
-
             # 只添加工时大于0的员工
             if total_hours > 0:
                 result.append({
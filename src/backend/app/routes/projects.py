@@ -5,6 +5,8 @@ from flask import Blueprint, request
 from app.models.db import db
 from app.models.project import Project
 from app.models.work_hour_data import WorkHourData
+from app.models.work_hour_rollup import WorkHourProjectRollup
+from app.services.dict_service import bump_dict_versions, PROJECTS
 from app.utils.response import success_response, error_response
 from app.utils.jwt_utils import auth_required
 from sqlalchemy import func
@@ -60,12 +62,12 @@ def get_project_detail(project_id):
         if not project:
             return error_response(3001, '项目不存在', http_status=404)
 
-        # 获取项目统计信息
+        # 获取项目统计信息（读项目周汇总）
         stats = db.session.query(
-            func.sum(WorkHourData.work_hours).label('total_hours'),
-            func.sum(WorkHourData.overtime_hours).label('total_overtime'),
-            func.count(WorkHourData.id).label('record_count')
-        ).filter(WorkHourData.project_id == project_id).first()
+            func.sum(WorkHourProjectRollup.work_hours).label('total_hours'),
+            func.sum(WorkHourProjectRollup.overtime_hours).label('total_overtime'),
+            func.sum(WorkHourProjectRollup.row_count).label('record_count')
+        ).filter(WorkHourProjectRollup.project_id == project_id).first()
 
         data = project.to_dict()
         data['stats'] = {
@@ -112,6 +114,7 @@ def create_project():
         )
 
         db.session.add(project)
+        bump_dict_versions(PROJECTS)
         db.session.commit()
 
         return success_response(data=project.to_dict(), message='创建成功')
@@ -140,6 +143,7 @@ def update_project(project_id):
         if 'status' in data:
             project.status = data['status']
 
+        bump_dict_versions(PROJECTS)
         db.session.commit()
 
         return success_response(data=project.to_dict(), message='更新成功')
@@ -164,6 +168,7 @@ def delete_project(project_id):
             return error_response(1003, f'该项目有{record_count}条工时记录，无法删除', http_status=400)
 
         db.session.delete(project)
+        bump_dict_versions(PROJECTS)
         db.session.commit()
 
         return success_response(message='删除成功')
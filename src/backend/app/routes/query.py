@@ -1,17 +1,23 @@
 """
 工时查询路由
 """
-from flask import Blueprint, request, send_file
+from flask import Blueprint, request, send_file, Response, stream_with_context
 from sqlalchemy import func
 from app.models.db import db
 from app.models.work_hour_data import WorkHourData
 from app.models.import_record import ImportRecord
 from app.utils.response import success_response, error_response, paginated_response
-from app.utils.helpers import calculate_date_range
+from app.utils.helpers import calculate_date_range, keyset_paginate
 from app.utils.jwt_utils import auth_required
-import pandas as pd
+from app.services.check_service import refresh_user_states
+from app.services.rollup_service import refresh_rollup_weeks, rollup_source, keyword_filter
+from app.services.dict_service import bump_dict_versions, WORK_HOURS_CHANGE
+from app.services.query_export_service import iter_export_rows, write_xlsx_export, stream_csv_export
+from app.services.report_service import REPORT_FORMATS
 from datetime import datetime
-from io import BytesIO
+from urllib.parse import quote
+import hashlib
+import json
 import os
 
 query_bp = Blueprint('query', __name__)
@@ -35,6 +41,91 @@ def _refresh_import_record_stats(batch_nos):
             rec.success_rows = cnt
 
 
+def _filter_key(*filters):
+    """筛选条件摘要：只随筛选条件变化，翻页、排序不影响"""
+    return hashlib.sha1(json.dumps(filters, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def _parse_date_range(start_date, end_date):
+    """校验并解析查询日期范围，未同时给出起止日期时返回 (None, None)"""
+    if not (start_date and end_date):
+        return None, None
+    is_valid, error_msg, *_ = calculate_date_range(start_date, end_date)
+    if not is_valid:
+        raise ValueError(error_msg)
+    return datetime.strptime(start_date, '%Y-%m-%d').date(), datetime.strptime(end_date, '%Y-%m-%d').date()
+
+
+def _filtered_query(criteria, start, end):
+    """明细查询：criteria 作用于明细表，日期按完全包含逻辑（开始、结束时间都在范围内）"""
+    query = WorkHourData.query.filter(*criteria(WorkHourData.__table__.c))
+    if start:
+        query = query.filter(WorkHourData.start_time >= start, WorkHourData.end_time <= end)
+    return query
+
+
+def _paginate_with_summary(criteria, start, end, page, size, sort_by, sort_order, group_field, filter_key):
+    """
+    排序、分页并统计汇总
+
+    汇总（条数、工时合计、去重项目/部门数、人数）从工时周汇总表读取（范围两端的周回查明细），
+    条数直接作为分页总数，不再单独 COUNT。请求带上与当前筛选一致的 filterKey 和上次返回的
+    total 时（仅翻页），跳过汇总统计，返回的 stats 为 None。
+
+    请求带 cursor 参数（第一页传空串）时改用游标分页：按 (排序列, id) 定位，不用 OFFSET，
+    返回 nextCursor；total 为首次查询时的条数，翻页期间数据变化时可能不精确。
+
+    返回: (page_data, stats)
+    """
+    total = request.args.get('total', type=int)
+    skip_summary = request.args.get('filterKey') == filter_key and total is not None and total >= 0
+    stats = None
+    if not skip_summary:
+        source = rollup_source(criteria, start, end)
+        stats = db.session.query(
+            func.coalesce(func.sum(source.c.row_count), 0).label('total'),
+            func.sum(source.c.work_hours).label('total_work_hours'),
+            func.sum(source.c.overtime_hours).label('total_overtime_hours'),
+            func.count(func.distinct(source.c[group_field])).label('group_count'),
+            func.count(func.distinct(source.c.user_name)).label('user_count')
+        ).first()
+        total = stats.total
+
+    query = _filtered_query(criteria, start, end)
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        order_col = getattr(WorkHourData, sort_by) if sort_by in WorkHourData.__table__.columns \
+            else WorkHourData.start_time
+        items, next_cursor = keyset_paginate(
+            query, order_col, WorkHourData.id, sort_order == 'desc', cursor, size
+        )
+        return {
+            'list': [item.to_dict() for item in items],
+            'size': size,
+            'nextCursor': next_cursor,
+            'total': total
+        }, stats
+
+    # 排序
+    order_col = getattr(WorkHourData, sort_by, WorkHourData.start_time)
+    if sort_order == 'desc':
+        query = query.order_by(order_col.desc())
+    else:
+        query = query.order_by(order_col.asc())
+
+    # 分页（总数复用汇总结果）
+    pagination = query.paginate(page=page, per_page=size, error_out=False, count=False)
+    pagination.total = total
+    return {
+        'list': [item.to_dict() for item in pagination.items],
+        'total': pagination.total,
+        'page': page,
+        'size': size,
+        'totalPages': pagination.pages
+    }, stats
+
+
 @query_bp.route('/query/project', methods=['GET'])
 def query_by_project():
     """按项目维度查询工时数据"""
@@ -50,74 +141,37 @@ def query_by_project():
         sort_by = request.args.get('sortBy', 'start_time')
         sort_order = request.args.get('sortOrder', 'desc')
 
-        # 构建查询
-        query = WorkHourData.query
-
-        # 只查询项目交付和产品研发类工时
-        query = query.filter(WorkHourData.work_type.in_(['project_delivery', 'product_research']))
-
-        if project_name:
-            query = query.filter(WorkHourData.project_name.like(f'%{project_name}%'))
-
-        if project_manager:
-            query = query.filter(WorkHourData.project_manager.like(f'%{project_manager}%'))
-
-        if user_name:
-            query = query.filter(WorkHourData.user_name.like(f'%{user_name}%'))
-
-        if start_date and end_date:
-            # 验证日期范围
-            is_valid, error_msg, *_ = calculate_date_range(start_date, end_date)
-            if not is_valid:
-                return error_response(4001, error_msg), 400
-
-            start = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end = datetime.strptime(end_date, '%Y-%m-%d').date()
-            # 完全包含逻辑：工时记录的开始时间和结束时间都必须在查询范围内
-            query = query.filter(WorkHourData.start_time >= start, WorkHourData.end_time <= end)
-
-        # 计算统计数据（在分页前）
-        stats = query.with_entities(
-            func.count(WorkHourData.id).label('total'),
-            func.sum(WorkHourData.work_hours).label('total_work_hours'),
-            func.sum(WorkHourData.overtime_hours).label('total_overtime_hours')
-        ).first()
-
-        # 统计项目数和人员数
-        project_count = query.with_entities(
-            func.count(func.distinct(WorkHourData.project_name))
-        ).scalar()
-
-        user_count = query.with_entities(
-            func.count(func.distinct(WorkHourData.user_name))
-        ).scalar()
-
-        # 排序
-        order_col = getattr(WorkHourData, sort_by, WorkHourData.start_time)
-        if sort_order == 'desc':
-            query = query.order_by(order_col.desc())
-        else:
-            query = query.order_by(order_col.asc())
-
-        # 分页
-        pagination = query.paginate(page=page, per_page=size, error_out=False)
-
-        data_list = [item.to_dict() for item in pagination.items]
+        start, end = _parse_date_range(start_date, end_date)
+
+        def criteria(c):
+            # 只查询项目交付和产品研发类工时
+            conditions = [c.work_type.in_(['project_delivery', 'product_research'])]
+            if project_name:
+                conditions.append(keyword_filter(c, 'project_name', project_name))
+            if project_manager:
+                conditions.append(keyword_filter(c, 'project_manager', project_manager))
+            if user_name:
+                conditions.append(keyword_filter(c, 'user_name', user_name))
+            return conditions
+
+        # 汇总统计 + 分页（翻页时可跳过汇总）
+        filter_key = _filter_key('project', project_name, project_manager, user_name, start_date, end_date)
+        page_data, stats = _paginate_with_summary(
+            criteria, start, end, page, size, sort_by, sort_order, 'project_name', filter_key
+        )
 
-        return success_response(data={
-            'list': data_list,
-            'total': pagination.total,
-            'page': page,
-            'size': size,
-            'totalPages': pagination.pages,
+        return success_response(data=dict(page_data, **{
+            'filterKey': filter_key,
             'summary': {
-                'projectCount': project_count or 0,
-                'userCount': user_count or 0,
+                'projectCount': stats.group_count or 0,
+                'userCount': stats.user_count or 0,
                 'totalWorkHours': float(stats.total_work_hours or 0),
                 'totalOvertimeHours': float(stats.total_overtime_hours or 0)
-            }
-        })
+            } if stats else None
+        }))
 
+    except ValueError as e:
+        return error_response(4001, str(e), http_status=400)
     except Exception as e:
         return error_response(500, str(e), http_status=500)
 
@@ -137,100 +191,68 @@ def query_by_organization():
         sort_by = request.args.get('sortBy', 'start_time')
         sort_order = request.args.get('sortOrder', 'desc')
 
-        # 构建查询
-        query = WorkHourData.query
-
-        if dept_name:
-            query = query.filter(WorkHourData.dept_name.like(f'%{dept_name}%'))
-
-        if user_name:
-            query = query.filter(WorkHourData.user_name.like(f'%{user_name}%'))
-
-        if project_name:
-            query = query.filter(WorkHourData.project_name.like(f'%{project_name}%'))
-
-        if start_date and end_date:
-            # 验证日期范围
-            is_valid, error_msg, *_ = calculate_date_range(start_date, end_date)
-            if not is_valid:
-                return error_response(4001, error_msg), 400
-
-            start = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end = datetime.strptime(end_date, '%Y-%m-%d').date()
-            # 完全包含逻辑：工时记录的开始时间和结束时间都必须在查询范围内
-            query = query.filter(WorkHourData.start_time >= start, WorkHourData.end_time <= end)
-
-        # 计算统计数据（在分页前）
-        stats = query.with_entities(
-            func.count(WorkHourData.id).label('total'),
-            func.sum(WorkHourData.work_hours).label('total_work_hours'),
-            func.sum(WorkHourData.overtime_hours).label('total_overtime_hours')
-        ).first()
-
-        # 统计部门数和人员数
-        dept_count = query.with_entities(
-            func.count(func.distinct(WorkHourData.dept_name))
-        ).scalar()
-
-        user_count = query.with_entities(
-            func.count(func.distinct(WorkHourData.user_name))
-        ).scalar()
-
-        # 排序
-        order_col = getattr(WorkHourData, sort_by, WorkHourData.start_time)
-        if sort_order == 'desc':
-            query = query.order_by(order_col.desc())
-        else:
-            query = query.order_by(order_col.asc())
-
-        # 分页
-        pagination = query.paginate(page=page, per_page=size, error_out=False)
-
-        data_list = [item.to_dict() for item in pagination.items]
+        start, end = _parse_date_range(start_date, end_date)
+
+        def criteria(c):
+            conditions = []
+            if dept_name:
+                conditions.append(keyword_filter(c, 'dept_name', dept_name))
+            if user_name:
+                conditions.append(keyword_filter(c, 'user_name', user_name))
+            if project_name:
+                conditions.append(keyword_filter(c, 'project_name', project_name))
+            return conditions
+
+        # 汇总统计 + 分页（翻页时可跳过汇总）
+        filter_key = _filter_key('organization', dept_name, user_name, project_name, start_date, end_date)
+        page_data, stats = _paginate_with_summary(
+            criteria, start, end, page, size, sort_by, sort_order, 'dept_name', filter_key
+        )
 
-        return success_response(data={
-            'list': data_list,
-            'total': pagination.total,
-            'page': page,
-            'size': size,
-            'totalPages': pagination.pages,
+        return success_response(data=dict(page_data, **{
+            'filterKey': filter_key,
             'summary': {
-                'deptCount': dept_count or 0,
-                'userCount': user_count or 0,
+                'deptCount': stats.group_count or 0,
+                'userCount': stats.user_count or 0,
                 'totalWorkHours': float(stats.total_work_hours or 0),
                 'totalOvertimeHours': float(stats.total_overtime_hours or 0)
-            }
-        })
+            } if stats else None
+        }))
 
+    except ValueError as e:
+        return error_response(4001, str(e), http_status=400)
     except Exception as e:
         return error_response(500, str(e), http_status=500)
 
 
 @query_bp.route('/query/export', methods=['POST'])
 def export_query_result():
-    """导出查询结果为Excel"""
+    """导出查询结果（format=xlsx/csv，默认 xlsx）"""
     try:
         data = request.get_json()
         query_type = data.get('queryType')  # 'project' or 'organization'
         filters = data.get('filters', {})
+        fmt = (data.get('format') or request.args.get('format') or 'xlsx').lower()
+        if fmt not in REPORT_FORMATS:
+            return error_response(4001, '导出格式仅支持 xlsx、csv', http_status=400)
 
-        # 构建查询
+        # 构建查询（关键字条件与分页查询一致，走子串检索索引）
         query = WorkHourData.query
 
         if query_type == 'project':
             if filters.get('projectName'):
-                query = query.filter(WorkHourData.project_name.like(f"%{filters['projectName']}%"))
+                query = query.filter(WorkHourData.search_filter('project_name', filters['projectName']))
             if filters.get('projectManager'):
-                query = query.filter(WorkHourData.project_manager.like(f"%{filters['projectManager']}%"))
+                query = query.filter(WorkHourData.search_filter('project_manager', filters['projectManager']))
             if filters.get('userName'):
-                query = query.filter(WorkHourData.user_name.like(f"%{filters['userName']}%"))
+                query = query.filter(WorkHourData.search_filter('user_name', filters['userName']))
         else:  # organization
             if filters.get('deptName'):
-                query = query.filter(WorkHourData.dept_name.like(f"%{filters['deptName']}%"))
+                query = query.filter(WorkHourData.search_filter('dept_name', filters['deptName']))
             if filters.get('userName'):
-                query = query.filter(WorkHourData.user_name.like(f"%{filters['userName']}%"))
+                query = query.filter(WorkHourData.search_filter('user_name', filters['userName']))
             if filters.get('projectName'):
-                query = query.filter(WorkHourData.project_name.like(f"%{filters['projectName']}%"))
+                query = query.filter(WorkHourData.search_filter('project_name', filters['projectName']))
 
         # 日期过滤
         if filters.get('startDate') and filters.get('endDate'):
@@ -238,39 +260,22 @@ def export_query_result():
             end = datetime.strptime(filters['endDate'], '%Y-%m-%d').date()
             query = query.filter(WorkHourData.start_time >= start, WorkHourData.start_time <= end)
 
-        # 获取所有结果
-        results = query.all()
-
-        # 生成Excel
-        df = pd.DataFrame([item.to_dict() for item in results])
-
-        # 重排列顺序
-        column_order = ['serial_no', 'user_name', 'start_time', 'end_time',
-                       'project_name', 'work_hours', 'overtime_hours',
-                       'approval_result', 'approval_status', 'project_manager',
-                       'dept_name', 'work_date', 'import_batch_no']
-
-        df = df.reindex(columns=column_order)
-
-        # 重命名列
-        df.columns = ['序号', '姓名', '开始时间', '结束时间', '项目名称',
-                     '工作时长', '加班时长', '审批结果', '审批状态',
-                     '项目经理', '部门', '工作日期', '导入批次']
-
-        # 生成文件
-        output = BytesIO()
+        # 逐批读取、逐行写出（不在内存中保留整个结果集）
         dimension = '项目维度' if query_type == 'project' else '组织维度'
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f'工时查询结果_{dimension}_{timestamp}.xlsx'
-
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='工时数据')
+        filename = f'工时查询结果_{dimension}_{timestamp}.{fmt}'
+        rows = iter_export_rows(query)
 
-        output.seek(0)
+        if fmt == 'csv':
+            return Response(
+                stream_with_context(stream_csv_export(rows)),
+                mimetype=REPORT_FORMATS['csv'],
+                headers={'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}"}
+            )
 
         return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            write_xlsx_export(rows),
+            mimetype=REPORT_FORMATS['xlsx'],
             as_attachment=True,
             download_name=filename
         )
@@ -289,9 +294,14 @@ def delete_work_hour(record_id):
             return error_response(3001, '工时记录不存在', http_status=404)
 
         batch_no = record.import_batch_no
+        user_name = record.user_name
+        start_time = record.start_time
         db.session.delete(record)
         db.session.flush()
         _refresh_import_record_stats([batch_no])
+        refresh_user_states([user_name])
+        refresh_rollup_weeks([(user_name, start_time)])
+        bump_dict_versions(WORK_HOURS_CHANGE)
         db.session.commit()
 
         return success_response(message='删除成功')
@@ -319,10 +329,15 @@ def batch_delete_work_hours():
             return error_response(3001, '工时记录不存在', http_status=404)
 
         batch_nos = [r.import_batch_no for r in records]
+        user_names = {r.user_name for r in records}
+        user_starts = {(r.user_name, r.start_time) for r in records}
         for r in records:
             db.session.delete(r)
         db.session.flush()
         _refresh_import_record_stats(batch_nos)
+        refresh_user_states(user_names)
+        refresh_rollup_weeks(user_starts)
+        bump_dict_versions(WORK_HOURS_CHANGE)
         db.session.commit()
 
         return success_response(
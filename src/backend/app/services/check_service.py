@@ -5,33 +5,63 @@
 - HTTP handler（routes/check.py）调用
 - 调度器（scheduler.py）调用，无需 HTTP 上下文
 """
+import hashlib
 import json
-from datetime import datetime, timedelta
+import multiprocessing
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
 
-from sqlalchemy import func
+from flask import current_app
+from sqlalchemy import func, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from app.models.db import db
 from app.models.work_hour_data import WorkHourData
 from app.models.employee import Employee
-from app.models.check_record import CheckRecord
+from app.models.check_record import CheckRecord, CheckRecordDetail
 from app.models.holiday import Holiday
-from app.utils.helpers import calculate_date_range, get_workdays_in_range, generate_batch_no
+from app.models.integrity_state import IntegrityUserState, IntegrityCheckCache
+from app.utils.helpers import calculate_date_range, generate_batch_no, chunks, WorkdayCalendar
+from app.services.settings_service import get_check_settings
 
+WORK_TYPES = ['project_delivery', 'product_research', 'presales_support', 'dept_internal']
 
-def _collect_missing_in_gap(details, missing_users, user, dept, gap_start, gap_end,
-                            workdays, non_workdays, extra_workdays):
-    """统计 [gap_start, gap_end] 内的工作日，写入一条 missing 详情；返回工作日数。"""
+# 完整性检查结果缓存的保留天数
+CACHE_RETENTION_DAYS = 30
+
+
+_process_pool = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock()
+
+
+def load_holidays(start, end):
+    """[start, end] 内的节假日：返回 (non_workdays, extra_workdays)"""
+    holiday_records = db.session.query(
+        Holiday.holiday_date, Holiday.is_workday
+    ).filter(
+        Holiday.holiday_date >= start,
+        Holiday.holiday_date <= end
+    ).all()
+    non_workdays = [h.holiday_date for h in holiday_records if not h.is_workday]
+    extra_workdays = [h.holiday_date for h in holiday_records if h.is_workday]
+    return non_workdays, extra_workdays
+
+
+def _missing_detail(user, dept, gap_start, gap_end, calendar):
+    """[gap_start, gap_end] 内有工作日时返回一条 missing 详情，否则返回 None"""
     if gap_start > gap_end:
-        return 0
-    workdays_in_gap = get_workdays_in_range(gap_start, gap_end, workdays, non_workdays)
-    for wd in extra_workdays:
-        if gap_start <= wd <= gap_end and wd not in workdays_in_gap:
-            workdays_in_gap.append(wd)
-    workdays_in_gap.sort()
+        return None
+    workdays_in_gap = calendar.dates(gap_start, gap_end)
     if not workdays_in_gap:
-        return 0
+        return None
     missing_dates = [d.strftime('%Y-%m-%d') for d in workdays_in_gap]
-    details.append({
+    return {
         'deptName': dept,
         'userName': user,
         'issueType': 'missing',
@@ -41,14 +71,486 @@ def _collect_missing_in_gap(details, missing_users, user, dept, gap_start, gap_e
         'affectedWorkdays': len(workdays_in_gap),
         'missingDates': missing_dates,
         'description': f'未提交周报（{len(workdays_in_gap)}个工作日：{", ".join(missing_dates)}）'
-    })
-    if user not in missing_users:
-        missing_users.append(user)
-    return len(workdays_in_gap)
+    }
+
+
+def iter_overlaps(orders):
+    """
+    扫描线找出时间重叠的工单对（orders 已按 start_time 升序）
+
+    对每个工单只向后扫描开始时间早于其结束时间的工单，后续工单开始得更晚必然不再重叠，
+    复杂度 O(n + k)（k 为重叠对数）。产出顺序与两两比较的 (i, j) 顺序一致。
+    """
+    count = len(orders)
+    for i in range(count):
+        order_a = orders[i]
+        for j in range(i + 1, count):
+            order_b = orders[j]
+            if order_b[1] >= order_a[2]:
+                break
+            if order_a[1] < order_b[2]:
+                yield order_a, order_b
+
+
+def evaluate_user_orders(user, dept, orders, start, end, calendar):
+    """
+    单个员工的空缺 + 重复检查（纯函数，不访问数据库）
+
+    参数:
+        orders: [(serial_no, start_time, end_time), ...]，按 start_time 升序、已去重
+        start/end: 核对区间
+        calendar: WorkdayCalendar
+
+    返回: (details, missing_days, duplicate_days)；details 中 missing 在前、duplicate 在后
+    """
+    details = []
+    missing_days = 0
+    duplicate_days = 0
+
+    # 空缺：首段、相邻工单空隙、尾段；区间内无任何工单时整段视为空缺
+    if not orders:
+        gaps = [(start, end)]
+    else:
+        gaps = []
+        if orders[0][1] > start:
+            gaps.append((start, orders[0][1] - timedelta(days=1)))
+        for current, following in zip(orders, orders[1:]):
+            if current[2] < following[1]:
+                gaps.append((current[2] + timedelta(days=1), following[1] - timedelta(days=1)))
+        if orders[-1][2] < end:
+            gaps.append((orders[-1][2] + timedelta(days=1), end))
+
+    for gap_start, gap_end in gaps:
+        detail = _missing_detail(user, dept, gap_start, gap_end, calendar)
+        if detail:
+            details.append(detail)
+            missing_days += detail['affectedWorkdays']
+
+    # 重复：同一重叠区间只记录一次
+    recorded_periods = set()
+    for order_a, order_b in iter_overlaps(orders):
+        overlap_start = max(order_a[1], order_b[1])
+        overlap_end = min(order_a[2], order_b[2])
+        period_key = (overlap_start, overlap_end)
+        if period_key in recorded_periods:
+            continue
+        recorded_periods.add(period_key)
+        affected = calendar.count(overlap_start, overlap_end)
+        if not affected:
+            continue
+        duplicate_days += affected
+        details.append({
+            'deptName': dept,
+            'userName': user,
+            'issueType': 'duplicate',
+            'serialNo': f'{order_a[0]},{order_b[0]}',
+            'gapStartDate': overlap_start.strftime('%Y-%m-%d'),
+            'gapEndDate': overlap_end.strftime('%Y-%m-%d'),
+            'affectedWorkdays': affected,
+            'description': f'与序号{order_b[0]}时间重叠'
+        })
+
+    return details, missing_days, duplicate_days
+
+
+def _evaluate_shard(window, shard):
+    """进程池任务：在子进程内重建工作日索引并逐人计算
+
+    工单日期以序数（date.toordinal）传递：date 对象逐个 pickle 的开销与计算本身相当。
+    """
+    start, end, workdays, non_workdays, extra_workdays = window
+    calendar = WorkdayCalendar(start, end, workdays, non_workdays, extra_workdays)
+    fromordinal = date.fromordinal
+    results = []
+    for user, dept, orders in shard:
+        orders = [(serial_no, fromordinal(order_start), fromordinal(order_end))
+                  for serial_no, order_start, order_end in orders]
+        results.append((user, dept) + evaluate_user_orders(user, dept, orders, start, end, calendar))
+    return results
+
+
+def _get_process_pool(workers):
+    """按进程复用计算进程池；使用 spawn 启动，避免 fork 带走调度器/导入线程持有的锁"""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_workers != workers:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            _process_pool_workers = workers
+        return _process_pool
+
+
+def evaluate_users(users, orders_by_user, start, end, workdays, holidays, calendar, workers=1):
+    """
+    批量计算员工的空缺 + 重复
+
+    workers > 1 且人数达到 INTEGRITY_PARALLEL_MIN_USERS 时，按姓名哈希把员工分片，
+    连同各自工单（普通元组）交给进程池并行计算；否则在当前进程内逐人计算。
+    结果按 (user, dept) 返回，由调用方按名单顺序合并，输出与串行计算完全一致。
+
+    参数:
+        users: [(user_name, dept_name), ...]
+        holidays: (non_workdays, extra_workdays)
+    返回: {(user_name, dept_name): (details, missing_days, duplicate_days)}
+    """
+    min_users = current_app.config.get('INTEGRITY_PARALLEL_MIN_USERS', 500)
+    if workers <= 1 or len(users) < min_users:
+        return {
+            (user, dept): evaluate_user_orders(user, dept, orders_by_user.get(user, []), start, end, calendar)
+            for user, dept in users
+        }
+
+    shards = [[] for _ in range(workers)]
+    for user, dept in users:
+        orders = [(serial_no, order_start.toordinal(), order_end.toordinal())
+                  for serial_no, order_start, order_end in orders_by_user.get(user, [])]
+        shards[zlib.crc32(user.encode('utf-8')) % workers].append((user, dept, orders))
+    window = (start, end, list(workdays), list(holidays[0]), list(holidays[1]))
+
+    results = {}
+    pool = _get_process_pool(workers)
+    for shard_result in pool.map(_evaluate_shard, [window] * workers, shards):
+        for user, dept, user_details, missing_days, duplicate_days in shard_result:
+            results[(user, dept)] = (user_details, missing_days, duplicate_days)
+    return results
+
+
+def load_user_orders(start, end, dept_name='', user_name='', user_names=None):
+    """
+    一次查询加载核对区间内所有员工的工单，按员工分组
+
+    user_names: 仅加载这些员工（增量检查时只取需要重算的人），None 表示不限
+    返回: {user_name: [(serial_no, start_time, end_time), ...]}，每人按 start_time 升序、已去重
+    """
+    query = db.session.query(
+        WorkHourData.user_name,
+        WorkHourData.serial_no,
+        WorkHourData.start_time,
+        WorkHourData.end_time
+    ).filter(
+        WorkHourData.start_time <= end,
+        WorkHourData.end_time >= start
+    )
+    if dept_name:
+        query = query.filter(WorkHourData.search_filter('dept_name', dept_name))
+    if user_name:
+        query = query.filter(WorkHourData.search_filter('user_name', user_name))
+
+    if user_names is None:
+        batches = [query]
+    else:
+        batches = [query.filter(WorkHourData.user_name.in_(names)) for names in chunks(sorted(user_names))]
+
+    orders_by_user = {}
+    for batch in batches:
+        rows = batch.distinct().order_by(WorkHourData.user_name, WorkHourData.start_time)
+        for user, user_rows in groupby(rows, key=itemgetter(0)):
+            orders_by_user[user] = [
+                (serial_no, order_start, order_end) for _, serial_no, order_start, order_end in user_rows
+            ]
+    return orders_by_user
+
+
+def merge_coverage(orders):
+    """把工单区间排序合并为覆盖段（首尾相邻的日期也合并），返回 [(start, end), ...]"""
+    merged = []
+    for order in sorted(orders, key=itemgetter(1, 2)):
+        order_start, order_end = order[1], order[2]
+        if merged and order_start <= merged[-1][1] + timedelta(days=1):
+            if order_end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], order_end)
+        else:
+            merged.append((order_start, order_end))
+    return merged
+
+
+def _save_user_states(rows):
+    """写入（覆盖）员工覆盖状态行，不提交"""
+    if not rows:
+        return
+    stmt = sqlite_insert(IntegrityUserState.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_name'],
+        set_={
+            'revision': stmt.excluded.revision,
+            'digest': stmt.excluded.digest,
+            'coverage': stmt.excluded.coverage,
+            'order_count': stmt.excluded.order_count,
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+    db.session.execute(stmt, rows)
+
+
+def _dump_coverage(segments):
+    return json.dumps([[cover_start.isoformat(), cover_end.isoformat()] for cover_start, cover_end in segments])
+
+
+def refresh_user_states(user_names):
+    """
+    按全部工单重建指定员工的覆盖状态，写入会话但不提交
+
+    删除工时后、导入结束时（覆盖策略改动了已有工单的员工）以及检查时遇到尚无状态或已标记
+    待重建的员工时调用。工单集合（含部门）的摘要不变时保持 revision 不变，
+    重复导入相同数据不会让已缓存的检查结果失效。
+    返回: {user_name: revision}
+    """
+    revisions = {}
+    now = datetime.now()
+    for names in chunks(sorted({u for u in user_names if u})):
+        rows = db.session.query(
+            WorkHourData.user_name,
+            WorkHourData.serial_no,
+            WorkHourData.start_time,
+            WorkHourData.end_time,
+            WorkHourData.dept_name
+        ).filter(
+            WorkHourData.user_name.in_(names)
+        ).distinct().order_by(
+            WorkHourData.user_name, WorkHourData.start_time, WorkHourData.end_time,
+            WorkHourData.serial_no, WorkHourData.dept_name
+        )
+        orders_by_user = {
+            user: [tuple(row[1:]) for row in user_rows]
+            for user, user_rows in groupby(rows, key=itemgetter(0))
+        }
+        existing = {
+            user: (revision, digest)
+            for user, revision, digest in db.session.query(
+                IntegrityUserState.user_name, IntegrityUserState.revision, IntegrityUserState.digest
+            ).filter(IntegrityUserState.user_name.in_(names))
+        }
+
+        upserts = []
+        for user in names:
+            orders = orders_by_user.get(user, [])
+            digest = hashlib.sha1(repr(orders).encode('utf-8')).hexdigest()
+            previous = existing.get(user)
+            if previous and previous[1] == digest:
+                revisions[user] = previous[0]
+                continue
+            revisions[user] = previous[0] + 1 if previous else 1
+            upserts.append({
+                'user_name': user,
+                'revision': revisions[user],
+                'digest': digest,
+                'coverage': _dump_coverage(merge_coverage(orders)),
+                'order_count': len(orders),
+                'updated_at': now
+            })
+        _save_user_states(upserts)
+    return revisions
+
+
+def merge_user_orders(records):
+    """
+    把一批新增工时的工单区间并入员工覆盖状态，写入会话但不提交
+
+    导入新增工时后按分块调用：只读取涉及员工的已存状态，用 merge_coverage 把新区间并入
+    覆盖段，revision 递增，不回查员工的全部工单。digest 由原摘要与新增工单链式计算
+    （只保证随变更而变），order_count 按新增工单累加（与已有工单重复时会偏大，重建时校正）。
+    尚无状态的员工（新员工、升级前的数据）改为整体重建；已标记待重建的员工只再次递增 revision，
+    留待导入结束或下次检查时重建。
+
+    records: 新增工时 dict 列表（user_name、serial_no、start_time、end_time、dept_name）
+    返回: {user_name: revision}（已标记待重建的员工不在其中）
+    """
+    new_orders = defaultdict(set)
+    for record in records:
+        if record['user_name']:
+            new_orders[record['user_name']].add(
+                (record['serial_no'], record['start_time'], record['end_time'], record['dept_name'])
+            )
+
+    revisions = {}
+    rebuild = []
+    stale = []
+    now = datetime.now()
+    for names in chunks(sorted(new_orders)):
+        states = {
+            row.user_name: row
+            for row in db.session.query(
+                IntegrityUserState.user_name, IntegrityUserState.revision, IntegrityUserState.digest,
+                IntegrityUserState.coverage, IntegrityUserState.order_count
+            ).filter(IntegrityUserState.user_name.in_(names))
+        }
+
+        upserts = []
+        for user in names:
+            state = states.get(user)
+            if state is None:
+                rebuild.append(user)
+                continue
+            if not state.digest:
+                stale.append(user)
+                continue
+            orders = sorted(new_orders[user], key=repr)
+            segments = [(None, date.fromisoformat(cover_start), date.fromisoformat(cover_end))
+                        for cover_start, cover_end in json.loads(state.coverage)]
+            revisions[user] = state.revision + 1
+            upserts.append({
+                'user_name': user,
+                'revision': revisions[user],
+                'digest': hashlib.sha1((state.digest + repr(orders)).encode('utf-8')).hexdigest(),
+                'coverage': _dump_coverage(merge_coverage(segments + orders)),
+                'order_count': state.order_count + len(orders),
+                'updated_at': now
+            })
+        _save_user_states(upserts)
+
+    invalidate_user_states(stale)
+    if rebuild:
+        revisions.update(refresh_user_states(rebuild))
+    return revisions
+
+
+def invalidate_user_states(user_names):
+    """
+    标记员工覆盖状态待重建：revision 递增（已缓存的检查结果随即失效）、digest 置空，不提交
+
+    覆盖策略改动已有工时时按分块调用，代价只是一条 UPDATE；导入结束时再整体重建一次，
+    导入中途失败时由下次检查按需重建。
+    """
+    for names in chunks(sorted({u for u in user_names if u})):
+        IntegrityUserState.query.filter(IntegrityUserState.user_name.in_(names)).update({
+            IntegrityUserState.revision: IntegrityUserState.revision + 1,
+            IntegrityUserState.digest: '',
+            IntegrityUserState.updated_at: datetime.now()
+        }, synchronize_session=False)
+
+
+def _window_key(start, end, workdays, dept_name, non_workdays, extra_workdays):
+    """核对窗口摘要：区间、工作日、部门过滤、区间内节假日任一变化都视为不同窗口
+
+    姓名过滤只决定检查哪些人，不影响单人结果，因此不参与摘要。
+    """
+    payload = json.dumps([
+        start.isoformat(), end.isoformat(), list(workdays), dept_name,
+        sorted(d.isoformat() for d in non_workdays),
+        sorted(d.isoformat() for d in extra_workdays)
+    ])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def load_cached_results(user_list, window_key):
+    """
+    读取本窗口下仍然有效（revision 与员工当前状态一致）的单人检查结果
+
+    没有覆盖状态（如升级前已有的数据）或已标记待重建的员工先重建状态。
+    返回: (cached, revisions)
+        cached: {(user_name, dept_key): (details, missing_days, duplicate_days)}
+        revisions: {user_name: revision}
+    """
+    revisions = {}
+    stale = set()
+    for user, revision, digest in db.session.query(
+        IntegrityUserState.user_name, IntegrityUserState.revision, IntegrityUserState.digest
+    ):
+        revisions[user] = revision
+        if not digest:
+            stale.add(user)
+    unknown = {user for user, _ in user_list if user not in revisions or user in stale}
+    if unknown:
+        revisions.update(refresh_user_states(unknown))
+
+    rows = db.session.query(
+        IntegrityCheckCache.user_name,
+        IntegrityCheckCache.dept_name,
+        IntegrityCheckCache.details,
+        IntegrityCheckCache.missing_days,
+        IntegrityCheckCache.duplicate_days
+    ).join(
+        IntegrityUserState,
+        (IntegrityUserState.user_name == IntegrityCheckCache.user_name)
+        & (IntegrityUserState.revision == IntegrityCheckCache.revision)
+    ).filter(
+        IntegrityCheckCache.window_key == window_key
+    )
+    cached = {
+        (row.user_name, row.dept_name): (json.loads(row.details), row.missing_days, row.duplicate_days)
+        for row in rows
+    }
+    return cached, revisions
+
+
+def save_cached_results(rows):
+    """写入（覆盖）单人检查结果缓存，并清理过期缓存；不提交"""
+    if rows:
+        stmt = sqlite_insert(IntegrityCheckCache.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_name', 'dept_name', 'window_key'],
+            set_={
+                'revision': stmt.excluded.revision,
+                'missing_days': stmt.excluded.missing_days,
+                'duplicate_days': stmt.excluded.duplicate_days,
+                'details': stmt.excluded.details,
+                'checked_at': stmt.excluded.checked_at
+            }
+        )
+        db.session.execute(stmt, rows)
+    expire_before = datetime.now() - timedelta(days=CACHE_RETENTION_DAYS)
+    IntegrityCheckCache.query.filter(
+        IntegrityCheckCache.checked_at < expire_before
+    ).delete(synchronize_session=False)
+
+
+def save_check_details(check_no, details):
+    """详情逐条写入 check_record_details（seq 保持原顺序），一次 executemany，不提交
+
+    issue_type 取周报检查的 issueType 或工作时长检查的 status，供详情页筛选。
+    """
+    if not details:
+        return
+    db.session.execute(CheckRecordDetail.__table__.insert(), [
+        {
+            'check_no': check_no,
+            'seq': seq,
+            'user_name': item.get('userName'),
+            'issue_type': item.get('issueType') or item.get('status'),
+            'detail': json.dumps(item)
+        }
+        for seq, item in enumerate(details, 1)
+    ])
+
+
+def query_check_details(check_no, page=1, size=20, user_name='', issue_type=''):
+    """
+    分页读取核对详情，只反序列化当前页
+
+    user_name: 姓名模糊匹配；issue_type: 问题类型/状态精确匹配；空串表示不过滤
+    返回: (items, total)
+    """
+    query = db.session.query(CheckRecordDetail.detail).filter(CheckRecordDetail.check_no == check_no)
+    if user_name:
+        query = query.filter(CheckRecordDetail.user_name.like(f'%{user_name}%'))
+    if issue_type:
+        query = query.filter(CheckRecordDetail.issue_type == issue_type)
+    total = query.count()
+    rows = query.order_by(CheckRecordDetail.seq).offset((page - 1) * size).limit(size).all()
+    return [json.loads(row.detail) for row in rows], total
+
+
+def iter_check_details(check_no, batch_size=1000):
+    """按 seq 顺序流式读取核对详情（yield_per 分批取数），逐条产出 dict，供导出使用"""
+    rows = db.session.query(CheckRecordDetail.detail).filter(
+        CheckRecordDetail.check_no == check_no
+    ).order_by(CheckRecordDetail.seq).yield_per(batch_size)
+    for row in rows:
+        yield json.loads(row.detail)
+
+
+def delete_check_details(check_nos):
+    """删除核对记录对应的详情明细，不提交"""
+    CheckRecordDetail.query.filter(
+        CheckRecordDetail.check_no.in_(check_nos)
+    ).delete(synchronize_session=False)
 
 
 def run_integrity_check(*, start_date, end_date, dept_name='', user_name='',
-                        workdays=None, trigger_type='manual', check_user='system'):
+                        workdays=None, trigger_type='manual', check_user='system', workers=None):
     """执行完整性 + 重复检查。
 
     参数：
@@ -59,6 +561,7 @@ def run_integrity_check(*, start_date, end_date, dept_name='', user_name='',
         workdays:   工作日列表，默认 [1,2,3,4,5]
         trigger_type: 'manual' / 'scheduled' / 'import'
         check_user:  触发者标识，定时任务传 'system'
+        workers:     计算进程数，默认取配置 INTEGRITY_WORKERS
 
     返回：
         (check_no, summary_dict, details_list)
@@ -68,6 +571,8 @@ def run_integrity_check(*, start_date, end_date, dept_name='', user_name='',
     """
     if workdays is None:
         workdays = [1, 2, 3, 4, 5]
+    if workers is None:
+        workers = current_app.config.get('INTEGRITY_WORKERS', 1)
 
     is_valid, error_msg, _, start, end = calculate_date_range(start_date, end_date)
     if not is_valid:
@@ -86,15 +591,10 @@ def run_integrity_check(*, start_date, end_date, dept_name='', user_name='',
             start = datetime.now().date()
             end = datetime.now().date()
 
-    # 节假日数据
-    holiday_records = db.session.query(
-        Holiday.holiday_date, Holiday.is_workday
-    ).filter(
-        Holiday.holiday_date >= start,
-        Holiday.holiday_date <= end
-    ).all()
-    non_workdays = [h.holiday_date for h in holiday_records if not h.is_workday]
-    extra_workdays = [h.holiday_date for h in holiday_records if h.is_workday]
+    # 工作日索引：节假日取核对区间内的记录，区间外（跨界工单的重叠段）只按星期判定
+    holidays = load_holidays(start, end)
+    calendar = WorkdayCalendar(start, end, workdays, *holidays)
+    window_key = _window_key(start, end, workdays, dept_name, *holidays)
 
     # 应提交名单（排除离职员工）
     user_query = db.session.query(
@@ -105,107 +605,56 @@ def run_integrity_check(*, start_date, end_date, dept_name='', user_name='',
     ).subquery()
     user_query = user_query.filter(~WorkHourData.user_name.in_(resigned_subq))
     if dept_name:
-        user_query = user_query.filter(WorkHourData.dept_name.like(f'%{dept_name}%'))
+        user_query = user_query.filter(WorkHourData.search_filter('dept_name', dept_name))
     if user_name:
-        user_query = user_query.filter(WorkHourData.user_name.like(f'%{user_name}%'))
+        user_query = user_query.filter(WorkHourData.search_filter('user_name', user_name))
     user_list = user_query.all()
 
     details = []
     total_missing_days = 0
     total_duplicate_days = 0
-    missing_users = []
-    duplicate_users = []
-
-    for user, dept in user_list:
-        user_orders_query = db.session.query(
-            WorkHourData.serial_no,
-            WorkHourData.start_time,
-            WorkHourData.end_time
-        ).filter(WorkHourData.user_name == user)
+    missing_users = set()
+    duplicate_users = set()
 
-        if dept_name:
-            user_orders_query = user_orders_query.filter(WorkHourData.dept_name.like(f'%{dept_name}%'))
-
-        user_orders_query = user_orders_query.filter(
-            WorkHourData.start_time <= end,
-            WorkHourData.end_time >= start
+    # 增量检查：覆盖状态未变化且本窗口已算过的员工直接复用缓存，只为其余员工加载工单
+    cached, revisions = load_cached_results(user_list, window_key)
+    stale = [(user, dept) for user, dept in user_list if (user, dept or '') not in cached]
+    evaluated = {}
+    if stale:
+        stale_users = {user for user, _ in stale}
+        orders_by_user = load_user_orders(
+            start, end, dept_name, user_name,
+            user_names=None if len(stale_users) == len({user for user, _ in user_list}) else stale_users
         )
-        user_orders = user_orders_query.distinct().order_by(WorkHourData.start_time).all()
-
-        # Bug 1 场景 B：本次核对区间内无任何工单 → 整段视为空缺
-        if len(user_orders) == 0:
-            total_missing_days += _collect_missing_in_gap(
-                details, missing_users, user, dept,
-                start, end, workdays, non_workdays, extra_workdays
-            )
-            continue
+        evaluated = evaluate_users(stale, orders_by_user, start, end, workdays, holidays, calendar, workers)
 
-        # Bug 2 首段
-        first_order = user_orders[0]
-        if first_order.start_time > start:
-            total_missing_days += _collect_missing_in_gap(
-                details, missing_users, user, dept,
-                start, first_order.start_time - timedelta(days=1),
-                workdays, non_workdays, extra_workdays
-            )
-
-        # 相邻工单空隙
-        for i in range(len(user_orders) - 1):
-            current_end = user_orders[i].end_time
-            next_start = user_orders[i + 1].start_time
-            if current_end < next_start:
-                gap_start = current_end + timedelta(days=1)
-                gap_end = next_start - timedelta(days=1)
-                total_missing_days += _collect_missing_in_gap(
-                    details, missing_users, user, dept,
-                    gap_start, gap_end,
-                    workdays, non_workdays, extra_workdays
-                )
-
-        # Bug 2 尾段
-        last_order = user_orders[-1]
-        if last_order.end_time < end:
-            total_missing_days += _collect_missing_in_gap(
-                details, missing_users, user, dept,
-                last_order.end_time + timedelta(days=1), end,
-                workdays, non_workdays, extra_workdays
-            )
+    now = datetime.now()
+    cache_rows = []
+    for user, dept in user_list:
+        hit = cached.get((user, dept or ''))
+        if hit:
+            user_details, missing_days, duplicate_days = hit
+        else:
+            user_details, missing_days, duplicate_days = evaluated[(user, dept)]
+            cache_rows.append({
+                'user_name': user,
+                'dept_name': dept or '',
+                'window_key': window_key,
+                'revision': revisions[user],
+                'missing_days': missing_days,
+                'duplicate_days': duplicate_days,
+                'details': json.dumps(user_details),
+                'checked_at': now
+            })
+        details.extend(user_details)
+        total_missing_days += missing_days
+        total_duplicate_days += duplicate_days
+        if missing_days:
+            missing_users.add(user)
+        if duplicate_days:
+            duplicate_users.add(user)
 
-        # 重复检查
-        recorded_periods = set()
-        for i in range(len(user_orders)):
-            for j in range(i + 1, len(user_orders)):
-                order_a = user_orders[i]
-                order_b = user_orders[j]
-                if order_a.start_time < order_b.end_time and order_a.end_time > order_b.start_time:
-                    overlap_start = max(order_a.start_time, order_b.start_time)
-                    overlap_end = min(order_a.end_time, order_b.end_time)
-                    workdays_in_overlap = get_workdays_in_range(
-                        overlap_start, overlap_end, workdays, non_workdays
-                    )
-                    for wd in extra_workdays:
-                        if overlap_start <= wd <= overlap_end and wd not in workdays_in_overlap:
-                            workdays_in_overlap.append(wd)
-                    workdays_in_overlap.sort()
-                    if workdays_in_overlap:
-                        gap_start_str = overlap_start.strftime('%Y-%m-%d')
-                        gap_end_str = overlap_end.strftime('%Y-%m-%d')
-                        period_key = (user, gap_start_str, gap_end_str)
-                        if period_key not in recorded_periods:
-                            recorded_periods.add(period_key)
-                            total_duplicate_days += len(workdays_in_overlap)
-                            if user not in duplicate_users:
-                                duplicate_users.append(user)
-                            details.append({
-                                'deptName': dept,
-                                'userName': user,
-                                'issueType': 'duplicate',
-                                'serialNo': f'{order_a.serial_no},{order_b.serial_no}',
-                                'gapStartDate': gap_start_str,
-                                'gapEndDate': gap_end_str,
-                                'affectedWorkdays': len(workdays_in_overlap),
-                                'description': f'与序号{order_b.serial_no}时间重叠'
-                            })
+    save_cached_results(cache_rows)
 
     total_users = len(user_list)
     integrity_users = total_users - len(missing_users)
@@ -229,10 +678,10 @@ def run_integrity_check(*, start_date, end_date, dept_name='', user_name='',
             'totalDuplicateWorkdays': total_duplicate_days,
             'integrityRate': f"{integrity_rate:.2f}%"
         }),
-        check_details=json.dumps(details),
         check_user=check_user
     )
     db.session.add(check_record)
+    save_check_details(check_no, details)
     db.session.commit()
 
     summary = {
@@ -244,3 +693,196 @@ def run_integrity_check(*, start_date, end_date, dept_name='', user_name='',
         'integrityRate': integrity_rate
     }
     return check_no, summary, details
+
+
+def load_serial_stats(start, end, dept_name='', user_name=''):
+    """
+    按工单（serial_no, user_name, start_time, end_time）聚合各工作类型时长
+
+    start/end 均为 None 时不按时间过滤（全量查询）。
+    返回: [(serial_no, user_name, start_time, end_time,
+            project_delivery_hours, product_research_hours, presales_support_hours,
+            dept_internal_hours, total_work_hours, total_leave_hours), ...]
+    """
+    serial_stats = db.session.query(
+        WorkHourData.serial_no,
+        WorkHourData.user_name,
+        WorkHourData.start_time,
+        WorkHourData.end_time,
+        func.sum(case((WorkHourData.work_type == 'project_delivery', WorkHourData.work_hours), else_=0)).label('project_delivery_hours'),
+        func.sum(case((WorkHourData.work_type == 'product_research', WorkHourData.work_hours), else_=0)).label('product_research_hours'),
+        func.sum(case((WorkHourData.work_type == 'presales_support', WorkHourData.work_hours), else_=0)).label('presales_support_hours'),
+        func.sum(case((WorkHourData.work_type == 'dept_internal', WorkHourData.work_hours), else_=0)).label('dept_internal_hours'),
+        func.sum(WorkHourData.work_hours).label('total_work_hours'),
+        func.sum(WorkHourData.leave_hours).label('total_leave_hours')
+    )
+
+    if start is not None and end is not None:
+        serial_stats = serial_stats.filter(
+            WorkHourData.start_time >= start,
+            WorkHourData.end_time <= end
+        )
+
+    if dept_name:
+        serial_stats = serial_stats.filter(WorkHourData.search_filter('dept_name', dept_name))
+
+    if user_name:
+        serial_stats = serial_stats.filter(WorkHourData.search_filter('user_name', user_name))
+
+    return serial_stats.group_by(
+        WorkHourData.serial_no,
+        WorkHourData.user_name,
+        WorkHourData.start_time,
+        WorkHourData.end_time
+    ).all()
+
+
+def classify_serials(serial_stats, calendar, standard_hours):
+    """
+    按工单判定 normal/short/excess，并汇总各工作类型时长（纯函数，不访问数据库）
+
+    应工作时长 = 工单区间内法定工作日数 × 标准工作时长；实际 = 各类型工作时长 + 请假时长。
+
+    返回: (summary, details)；details 只包含异常（short/excess）工单
+    """
+    details = []
+    total_serials = 0
+    normal_serials = 0
+    short_serials = 0
+    excess_serials = 0
+    work_type_totals = {work_type: 0 for work_type in WORK_TYPES}
+    work_type_counts = {work_type: 0 for work_type in WORK_TYPES}
+
+    for serial_no, user, start_time, end_time, pd_hours, pr_hours, ps_hours, di_hours, total_wh, leave_h in serial_stats:
+        legal_work_hours = calendar.count(start_time, end_time) * standard_hours
+
+        # 实际工作时长 = 各类型工作时长之和
+        actual_work_hours = (pd_hours or 0) + (pr_hours or 0) + (ps_hours or 0) + (di_hours or 0)
+        total_work_hours = actual_work_hours + (leave_h or 0)
+
+        # 应工作时长 = 法定工作时间
+        expected_work_hours = legal_work_hours
+        difference = total_work_hours - expected_work_hours
+
+        if difference == 0:
+            status = 'normal'
+            normal_serials += 1
+        elif difference < 0:
+            status = 'short'
+            short_serials += 1
+        else:
+            status = 'excess'
+            excess_serials += 1
+
+        total_serials += 1
+
+        # 统计各工作类型时长
+        for work_type, hours in zip(WORK_TYPES, (pd_hours, pr_hours, ps_hours, di_hours)):
+            if hours and hours > 0:
+                work_type_totals[work_type] += hours
+                work_type_counts[work_type] += 1
+
+        # 只添加异常记录到详情列表
+        if status != 'normal':
+            details.append({
+                'serialNo': serial_no,
+                'userName': user,
+                'startTime': start_time.strftime('%Y-%m-%d'),
+                'endTime': end_time.strftime('%Y-%m-%d'),
+                'projectDeliveryHours': round(pd_hours or 0, 2),
+                'productResearchHours': round(pr_hours or 0, 2),
+                'presalesSupportHours': round(ps_hours or 0, 2),
+                'deptInternalHours': round(di_hours or 0, 2),
+                'totalWorkHours': round(total_work_hours, 2),
+                'leaveHours': round(leave_h or 0, 2),
+                'expectedWorkHours': round(expected_work_hours, 2),
+                'legalWorkHours': round(legal_work_hours, 2),
+                'difference': round(difference, 2),
+                'status': status
+            })
+
+    compliance_rate = (normal_serials / total_serials * 100) if total_serials > 0 else 100
+
+    # 各工作类型平均时长
+    work_type_stats = {}
+    for work_type in WORK_TYPES:
+        total_hours = work_type_totals[work_type]
+        count = work_type_counts[work_type]
+        work_type_stats[work_type] = {
+            'totalHours': round(total_hours, 2),
+            'avgHours': round(total_hours / count, 2) if count > 0 else 0
+        }
+
+    summary = {
+        'totalSerials': total_serials,
+        'normalSerials': normal_serials,
+        'shortSerials': short_serials,
+        'excessSerials': excess_serials,
+        'complianceRate': compliance_rate,
+        'workTypeStats': work_type_stats
+    }
+    return summary, details
+
+
+def run_work_hours_check(*, start_date, end_date, dept_name='', user_name='',
+                         trigger_type='manual', check_user='system', check_config=None):
+    """执行工作时长一致性检查（按工单聚合统计）并保存检查记录。
+
+    参数同 run_integrity_check；check_config 为写入检查记录的原始参数，默认由筛选条件生成。
+
+    返回：
+        (check_no, summary_dict, details_list)
+
+    异常：
+        ValueError: 当日期格式错误或 start > end
+    """
+    is_valid, error_msg, _, start, end = calculate_date_range(start_date, end_date)
+    if not is_valid:
+        raise ValueError(error_msg)
+
+    serial_stats = load_serial_stats(start, end, dept_name, user_name)
+
+    # 工作日索引（一次构建）：指定区间时套用区间内的节假日；全量查询时只按星期判定
+    calendar = None
+    if serial_stats:
+        if start is not None and end is not None:
+            calendar = WorkdayCalendar(start, end, [1, 2, 3, 4, 5], *load_holidays(start, end))
+        else:
+            calendar = WorkdayCalendar(
+                min(row.start_time for row in serial_stats),
+                max(row.end_time for row in serial_stats),
+                [1, 2, 3, 4, 5]
+            )
+
+    # 标准工作时长（check.* 配置整个请求只读取一次）
+    standard_hours = get_check_settings().standard_hours
+    summary, details = classify_serials(serial_stats, calendar, standard_hours)
+
+    if check_config is None:
+        check_config = {'startDate': start_date, 'endDate': end_date,
+                        'deptName': dept_name, 'userName': user_name}
+
+    check_no = generate_batch_no('CHK')
+    check_record = CheckRecord(
+        check_no=check_no,
+        check_type='work-hours-consistency',
+        trigger_type=trigger_type,
+        start_date=start,
+        end_date=end,
+        dept_name=dept_name if dept_name else None,
+        user_name=user_name if user_name else None,
+        check_config=json.dumps(check_config),
+        check_result=json.dumps({
+            'totalSerials': summary['totalSerials'],
+            'normalSerials': summary['normalSerials'],
+            'shortSerials': summary['shortSerials'],
+            'excessSerials': summary['excessSerials'],
+            'complianceRate': f"{summary['complianceRate']:.2f}%"
+        }),
+        check_user=check_user
+    )
+    db.session.add(check_record)
+    save_check_details(check_no, details)  # 保存完整详细列表
+    db.session.commit()
+
+    return check_no, summary, details
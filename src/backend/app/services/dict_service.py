@@ -0,0 +1,140 @@
+"""
+数据字典（GET /data/dict）的进程内缓存。
+
+- 版本号：data_dict_versions 表，写入方调用 bump_dict_versions() 随自身事务递增
+  （导入、删除工时、项目增删改），所有进程共享
+- 读取：每次请求只查一次版本号表；版本未变直接返回缓存
+  - projects 变化：重新加载项目部分（projects 表较小）
+  - work_hours_change 变化：全量重建部门/人员/工时项目去重集合
+  - 只有 work_hours_insert 变化：只读取上次最大 id 之后新增的工时，并入去重集合，不再全表扫描
+- ETag：字典内容（列表已排序）的摘要，与进程无关，各 worker 对同一数据给出相同 ETag
+"""
+import hashlib
+import json
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models.data_dict_version import DataDictVersion
+from app.models.db import db
+from app.models.project import Project
+from app.models.work_hour_data import WorkHourData
+
+WORK_HOURS_INSERT = 'work_hours_insert'
+WORK_HOURS_CHANGE = 'work_hours_change'
+PROJECTS = 'projects'
+
+_caches = {}  # 数据库 URL -> _DictCache
+_caches_lock = threading.Lock()
+
+
+def bump_dict_versions(*scopes):
+    """递增指定 scope 的版本号，写入会话但不提交（随调用方事务生效）"""
+    if not scopes:
+        return
+    table = DataDictVersion.__table__
+    stmt = sqlite_insert(table).on_conflict_do_update(
+        index_elements=['scope'],
+        set_={'version': table.c.version + 1}
+    )
+    db.session.execute(stmt, [{'scope': scope, 'version': 1} for scope in scopes])
+
+
+class _DictCache:
+    """单个数据库的数据字典缓存"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.versions = None
+        self.project_part = None
+        self.departments = set()
+        self.users = set()
+        self.work_projects = set()
+        self.max_id = 0
+        self.data = None
+        self.etag = None
+
+    def _load_projects(self):
+        """项目、项目经理及其相互映射（仅活跃项目）"""
+        projects = Project.query.filter_by(status='active').order_by(Project.id).all()
+        project_manager_map = {}
+        manager_project_map = {}
+        for p in projects:
+            if p.project_name and p.project_manager:
+                managers = project_manager_map.setdefault(p.project_name, [])
+                if p.project_manager not in managers:
+                    managers.append(p.project_manager)
+                names = manager_project_map.setdefault(p.project_manager, [])
+                if p.project_name not in names:
+                    names.append(p.project_name)
+        self.project_part = {
+            'projects': [p.project_name for p in projects if p.project_name],
+            'managers': sorted({p.project_manager for p in projects if p.project_manager}),
+            'projectManagerMap': project_manager_map,  # 项目 -> 经理列表
+            'managerProjectMap': manager_project_map,  # 经理 -> 项目列表
+        }
+
+    def _merge_work_hours(self, after_id=None):
+        """
+        把工时表中 id 在 (after_id, 当前最大 id] 内的部门/人员/项目名称并入去重集合
+
+        after_id 为 None 时清空后全量重建；最大 id 先于数据读取，
+        期间新提交的工时留给下次（其导入会递增版本号）。
+        """
+        max_id = db.session.query(func.max(WorkHourData.id)).scalar() or 0
+        if after_id is None:
+            self.departments = {d for (d,) in db.session.query(WorkHourData.dept_name).distinct() if d}
+            self.users = {u for (u,) in db.session.query(WorkHourData.user_name).distinct() if u}
+            self.work_projects = {p for (p,) in db.session.query(WorkHourData.project_name).distinct() if p}
+        elif max_id > after_id:
+            rows = db.session.query(
+                WorkHourData.dept_name, WorkHourData.user_name, WorkHourData.project_name
+            ).filter(WorkHourData.id > after_id, WorkHourData.id <= max_id).distinct()
+            for dept_name, user_name, project_name in rows:
+                if dept_name:
+                    self.departments.add(dept_name)
+                if user_name:
+                    self.users.add(user_name)
+                if project_name:
+                    self.work_projects.add(project_name)
+        self.max_id = max_id
+
+    def get(self):
+        # 版本号须先于数据读取：读取期间有新写入时，缓存只会比版本号新，下次请求再追平
+        versions = dict(db.session.query(DataDictVersion.scope, DataDictVersion.version).all())
+        with self.lock:
+            if self.versions == versions:
+                return self.etag, self.data
+
+            previous = self.versions or {}
+            if self.project_part is None or previous.get(PROJECTS) != versions.get(PROJECTS):
+                self._load_projects()
+            if self.data is None or previous.get(WORK_HOURS_CHANGE) != versions.get(WORK_HOURS_CHANGE):
+                self._merge_work_hours()
+            elif versions.get(WORK_HOURS_INSERT, 0) > previous.get(WORK_HOURS_INSERT, 0):
+                self._merge_work_hours(self.max_id)
+            elif versions.get(WORK_HOURS_INSERT) != previous.get(WORK_HOURS_INSERT):
+                self._merge_work_hours()  # 版本号回退（如恢复了旧备份），不能增量合并
+
+            data = dict(
+                self.project_part,
+                departments=sorted(self.departments),
+                users=sorted(self.users),  # 用户名列表
+                workProjects=sorted(self.work_projects),  # 工时数据表中的项目名称
+            )
+            digest = hashlib.md5(json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+            self.data = data
+            self.etag = f'dict-{digest.hexdigest()}'
+            self.versions = versions
+            return self.etag, self.data
+
+
+def get_data_dict():
+    """当前数据库的数据字典，返回 (etag, data)"""
+    key = str(db.engine.url)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = _DictCache()
+    return cache.get()
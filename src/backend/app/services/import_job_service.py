@@ -0,0 +1,100 @@
+"""
+后台导入任务。
+
+上传请求只保存文件、落库导入记录（queued）并提交任务，解析、校验、员工同步与
+分块入库在线程池中执行，web worker 立即返回；客户端通过
+GET /import/record/<batch_no>/progress 轮询阶段与行数，最终结果保存在 ImportRecord 上。
+
+线程池按进程创建（gunicorn 每个 worker 各自一个），任务状态全部落库，
+因此任意 worker 都能响应进度查询。进程重启时线程池中的任务随之丢失，
+其导入记录停留在未完成状态、不再更新 updated_at：超过 IMPORT_STALE_MINUTES 后
+视为已中断，启动时标记为 failed，续传也接受这类记录。
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from app.models.db import db
+from app.models.import_record import ImportRecord
+from app.services.import_service import execute_chunked_import
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='import-job')
+        return _executor
+
+
+# 未完成（尚在排队或执行中）的导入状态
+ACTIVE_STATUSES = ('queued', 'scanning', 'importing')
+
+
+def _stale_condition(stale_minutes):
+    """未完成且超过 stale_minutes 没有进度更新的导入"""
+    cutoff = datetime.now() - timedelta(minutes=stale_minutes)
+    return and_(
+        ImportRecord.import_status.in_(ACTIVE_STATUSES),
+        or_(ImportRecord.updated_at.is_(None), ImportRecord.updated_at < cutoff)
+    )
+
+
+def fail_stale_imports(stale_minutes):
+    """把进程中断遗留的未完成导入标记为 failed（保留已提交的分块，可续传），返回条数"""
+    count = ImportRecord.query.filter(_stale_condition(stale_minutes)).update({
+        'import_status': 'failed',
+        'error_message': '导入进程已中断，可续传继续导入',
+        'updated_at': datetime.now()
+    }, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def claim_import(batch_no, stale_minutes):
+    """
+    续传前占用导入记录：条件 UPDATE 把 failed 或已中断的记录置为 queued 并提交
+
+    同一批次的并发续传只有一个请求能更新成功，返回是否占用成功。
+    """
+    claimed = ImportRecord.query.filter(
+        ImportRecord.batch_no == batch_no,
+        or_(ImportRecord.import_status == 'failed', _stale_condition(stale_minutes))
+    ).update({
+        'import_status': 'queued',
+        'error_message': None,
+        'updated_at': datetime.now()
+    }, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def submit_import_job(app, batch_no, chunk_size):
+    """提交后台导入任务（导入记录需已落库为 queued）"""
+    executor = _get_executor(app.config.get('IMPORT_WORKERS', 2))
+    return executor.submit(_run_import_job, app, batch_no, chunk_size)
+
+
+def _run_import_job(app, batch_no, chunk_size):
+    with app.app_context():
+        try:
+            import_record = ImportRecord.query.filter_by(batch_no=batch_no).first()
+            if import_record is None:
+                logger.warning(f"导入记录不存在，跳过后台导入: {batch_no}")
+                return
+            dept_errors = execute_chunked_import(import_record, chunk_size)
+            if dept_errors:
+                logger.info(f"后台导入部门验证失败: {batch_no}，{len(dept_errors)} 个序号")
+        except Exception:
+            # execute_chunked_import 已将记录标记为 failed 并保存失败原因
+            logger.exception(f"后台导入失败: {batch_no}")
+        finally:
+            db.session.remove()
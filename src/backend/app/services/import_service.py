@@ -0,0 +1,822 @@
+"""
+Excel 导入的批量处理逻辑。
+
+抽出为独立模块，便于：
+- HTTP handler（routes/import_data.py）调用
+- benchmarks/ 下的基准脚本直接调用，无需构造上传请求
+"""
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models.db import db
+from app.models.employee import Employee
+from app.models.project import Project
+from app.models.work_hour_data import WorkHourData
+from app.services.check_service import invalidate_user_states, merge_user_orders, refresh_user_states
+from app.services.rollup_service import refresh_rollup_weeks
+from app.services.dict_service import bump_dict_versions, WORK_HOURS_INSERT, WORK_HOURS_CHANGE, PROJECTS
+from app.utils.helpers import (
+    parse_hours_column, validate_work_hour_frame, iter_excel_batches, get_role_by_dept
+)
+
+_PROJECT_CODE_RE = re.compile(r'^([DP]\d+)')
+
+# 4种工时类型的字段映射（Excel 列名前缀 -> work_type）
+WORK_TYPE_COLUMNS = [
+    ('project_delivery', '项目交付-'),
+    ('product_research', '产品-'),
+    ('presales_support', '售前-'),
+    ('dept_internal', '部门-'),
+]
+LEAVE_HOURS_COLUMNS = ['请假-请假时长', '请假时长']
+LEAVE_TYPE_COLUMNS = ['请假-请假类别', '请假类别']
+
+# 必填字段：基础信息必须填写，工时类型至少要有一种
+REQUIRED_FIELDS = ['序号', '创建人', '开始时间', '结束时间', '审批结果', '审批状态']
+
+# 批量插入 work_hour_data 的列
+INSERT_FIELDS = [
+    'serial_no', 'user_name', 'start_time', 'end_time', 'work_type',
+    'project_name', 'project_manager', 'project_id', 'work_hours',
+    'overtime_hours', 'leave_hours', 'work_content', 'approval_result',
+    'approval_status', 'dept_name', 'import_batch_no'
+]
+
+# 分块导入保存的错误、重复详情各自的条数上限（超出部分只计入 invalid_rows / repeat_rows）
+CHUNKED_DETAIL_LIMIT = 1000
+
+# cover 策略覆盖写入的列
+_COVER_FIELDS = [
+    'end_time', 'approval_result', 'approval_status', 'work_hours',
+    'overtime_hours', 'leave_hours', 'project_manager', 'project_id',
+    'work_content', 'dept_name'
+]
+
+
+def _duplicate_key(user_name, start_time, project_name, work_type):
+    """唯一性判定键：同一人同一时间同一项目同一类型"""
+    return (user_name, start_time, project_name, work_type)
+
+
+def load_duplicate_index(records, batch_no):
+    """一次性加载本批记录可能命中的历史数据，构建内存哈希索引。
+
+    查询范围由本批涉及的用户名和 start_time 上下界限定，
+    替代逐条记录 `WorkHourData.query.filter(...).first()` 的 N 次往返。
+
+    参数:
+        records: 待导入的工时记录字典列表（尚未入库）
+        batch_no: 当前导入批次号（排除本批次）
+
+    返回:
+        dict: 唯一性键 -> [(id, import_batch_no), ...]
+    """
+    index = defaultdict(list)
+    if not records:
+        return index
+
+    user_names = {r['user_name'] for r in records}
+    min_start = min(r['start_time'] for r in records)
+    max_start = max(r['start_time'] for r in records)
+
+    rows = db.session.query(
+        WorkHourData.id,
+        WorkHourData.user_name,
+        WorkHourData.start_time,
+        WorkHourData.project_name,
+        WorkHourData.work_type,
+        WorkHourData.import_batch_no
+    ).filter(
+        WorkHourData.user_name.in_(user_names),
+        WorkHourData.start_time >= min_start,
+        WorkHourData.start_time <= max_start,
+        WorkHourData.import_batch_no != batch_no  # 排除当前批次
+    ).order_by(WorkHourData.id).all()
+
+    for row in rows:
+        key = _duplicate_key(row.user_name, row.start_time, row.project_name, row.work_type)
+        index[key].append((row.id, row.import_batch_no))
+    return index
+
+
+def find_duplicate(index, record):
+    """在索引中查找与 record 重复的历史记录，返回 (id, import_batch_no) 或 None"""
+    matches = index.get(_duplicate_key(
+        record['user_name'], record['start_time'], record['project_name'], record['work_type']
+    ))
+    return matches[0] if matches else None
+
+
+def take_duplicate(index, record):
+    """cover 策略下取出被覆盖的历史记录。
+
+    被覆盖的记录会改写为当前批次，之后不应再被本批其他记录命中，
+    因此从索引中移除（与逐条查询时 `import_batch_no != batch_no` 的语义一致）。
+    """
+    key = _duplicate_key(record['user_name'], record['start_time'], record['project_name'], record['work_type'])
+    matches = index.get(key)
+    if not matches:
+        return None
+    existing = matches.pop(0)
+    if not matches:
+        del index[key]
+    return existing
+
+
+def build_cover_mapping(existing_id, record, batch_no):
+    """构造 cover 策略的更新字典（供 bulk_update_mappings 使用）"""
+    mapping = {field: record[field] for field in _COVER_FIELDS}
+    mapping.update({
+        'id': existing_id,
+        'import_batch_no': batch_no,
+        'updated_at': datetime.now()
+    })
+    return mapping
+
+
+def apply_cover_updates(cover_mappings):
+    """将 cover 策略的所有更新合并为一次批量 UPDATE"""
+    if cover_mappings:
+        db.session.bulk_update_mappings(WorkHourData, cover_mappings)
+
+
+def parse_project_name(project_name):
+    """
+    解析项目名称，提取项目代码、中文名称和类型
+
+    参数:
+        project_name: 项目名称（可能包含项目代码前缀）
+
+    返回:
+        (project_code, display_name, project_type, project_prefix)，不是正式项目则返回None
+    """
+    if not project_name:
+        return None
+
+    # 判断是否为正式项目（D或P开头）
+    if project_name.startswith('D'):
+        project_type = 'delivery'
+        project_prefix = 'D'
+    elif project_name.startswith('P'):
+        project_type = 'research'
+        project_prefix = 'P'
+    else:
+        return None
+
+    # 生成项目代码：使用完整项目名称或提取数字部分
+    # 格式1: "D4086 智慧城市" -> 提取 "D4086"
+    # 格式2: "P 数字工厂2.0" -> 使用 "P 数字工厂2.0"
+    match = _PROJECT_CODE_RE.match(project_name)
+    if match:
+        # 有明确的项目编号，使用编号作为代码
+        project_code = match.group(1)
+    else:
+        # 使用项目名称的合适长度作为代码（最多20字符）
+        # 找第一个空格或标点符号作为分割点
+        for sep in [' ', '-', '_', '.']:
+            idx = project_name.find(sep)
+            if idx > 2:  # 至少保留 "D" 或 "P" 后面1个字符
+                project_code = project_name[:idx]
+                break
+        else:
+            # 没找到分隔符，使用全部（但限制长度）
+            project_code = project_name[:20]
+
+    # 提取中文名称（去掉项目代码前缀）
+    # 格式: "D4086 智慧城市" -> "智慧城市"
+    #      "P 数字工厂2.0" -> "数字工厂2.0"
+    display_name = project_name
+    if match:
+        # 有项目编号格式，去掉编号和后面的空格/符号
+        remainder = project_name[len(project_code):].strip()
+        # 去掉开头的分隔符（空格、-、_、.等）
+        for sep in [' ', '-', '_', '.', '、']:
+            if remainder.startswith(sep):
+                remainder = remainder[1:].strip()
+                break
+        display_name = remainder if remainder else project_name
+
+    return project_code, display_name, project_type, project_prefix
+
+
+class ProjectResolver:
+    """单次导入内共享的项目解析缓存（分块导入时各分块共用一个）。
+
+    - 构造时一次性加载 projects 表，建立 项目代码/中文名称 -> 项目 的字典；
+      加载的对象随即脱离会话，分块提交后不会过期重新查询
+    - 每个不同的项目名称只做一次正则解析
+    - 缺失的项目先在内存中登记，已有项目的名称/经理变更也只在内存中修改，
+      flush() 时分别一次批量 INSERT（并取回ID）、一次批量 UPDATE
+    """
+
+    def __init__(self):
+        self._by_code = {}
+        self._by_name = {}
+        projects = Project.query.all()
+        for project in projects:
+            db.session.expunge(project)
+            self._by_code[project.project_code] = project
+            self._by_name.setdefault(project.project_name, project)
+        self._parsed = {}
+        self._pending = []  # 待创建的项目（尚未入库的 Project 对象）
+        self._updated = {}  # 待更新的已有项目：id -> Project
+        self.changed = False  # 最近一次 resolve_ids 是否创建或更新过项目（数据字典据此失效）
+
+    def _parse(self, project_name):
+        if project_name not in self._parsed:
+            self._parsed[project_name] = parse_project_name(project_name)
+        return self._parsed[project_name]
+
+    def resolve(self, project_name, project_manager=''):
+        """
+        获取或登记项目（逻辑与原 get_or_create_project 一致）
+
+        返回:
+            Project 对象（新项目尚无ID），不是正式项目则返回None
+        """
+        parsed = self._parse(project_name)
+        if parsed is None:
+            return None
+        project_code, display_name, project_type, project_prefix = parsed
+
+        # 先尝试通过项目代码查找现有项目
+        existing = self._by_code.get(project_code)
+        if existing is not None:
+            # 如果找到了，更新中文名称和项目经理
+            if existing.project_name != display_name or (project_manager and existing.project_manager != project_manager):
+                if self._by_name.get(existing.project_name) is existing:
+                    del self._by_name[existing.project_name]
+                existing.project_name = display_name
+                self._by_name.setdefault(display_name, existing)
+                if project_manager:
+                    existing.project_manager = project_manager
+                existing.updated_at = datetime.now()
+                if existing.id is not None:
+                    self._updated[existing.id] = existing
+            return existing
+
+        # 再尝试通过中文名称查找（避免重复创建）
+        existing = self._by_name.get(display_name)
+        if existing is not None:
+            return existing
+
+        # 登记新项目（只保存中文名称），flush() 时批量创建
+        new_project = Project(
+            project_code=project_code,
+            project_name=display_name,
+            project_type=project_type,
+            project_prefix=project_prefix,
+            project_manager=project_manager,
+            status='active'
+        )
+        self._pending.append(new_project)
+        self._by_code[project_code] = new_project
+        self._by_name[display_name] = new_project
+        return new_project
+
+    def flush(self):
+        """批量更新变更的已有项目，批量创建登记的新项目（一次 executemany INSERT）并取回其ID"""
+        if self._updated:
+            self.changed = True
+            db.session.bulk_update_mappings(Project, [{
+                'id': p.id,
+                'project_name': p.project_name,
+                'project_manager': p.project_manager,
+                'updated_at': p.updated_at
+            } for p in self._updated.values()])
+            self._updated = {}
+        if not self._pending:
+            return
+        self.changed = True
+        now = datetime.now()
+        db.session.execute(Project.__table__.insert(), [{
+            'project_code': p.project_code,
+            'project_name': p.project_name,
+            'project_type': p.project_type,
+            'project_prefix': p.project_prefix,
+            'project_manager': p.project_manager,
+            'status': p.status,
+            'created_at': now,
+            'updated_at': now
+        } for p in self._pending])
+
+        code_to_id = dict(db.session.query(Project.project_code, Project.id).filter(
+            Project.project_code.in_([p.project_code for p in self._pending])
+        ).all())
+        for p in self._pending:
+            p.id = code_to_id.get(p.project_code)
+        self._pending = []
+
+    def resolve_ids(self, project_names, project_managers):
+        """
+        按顺序解析一组 (项目名称, 项目经理)，创建缺失项目后返回对应的项目ID列表
+
+        非正式项目对应位置为 None
+        """
+        self.changed = False
+        projects = [self.resolve(name, manager) for name, manager in zip(project_names, project_managers)]
+        self.flush()
+        return [p.id if p is not None else None for p in projects]
+
+
+def _text_column(df, field, default=''):
+    """逐格 str(v).strip()，空值（NaN/None）取 default；列不存在时全部取 default"""
+    if field not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    col = df[field]
+    return col.map(str).str.strip().where(col.notna(), default)
+
+
+def _hours_column(df, field):
+    """解析时长列，空值为0；无法解析时抛出 ValueError（与逐行 float() 行为一致）"""
+    if field not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    hours, error_messages = parse_hours_column(df[field])
+    if error_messages:
+        raise ValueError(next(iter(error_messages.values())))
+    return hours
+
+
+def melt_work_types(df, start_times, end_times, batch_no, serial_final_dept=None):
+    """
+    将宽表（每行含4种工时类型 + 请假列）一次性展开为长表，每条工时记录一行
+
+    参数:
+        df: 已通过验证的 Excel 数据（read_excel_data 的结果）
+        start_times/end_times: 与 df 同索引的已解析时间
+        batch_no: 导入批次号
+        serial_final_dept: 序号->部门映射（已验证一致性）
+
+    返回: DataFrame，列为 INSERT_FIELDS（project_id 待填充）+ row_index（原 df 索引）
+        + start_time_text（开始时间原值），按 (原行, 工时类型顺序) 排序
+    """
+    serial_no = _text_column(df, '序号')
+    base = pd.DataFrame({
+        'row_index': df.index,
+        'serial_no': serial_no,
+        'user_name': _text_column(df, '创建人'),
+        'start_time': start_times.dt.date,
+        'end_time': end_times.dt.date,
+        'start_time_text': _text_column(df, '开始时间'),
+        'approval_result': _text_column(df, '审批结果'),
+        'approval_status': _text_column(df, '审批状态'),
+        'import_batch_no': batch_no,
+    }, index=df.index)
+
+    # 部门：优先使用验证后的部门映射，兼容旧逻辑从当前行获取
+    dept_name = _text_column(df, '部门')
+    if serial_final_dept:
+        mapped = serial_no.map(serial_final_dept)
+        dept_name = mapped.where(mapped.notna(), dept_name)
+    base['dept_name'] = dept_name
+
+    parts = []
+    for order, (work_type, prefix) in enumerate(WORK_TYPE_COLUMNS):
+        work_hours = _hours_column(df, f'{prefix}工作时长')
+        overtime_hours = _hours_column(df, f'{prefix}加班时长')
+        # 创建条件：必须有工作时长或加班时长（避免创建空记录）
+        keep = (work_hours > 0) | (overtime_hours > 0)
+        if not keep.any():
+            continue
+        project_name = _text_column(df, f'{prefix}项目名称')
+        part = base[keep].assign(
+            work_type=work_type,
+            project_name=project_name[keep].replace('', f"{prefix.replace('-', '')}工时"),
+            project_manager=_text_column(df, f'{prefix}项目经理')[keep],
+            work_content=_text_column(df, f'{prefix}工作内容')[keep],
+            work_hours=work_hours[keep],
+            overtime_hours=overtime_hours[keep],
+            leave_hours=0.0,
+            _order=order
+        )
+        parts.append(part)
+
+    # 处理请假记录（支持多种列名格式），只有当列存在且请假时长大于0时才创建
+    leave_hours_field = next((c for c in LEAVE_HOURS_COLUMNS if c in df.columns), None)
+    if leave_hours_field is not None:
+        leave_hours = _hours_column(df, leave_hours_field)
+        keep = leave_hours > 0
+        if keep.any():
+            leave_type_field = next((c for c in LEAVE_TYPE_COLUMNS if c in df.columns), None)
+            if leave_type_field is not None:
+                leave_type = _text_column(df, leave_type_field, '请假').replace('', '请假')
+            else:
+                leave_type = pd.Series('请假', index=df.index, dtype=object)
+            parts.append(base[keep].assign(
+                work_type='leave',
+                project_name=leave_type[keep],
+                project_manager='',
+                work_content=leave_type[keep],
+                work_hours=0.0,
+                overtime_hours=0.0,
+                leave_hours=leave_hours[keep],
+                _order=len(WORK_TYPE_COLUMNS)
+            ))
+
+    columns = ['row_index', 'start_time_text'] + [f for f in INSERT_FIELDS if f != 'project_id']
+    if not parts:
+        return pd.DataFrame(columns=columns + ['project_id'])
+
+    long_df = pd.concat(parts, ignore_index=True)
+    long_df = long_df.sort_values(['row_index', '_order'], kind='stable').reset_index(drop=True)
+    long_df = long_df[columns]
+    long_df['project_id'] = None
+    return long_df
+
+
+def bulk_insert_records(records):
+    """一次 executemany INSERT 写入工时记录（records 为含 INSERT_FIELDS 的字典列表）"""
+    if not records:
+        return
+    now = datetime.now()
+    db.session.execute(WorkHourData.__table__.insert(), [
+        dict({field: record[field] for field in INSERT_FIELDS},
+             import_time=now, created_at=now, updated_at=now)
+        for record in records
+    ])
+
+
+def resolve_serial_departments(frames):
+    """
+    构建序号->部门的映射，并验证部门一致性
+
+    参数:
+        frames: DataFrame 的可迭代对象（整表时传 [df]，分块导入时传 iter_excel_batches 的结果）
+
+    返回: (serial_final_dept, serial_user_map, dept_errors, total_rows)
+        serial_final_dept: 序号 -> 最终部门值
+        serial_user_map: 序号 -> 用户名
+        dept_errors: [{'serial_no', 'user_name', 'rows', 'error'}, ...]
+        total_rows: 数据总行数
+    """
+    serial_dept_map = {}  # 序号 -> 部门值列表
+    serial_dept_rows = {}  # 序号 -> 行号列表（用于报错）
+    serial_user_map = {}  # 序号 -> 用户名
+    total_rows = 0
+
+    for df in frames:
+        total_rows += len(df)
+        if '序号' not in df.columns:
+            continue
+        serial_col = df['序号']
+        # 使用"创建人部门"字段（列45）作为部门数据来源
+        dept_col = df['创建人部门'] if '创建人部门' in df.columns else pd.Series(None, index=df.index, dtype=object)
+        user_col = df['创建人'] if '创建人' in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+        for idx, serial_val, creator_dept_val, user_val in zip(df.index, serial_col, dept_col, user_col):
+            if pd.isna(serial_val):
+                continue
+
+            serial_no = str(serial_val).strip()
+            dept_name = str(creator_dept_val).strip() if pd.notna(creator_dept_val) else None
+            user_name = str(user_val).strip() if pd.notna(user_val) else ''
+
+            if serial_no not in serial_dept_map:
+                serial_dept_map[serial_no] = []
+                serial_dept_rows[serial_no] = []
+                serial_user_map[serial_no] = user_name
+
+            serial_dept_map[serial_no].append(dept_name)
+            serial_dept_rows[serial_no].append(idx + 2)
+
+    serial_final_dept = {}  # 序号 -> 最终部门值
+    dept_errors = []
+
+    # 第一遍：检查 Excel 数据一致性并收集需要从数据库查询的序号
+    empty_dept_serials = []  # 需要从数据库查询部门的序号列表
+
+    for serial_no, dept_list in serial_dept_map.items():
+        # 获取所有非空部门值
+        non_empty_depts = [d for d in dept_list if d is not None and d != '']
+        user_name = serial_user_map.get(serial_no, '')
+
+        if len(set(non_empty_depts)) > 1:
+            # "创建人部门"值不一致 - 这是硬错误，无法通过数据库查询解决
+            dept_errors.append({
+                'serial_no': serial_no,
+                'user_name': user_name,
+                'rows': serial_dept_rows[serial_no],
+                'error': f'该序号的"创建人部门"字段不一致，存在多个值：{", ".join(set(non_empty_depts))}'
+            })
+        elif non_empty_depts:
+            # Excel中有有效的部门值
+            serial_final_dept[serial_no] = non_empty_depts[0]
+        else:
+            # Excel中"创建人部门"为空，需要从数据库查询
+            empty_dept_serials.append(serial_no)
+
+    # 第二遍：批量查询 employees 表进行补充
+    if empty_dept_serials:
+        # 提取需要查询的唯一用户名列表
+        unique_user_names = list(set([
+            serial_user_map.get(s, '') for s in empty_dept_serials
+        ]))
+
+        # 批量查询 employees 表（单次查询，避免 N+1 问题）
+        employees = Employee.query.filter(
+            Employee.employee_name.in_(unique_user_names)
+        ).all()
+
+        # 构建 user_name -> dept_name 映射
+        user_dept_map = {emp.employee_name: emp.dept_name for emp in employees}
+
+        # 为每个空部门的序号分配从数据库查到的部门
+        for serial_no in empty_dept_serials:
+            user_name = serial_user_map.get(serial_no, '')
+
+            if user_name in user_dept_map:
+                # 从 employees 表查到部门信息，自动补充
+                serial_final_dept[serial_no] = user_dept_map[user_name]
+            else:
+                # employees 表中也没有该用户 - 报错
+                dept_errors.append({
+                    'serial_no': serial_no,
+                    'user_name': user_name,
+                    'rows': serial_dept_rows[serial_no],
+                    'error': f'该序号的"创建人部门"字段为空，且系统中未找到员工"{user_name}"的部门信息，请前往"系统设置-员工管理"配置该员工的部门'
+                })
+
+    return serial_final_dept, serial_user_map, dept_errors, total_rows
+
+
+def sync_employees(serial_final_dept, serial_user_map):
+    """
+    自动填充 employees 表（新增员工记录，更新部门变化的员工）
+
+    一次预加载涉及的员工，在内存中与 serial_final_dept 比对，新增与部门变化合并为一条
+    INSERT ... ON CONFLICT(employee_name) DO UPDATE；不单独提交，与工时数据同一事务。
+    """
+    user_names = {serial_user_map.get(serial_no, '') for serial_no in serial_final_dept} - {''}
+    if not user_names:
+        return
+
+    existing_depts = dict(
+        db.session.query(Employee.employee_name, Employee.dept_name)
+        .filter(Employee.employee_name.in_(user_names))
+        .all()
+    )
+
+    # 员工 -> 目标部门：新员工取首次出现的部门，已有员工取最后一次出现的部门
+    target_depts = {}
+    for serial_no, dept_value in serial_final_dept.items():
+        user_name = serial_user_map.get(serial_no, '')
+        if not user_name:
+            continue
+        if user_name in existing_depts:
+            target_depts[user_name] = dept_value
+        else:
+            target_depts.setdefault(user_name, dept_value)
+
+    now = datetime.now()
+    rows = []
+    created_count = 0
+    for user_name, dept_value in target_depts.items():
+        if user_name in existing_depts:
+            if existing_depts[user_name] == dept_value:
+                continue
+        else:
+            created_count += 1
+        rows.append({
+            'employee_name': user_name,
+            'dept_name': dept_value,
+            'role': get_role_by_dept(dept_value),  # 仅新增时生效，已有员工保留原角色
+            'created_at': now,
+            'updated_at': now
+        })
+
+    if not rows:
+        return
+
+    stmt = sqlite_insert(Employee.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['employee_name'],
+        set_={'dept_name': stmt.excluded.dept_name, 'updated_at': stmt.excluded.updated_at}
+    )
+    db.session.execute(stmt, rows)
+
+    if created_count:
+        print(f"自动创建 {created_count} 条员工记录")
+    if len(rows) > created_count:
+        print(f"自动更新 {len(rows) - created_count} 条员工记录")
+
+
+def import_frame(df, batch_no, duplicate_strategy, serial_final_dept, project_resolver=None):
+    """
+    导入一个 DataFrame（整表或一个分块）：验证、展开、解析项目、查重，写入会话但不提交
+
+    分块导入时由调用方传入整个导入共用的 project_resolver，不传则新建一个
+
+    覆盖策略改动了已有工时的员工只标记覆盖状态待重建，由调用方在整个导入结束时
+    调用 refresh_user_states(covered_users) 重建一次。
+
+    返回: dict(success_rows, repeat_rows, invalid_rows, errors, repeats, covered_users)
+    """
+    success_rows = 0
+    repeat_rows = 0
+    repeats = []  # 存储重复数据详情
+
+    # 整表验证必填字段、审批结果/状态、时长范围，并解析时间
+    valid_mask, errors, start_times, end_times = validate_work_hour_frame(df, REQUIRED_FIELDS)
+    invalid_rows = int((~valid_mask).sum())
+
+    # 宽表展开为长表：每条工时记录一行（按工时类型拆分）
+    valid_df = df[valid_mask]
+    long_df = melt_work_types(
+        valid_df, start_times[valid_mask], end_times[valid_mask], batch_no,
+        serial_final_dept  # 传递已验证的部门映射
+    )
+
+    # 验证至少有一种工时类型
+    for idx in valid_df.index.difference(pd.Index(long_df['row_index'].unique())):
+        invalid_rows += 1
+        errors.append({
+            'row': idx + 2,
+            'field': '工时数据',
+            'error': '至少需要一种工时类型的数据（项目交付/产研项目/售前支持/部门内务/请假）'
+        })
+    errors.sort(key=lambda e: e['row'])
+
+    # 获取或创建项目ID（请假记录不关联项目），新项目一次批量创建
+    if project_resolver is None:
+        project_resolver = ProjectResolver()  # 预加载项目表，同名项目只解析一次
+    is_project = long_df['work_type'] != 'leave'
+    long_df.loc[is_project, 'project_id'] = project_resolver.resolve_ids(
+        long_df.loc[is_project, 'project_name'], long_df.loc[is_project, 'project_manager']
+    )
+    pending_records = long_df.to_dict('records')
+
+    # 检查唯一性：一次性加载历史数据构建索引（同一人同一时间同一项目同一类型）
+    duplicate_index = load_duplicate_index(pending_records, batch_no)
+    cover_mappings = []
+    new_records = []
+    changed_starts = set()  # 新增或被覆盖工时的 (员工, 开始日期)，据此重算周汇总
+    covered_users = set()  # 已有工单被覆盖的员工
+
+    for record in pending_records:
+        if duplicate_strategy == 'cover':
+            existing = take_duplicate(duplicate_index, record)
+        else:
+            existing = find_duplicate(duplicate_index, record)
+
+        if existing:
+            existing_id, existing_batch_no = existing
+            # 记录重复数据详情
+            repeats.append({
+                'row': record['row_index'] + 2,
+                'field': '数据重复',
+                'error': f"创建人{record['user_name']}、时间{record['start_time_text']}、项目{record['project_name']}、类型{record['work_type']}的数据已存在",
+                'existing_batch': existing_batch_no
+            })
+
+            if duplicate_strategy == 'cover':
+                # 更新现有记录（最后统一批量 UPDATE）
+                cover_mappings.append(build_cover_mapping(existing_id, record, batch_no))
+                changed_starts.add((record['user_name'], record['start_time']))
+                covered_users.add(record['user_name'])
+            repeat_rows += 1
+        else:
+            # 添加新记录（最后统一批量 INSERT）
+            new_records.append(record)
+            changed_starts.add((record['user_name'], record['start_time']))
+            success_rows += 1
+
+    bulk_insert_records(new_records)
+    apply_cover_updates(cover_mappings)
+    # 工单覆盖状态（完整性检查据此判断缓存是否可复用）：被覆盖的员工标记待重建，新增工单增量并入
+    invalidate_user_states(covered_users)
+    merge_user_orders(new_records)
+    # 重算受影响员工在涉及各周的工时周汇总（统计、查询汇总从汇总表读取）
+    refresh_rollup_weeks(changed_starts)
+    # 数据字典失效：新增工时只需增量合并，覆盖会改动已有记录，需全量重建
+    dict_scopes = []
+    if new_records:
+        dict_scopes.append(WORK_HOURS_INSERT)
+    if cover_mappings:
+        dict_scopes.append(WORK_HOURS_CHANGE)
+    if project_resolver.changed:
+        dict_scopes.append(PROJECTS)
+    bump_dict_versions(*dict_scopes)
+
+    return {
+        'success_rows': success_rows,
+        'repeat_rows': repeat_rows,
+        'invalid_rows': invalid_rows,
+        'errors': errors,
+        'repeats': repeats,
+        'covered_users': covered_users
+    }
+
+
+def _mark_failed(import_record, error):
+    """回滚当前分块并将导入记录标记为 failed（已提交的分块保留，可续传）"""
+    db.session.rollback()
+    import_record.import_status = 'failed'
+    import_record.error_message = str(error)
+    db.session.commit()
+
+
+def execute_chunked_import(import_record, chunk_size):
+    """
+    执行（或续传）一个分块导入：scanning -> importing -> success/failed
+
+    导入记录需已落库且 file_path 指向上传文件；同步请求与后台任务共用。
+    部门验证失败时不写入任何工时数据，记录标记为 failed 并返回 dept_errors
+    （保留上传文件，修正员工部门后可续传）；其他异常标记 failed 后重新抛出。
+
+    返回: dept_errors（成功时为空列表）
+    """
+    file_path = import_record.file_path
+    try:
+        import_record.import_status = 'scanning'
+        import_record.error_message = None
+        if import_record.processed_rows == 0:
+            # 尚未提交任何分块：清掉上一次部门验证失败留下的详情
+            import_record.error_details = None
+            import_record.repeat_details = None
+        db.session.commit()
+
+        # 第一遍流式扫描：构建序号->部门映射并统计总行数（部门映射不落库，续传时重新扫描）
+        serial_final_dept, serial_user_map, dept_errors, total_rows = resolve_serial_departments(
+            iter_excel_batches(file_path, batch_size=chunk_size)
+        )
+        if dept_errors:
+            import_record.import_status = 'failed'
+            import_record.error_message = f'部门字段验证失败，发现{len(dept_errors)}个序号的部门数据存在问题'
+            import_record.error_details = json.dumps([{
+                'row': err['rows'][0],
+                'field': '创建人部门',
+                'error': f"序号{err['serial_no']}：{err['error']}"
+            } for err in dept_errors], ensure_ascii=False)
+            db.session.commit()
+            return dept_errors
+
+        import_record.total_rows = total_rows
+        sync_employees(serial_final_dept, serial_user_map)
+        import_record.import_status = 'importing'
+        db.session.commit()
+    except Exception as e:
+        _mark_failed(import_record, e)
+        raise
+
+    run_chunked_import(import_record, file_path, serial_final_dept, chunk_size)
+    return []
+
+
+def run_chunked_import(import_record, file_path, serial_final_dept, chunk_size):
+    """
+    分块导入：每块独立事务提交，进度写入 import_record.processed_rows
+
+    从 import_record.processed_rows 处继续（失败后重新调用即为断点续传），
+    success_rows/repeat_rows/invalid_rows 跨块累加；错误、重复详情各只保存前
+    CHUNKED_DETAIL_LIMIT 条，达到上限后不再序列化，超出部分只体现在计数中。
+    任一分块失败时回滚该分块，将导入记录标记为 failed 后重新抛出异常。
+    """
+    batch_no = import_record.batch_no
+    # 续传时从已保存的详情继续累加（只解析一次；未达上限时每块整体序列化，数据量有上界）
+    errors = json.loads(import_record.error_details) if import_record.error_details else []
+    repeats = json.loads(import_record.repeat_details) if import_record.repeat_details else []
+    covered_users = set()  # 各分块中已有工单被覆盖的员工，导入结束时重建一次覆盖状态
+    try:
+        project_resolver = ProjectResolver()  # 各分块共用，项目表只加载一次
+        for chunk in iter_excel_batches(file_path, batch_size=chunk_size):
+            # 跳过已提交的行
+            chunk = chunk[chunk.index >= import_record.processed_rows]
+            if chunk.empty:
+                continue
+
+            result = import_frame(chunk, batch_no, import_record.duplicate_strategy, serial_final_dept,
+                                  project_resolver)
+
+            import_record.success_rows += result['success_rows']
+            import_record.repeat_rows += result['repeat_rows']
+            import_record.invalid_rows += result['invalid_rows']
+            covered_users |= result['covered_users']
+            if result['errors'] and len(errors) < CHUNKED_DETAIL_LIMIT:
+                errors.extend(result['errors'][:CHUNKED_DETAIL_LIMIT - len(errors)])
+                import_record.error_details = json.dumps(errors, ensure_ascii=False)
+            if result['repeats'] and len(repeats) < CHUNKED_DETAIL_LIMIT:
+                repeats.extend(result['repeats'][:CHUNKED_DETAIL_LIMIT - len(repeats)])
+                import_record.repeat_details = json.dumps(repeats, ensure_ascii=False)
+            import_record.processed_rows = int(chunk.index[-1]) + 1
+            db.session.commit()
+
+    except Exception as e:
+        _mark_failed(import_record, e)
+        raise
+
+    try:
+        refresh_user_states(covered_users)
+        import_record.import_status = 'success'
+        import_record.file_path = None
+        db.session.commit()
+    except Exception as e:
+        _mark_failed(import_record, e)
+        raise
+    if os.path.exists(file_path):
+        os.remove(file_path)
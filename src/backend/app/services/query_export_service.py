@@ -0,0 +1,92 @@
+"""
+工时查询结果导出（POST /query/export）。
+
+明细以 yield_per 分批读取，只取导出列、不构造 ORM 对象，逐行写出，内存占用与结果条数无关：
+- XLSX：openpyxl write-only 模式逐行写入，工作簿保存到临时文件（较小时留在内存，超过阈值转存磁盘），
+  由 send_file 分块返回，响应结束时关闭并删除
+- CSV：生成器分块产出响应内容（UTF-8 BOM，便于 Excel 直接打开），不落盘
+"""
+import csv
+import io
+import tempfile
+from datetime import date
+
+from openpyxl import Workbook
+
+from app.models.work_hour_data import WorkHourData
+from app.services.report_service import CSV_FLUSH_ROWS
+
+# (表头, 明细列)；工时表没有工作日期字段，保留空列与原导出格式一致
+EXPORT_COLUMNS = [
+    ('序号', WorkHourData.serial_no),
+    ('姓名', WorkHourData.user_name),
+    ('开始时间', WorkHourData.start_time),
+    ('结束时间', WorkHourData.end_time),
+    ('项目名称', WorkHourData.project_name),
+    ('工作时长', WorkHourData.work_hours),
+    ('加班时长', WorkHourData.overtime_hours),
+    ('审批结果', WorkHourData.approval_result),
+    ('审批状态', WorkHourData.approval_status),
+    ('项目经理', WorkHourData.project_manager),
+    ('部门', WorkHourData.dept_name),
+    ('工作日期', None),
+    ('导入批次', WorkHourData.import_batch_no),
+]
+
+# 每批从数据库读取的行数
+EXPORT_BATCH_ROWS = 2000
+# XLSX 临时文件超过该大小（字节）后转存磁盘
+XLSX_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def iter_export_rows(query, batch_size=EXPORT_BATCH_ROWS):
+    """按筛选后的明细查询流式产出导出行（单元格值列表，与 EXPORT_COLUMNS 对应）"""
+    columns = [column for _, column in EXPORT_COLUMNS if column is not None]
+    for row in query.with_entities(*columns).yield_per(batch_size):
+        values = iter(row)
+        yield [_cell(next(values)) if column is not None else '' for _, column in EXPORT_COLUMNS]
+
+
+def write_xlsx_export(rows):
+    """write-only 模式逐行写出 XLSX 到临时文件，返回已回到开头的文件对象（调用方负责关闭）"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('工时数据')
+    sheet.append([title for title, _ in EXPORT_COLUMNS])
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    try:
+        workbook.save(output)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+
+def stream_csv_export(rows):
+    """生成器：每 CSV_FLUSH_ROWS 行产出一块 CSV 内容"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield '\ufeff'.encode('utf-8')
+    writer.writerow([title for title, _ in EXPORT_COLUMNS])
+    pending = 1
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CSV_FLUSH_ROWS:
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+            yield chunk.encode('utf-8')
+    yield buffer.getvalue().encode('utf-8')
@@ -0,0 +1,174 @@
+"""
+核对结果导出。
+
+详情从 check_record_details 按 seq 流式读取，逐行写出，内存占用与结果条数无关：
+- CSV：生成器分块产出响应内容，同时写入报告目录，完整写完后才落盘供复用
+- XLSX：openpyxl write-only 模式逐行写入磁盘文件，不在内存中保留整个工作簿
+
+生成的文件路径写回 CheckRecord.report_path，再次下载同一格式直接读取磁盘文件。
+"""
+import csv
+import io
+import os
+import uuid
+
+from flask import current_app
+from openpyxl import Workbook
+
+from app.models.db import db
+from app.models.check_record import CheckRecord
+from app.services.check_service import iter_check_details
+
+REPORT_FORMATS = {
+    'csv': 'text/csv',  # 作为 mimetype 传入，Flask 自动补 charset=utf-8
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+INTEGRITY_COLUMNS = [
+    ('部门', 'deptName'),
+    ('姓名', 'userName'),
+    ('问题类型', 'issueType'),
+    ('工单序号', 'serialNo'),
+    ('开始日期', 'gapStartDate'),
+    ('结束日期', 'gapEndDate'),
+    ('影响工作日天数', 'affectedWorkdays'),
+    ('缺失工作日', 'missingDates'),
+    ('说明', 'description')
+]
+
+WORK_HOURS_COLUMNS = [
+    ('工单序号', 'serialNo'),
+    ('姓名', 'userName'),
+    ('开始时间', 'startTime'),
+    ('结束时间', 'endTime'),
+    ('项目交付(h)', 'projectDeliveryHours'),
+    ('产研项目(h)', 'productResearchHours'),
+    ('售前支持(h)', 'presalesSupportHours'),
+    ('部门内务(h)', 'deptInternalHours'),
+    ('工作时长总和(h)', 'totalWorkHours'),
+    ('请假(h)', 'leaveHours'),
+    ('应工作时长(h)', 'expectedWorkHours'),
+    ('法定工作时间(h)', 'legalWorkHours'),
+    ('差值(h)', 'difference'),
+    ('状态', 'status')
+]
+
+ISSUE_LABELS = {
+    'missing': '空缺',
+    'duplicate': '重复',
+    'normal': '正常',
+    'short': '偏低',
+    'excess': '偏高'
+}
+
+# CSV 每累积多少行向客户端产出一次
+CSV_FLUSH_ROWS = 500
+
+
+def _columns(check_type):
+    if check_type in ('integrity', 'integrity-consistency'):
+        return INTEGRITY_COLUMNS
+    return WORK_HOURS_COLUMNS
+
+
+def _row(item, columns):
+    """单条详情转为一行单元格值"""
+    values = []
+    for _, key in columns:
+        value = item.get(key)
+        if key in ('issueType', 'status'):
+            value = ISSUE_LABELS.get(value, value)
+        elif isinstance(value, list):
+            value = ', '.join(str(v) for v in value)
+        values.append('' if value is None else value)
+    return values
+
+
+def _part_path(path):
+    """写入中的临时文件（并发导出同一记录时互不覆盖）"""
+    return f'{path}.{uuid.uuid4().hex}.part'
+
+
+def report_file_path(check_no, fmt):
+    return os.path.join(current_app.config['REPORT_FOLDER'], f'{check_no}.{fmt}')
+
+
+def find_report(check_no, fmt):
+    """已生成过的导出文件路径，不存在返回 None"""
+    path = report_file_path(check_no, fmt)
+    return path if os.path.exists(path) else None
+
+
+def remove_reports(record):
+    """删除核对记录关联的全部导出文件"""
+    paths = {report_file_path(record.check_no, fmt) for fmt in REPORT_FORMATS}
+    if record.report_path:
+        paths.add(record.report_path)
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _set_report_path(check_no, path):
+    CheckRecord.query.filter_by(check_no=check_no).update({'report_path': path})
+    db.session.commit()
+
+
+def write_xlsx_report(record):
+    """write-only 模式逐行写出 XLSX 并落盘，返回文件路径"""
+    path = report_file_path(record.check_no, 'xlsx')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    columns = _columns(record.check_type)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('核对结果')
+    sheet.append([title for title, _ in columns])
+    for item in iter_check_details(record.check_no):
+        sheet.append(_row(item, columns))
+
+    part_path = _part_path(path)
+    workbook.save(part_path)
+    os.replace(part_path, path)
+    _set_report_path(record.check_no, path)
+    return path
+
+
+def stream_csv_report(record):
+    """
+    生成器：分块产出 CSV 内容（UTF-8 BOM，便于 Excel 直接打开），同时写入报告目录
+
+    写完最后一块才把临时文件改名为正式文件并记录 report_path；客户端中途断开时删除临时文件。
+    """
+    check_no = record.check_no
+    path = report_file_path(check_no, 'csv')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_path = _part_path(path)
+    columns = _columns(record.check_type)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    part_file = open(part_path, 'w', encoding='utf-8-sig', newline='')
+    try:
+        yield '\ufeff'.encode('utf-8')
+        writer.writerow([title for title, _ in columns])
+        pending = 1
+        for item in iter_check_details(check_no):
+            writer.writerow(_row(item, columns))
+            pending += 1
+            if pending >= CSV_FLUSH_ROWS:
+                chunk = buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+                part_file.write(chunk)
+                yield chunk.encode('utf-8')
+        chunk = buffer.getvalue()
+        part_file.write(chunk)
+        part_file.close()
+        os.replace(part_path, path)
+        _set_report_path(check_no, path)
+        yield chunk.encode('utf-8')
+    finally:
+        if not part_file.closed:
+            part_file.close()
+            os.remove(part_path)
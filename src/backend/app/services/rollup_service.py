@@ -0,0 +1,151 @@
+"""
+工时周汇总（work_hour_rollups）的维护与读取。
+
+- 维护：导入、删除工时后按涉及的 (员工, 周) 重算这些汇总行（删除后由明细重新 GROUP BY），
+  再按其中涉及的 (周, 项目) 由员工周汇总重算项目周汇总（work_hour_project_rollups），
+  与明细表在同一事务内提交，不做增减量运算，避免浮点误差累积
+- 读取：rollup_source() 返回与明细同名列的汇总数据源，统计时对其求和即可；
+  by_user=False 时读取项目周汇总，行数只随项目数、周数增长；
+  带日期范围（完全包含）时，周一不早于 start 且 周一 + span_days 不晚于 end 的汇总组直接取汇总，
+  只有 start 所在的不完整周回查明细
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import Date, bindparam, func, literal, select, text, union_all
+
+from app.migrations import WORK_HOUR_PROJECT_ROLLUP_INSERT, WORK_HOUR_ROLLUP_INSERT
+from app.models.db import db
+from app.models.work_hour_data import WorkHourData
+from app.models.work_hour_rollup import WorkHourProjectRollup, WorkHourRollup
+from app.utils.helpers import chunks
+
+_REFRESH_SQL = text(WORK_HOUR_ROLLUP_INSERT.format(where='WHERE user_name IN :names')).bindparams(
+    bindparam('names', expanding=True)
+)
+_REFRESH_WEEK_SQL = text(WORK_HOUR_ROLLUP_INSERT.format(
+    where='WHERE user_name IN :names AND start_time BETWEEN :week_start AND :week_end'
+)).bindparams(
+    bindparam('names', expanding=True), bindparam('week_start', type_=Date), bindparam('week_end', type_=Date)
+)
+_REFRESH_PROJECT_SQL = text(WORK_HOUR_PROJECT_ROLLUP_INSERT.format(
+    where='WHERE week_start = :week_start AND project_id IN :project_ids'
+)).bindparams(
+    bindparam('project_ids', expanding=True), bindparam('week_start', type_=Date)
+)
+
+# 汇总数据源的维度列（不含计数与工时合计）
+_USER_KEYS = ('project_id', 'project_name', 'project_manager', 'user_name', 'dept_name', 'work_type')
+_PROJECT_KEYS = ('project_id', 'project_name', 'work_type')
+
+
+def _rollup_projects(criteria):
+    """员工周汇总中满足条件的 {week_start: {project_id}}"""
+    projects_by_week = defaultdict(set)
+    rows = db.session.query(WorkHourRollup.week_start, WorkHourRollup.project_id).filter(*criteria).distinct()
+    for week_start, project_id in rows:
+        projects_by_week[week_start].add(project_id)
+    return projects_by_week
+
+
+def _refresh_project_rollups(projects_by_week):
+    """由员工周汇总重算指定 (周, 项目) 的项目周汇总"""
+    for week_start, project_ids in sorted(projects_by_week.items()):
+        for ids in chunks(sorted(project_ids)):
+            WorkHourProjectRollup.query.filter(
+                WorkHourProjectRollup.week_start == week_start,
+                WorkHourProjectRollup.project_id.in_(ids)
+            ).delete(synchronize_session=False)
+            db.session.execute(_REFRESH_PROJECT_SQL, {'project_ids': ids, 'week_start': week_start})
+
+
+def refresh_rollups(user_names):
+    """重算指定员工全部历史的周汇总及涉及的项目周汇总，写入会话但不提交（供直接改写明细的脚本使用）"""
+    projects_by_week = defaultdict(set)
+    for names in chunks(sorted({u for u in user_names if u})):
+        criteria = (WorkHourRollup.user_name.in_(names),)
+        for week_start, project_ids in _rollup_projects(criteria).items():
+            projects_by_week[week_start] |= project_ids
+        WorkHourRollup.query.filter(*criteria).delete(synchronize_session=False)
+        db.session.execute(_REFRESH_SQL, {'names': names})
+        for week_start, project_ids in _rollup_projects(criteria).items():
+            projects_by_week[week_start] |= project_ids
+    _refresh_project_rollups(projects_by_week)
+
+
+def refresh_rollup_weeks(user_starts):
+    """
+    重算指定员工在指定周的汇总行，写入会话但不提交
+
+    导入、删除工时后调用，user_starts 为新增、覆盖或删除的工时的 (user_name, start_time)。
+    按周分组，每周对涉及的员工删除并重新聚合一次（走 (user_name, start_time) 复合索引），
+    代价与本批工时涉及的员工、周数成正比，与员工的历史工时量无关。
+    重算前后这些员工出现过的项目，其当周的项目周汇总随后一并重算。
+    """
+    names_by_week = defaultdict(set)
+    for user_name, start_time in user_starts:
+        if user_name:
+            names_by_week[start_time - timedelta(days=start_time.weekday())].add(user_name)
+
+    projects_by_week = defaultdict(set)
+    for week_start, user_names in sorted(names_by_week.items()):
+        for names in chunks(sorted(user_names)):
+            criteria = (WorkHourRollup.week_start == week_start, WorkHourRollup.user_name.in_(names))
+            projects_by_week[week_start] |= _rollup_projects(criteria)[week_start]
+            WorkHourRollup.query.filter(*criteria).delete(synchronize_session=False)
+            db.session.execute(_REFRESH_WEEK_SQL, {
+                'names': names, 'week_start': week_start, 'week_end': week_start + timedelta(days=6)
+            })
+            projects_by_week[week_start] |= _rollup_projects(criteria)[week_start]
+    _refresh_project_rollups(projects_by_week)
+
+
+def keyword_filter(columns, field, keyword):
+    """子串匹配条件：columns 为明细表时走子串检索索引，为汇总表时用 LIKE"""
+    if columns is WorkHourData.__table__.c:
+        return WorkHourData.search_filter(field, keyword)
+    return columns[field].like(f'%{keyword}%')
+
+
+def rollup_source(criteria, start=None, end=None, by_user=True):
+    """
+    汇总数据源子查询
+
+    列：project_id、project_name、project_manager、user_name、dept_name、work_type、
+    row_count、work_hours、overtime_hours（项目经理为空记为 ''，未关联项目记为 0）。
+    by_user=False 时读取项目周汇总，只有 project_id、project_name、work_type 三个维度列，
+    适合只按项目、工时类型过滤和分组的统计。
+    criteria(columns) 返回过滤条件列表，分别作用于汇总表和明细表的同名列；
+    start/end 为完全包含的日期范围（工时开始、结束日期都在范围内），不传则不限日期。
+
+    同组工时的跨度相同，周一不早于 start 的组是否完全落在范围内逐组由 周一 + span_days 判断；
+    开始日期早于 start 之后第一个周一的工时（start 所在的不完整周）回查明细。
+    """
+    keys = _USER_KEYS if by_user else _PROJECT_KEYS
+    r = (WorkHourRollup if by_user else WorkHourProjectRollup).__table__.c
+    rollup_part = select(
+        *(r[key] for key in keys), r.row_count, r.work_hours, r.overtime_hours
+    ).where(*criteria(r))
+    if start is None or end is None:
+        return rollup_part.subquery()
+
+    first = start + timedelta(days=-start.weekday() % 7)  # start 当天或之后的第一个周一
+    rollup_part = rollup_part.where(
+        r.week_start.between(first, end),
+        func.julianday(r.week_start) + r.span_days <= func.julianday(end)
+    )
+    if first == start:
+        return rollup_part.subquery()
+
+    w = WorkHourData.__table__.c
+    detail_columns = {
+        'project_id': func.coalesce(w.project_id, 0).label('project_id'),
+        'project_manager': func.coalesce(w.project_manager, '').label('project_manager'),
+    }
+    detail_part = select(
+        *(detail_columns.get(key, w[key]) for key in keys),
+        literal(1).label('row_count'), w.work_hours, w.overtime_hours
+    ).where(*criteria(w), w.start_time >= start, w.start_time < first, w.end_time <= end)
+    if first > end:
+        return detail_part.subquery()
+    return union_all(rollup_part, detail_part).subquery()
@@ -0,0 +1,55 @@
+"""
+系统配置（sys_config）的类型化读取。
+
+核对逻辑用到的 check.* 配置在一次请求（应用上下文）内只查询一次，缓存在 flask.g 上，
+循环中直接读取属性，不再逐条查询；缓存随请求结束丢弃，配置修改后下一个请求即生效。
+"""
+import json
+
+from flask import g, current_app
+
+from app.models.sys_config import SysConfig
+
+# 配置键 -> (属性名, Config 中的默认值属性)
+_CHECK_KEYS = {
+    'check.standard_hours': ('standard_hours', 'COMPLIANCE_STANDARD_HOURS'),
+}
+
+
+class CheckSettings:
+    """check.* 配置（已按 config_type 转换类型；缺失或格式错误时取 Config 默认值）"""
+
+    __slots__ = ('standard_hours',)
+
+    def __init__(self, values):
+        for key, (attr, default_attr) in _CHECK_KEYS.items():
+            value = values.get(key)
+            if value is None:
+                value = current_app.config.get(default_attr)
+            setattr(self, attr, value)
+
+
+def _convert(config):
+    """按 config_type 转换配置值，无法转换时返回 None"""
+    value = config.config_value
+    try:
+        if config.config_type == 'number':
+            number = float(value)
+            return int(number) if number.is_integer() else number
+        if config.config_type == 'boolean':
+            return value in ('true', '1')
+        if config.config_type == 'json':
+            return json.loads(value)
+    except (TypeError, ValueError):
+        return None
+    return value
+
+
+def get_check_settings():
+    """当前请求的 check.* 配置（一次查询，请求内缓存）"""
+    settings = g.get('_check_settings')
+    if settings is None:
+        configs = SysConfig.query.filter(SysConfig.config_key.in_(list(_CHECK_KEYS))).all()
+        settings = CheckSettings({config.config_key: _convert(config) for config in configs})
+        g._check_settings = settings
+    return settings
@@ -3,9 +3,12 @@
 """
 import os
 import json
+import base64
 from datetime import datetime, timedelta, date
+import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
+from sqlalchemy import and_, or_, func
 
 def generate_batch_no(prefix='IMP'):
     """生成批次号"""
@@ -15,9 +18,21 @@ def generate_batch_no(prefix='IMP'):
     random_num = random.randint(1000, 9999)
     return f'{prefix}_{timestamp}_{random_num}'
 
-def validate_excel_file(file_path):
+class ImportRowLimitError(ValueError):
+    """Excel 数据行数超过 import.max_rows 限制"""
+
+
+# 区分表头格式的关键字段：精简版第一行包含此字段，
+# 原始版第一行列12-15是"当前项目交付工时"（重复），第二行才有完整字段名
+_CRITICAL_HEADER_FIELD = '项目交付-项目名称'
+
+
+def validate_excel_file(file_path, max_size_mb=10):
     """
-    验证Excel文件
+    验证Excel文件（仅检查扩展名和大小，不打开工作簿；内容在 iter_excel_batches 中一次解析）
+
+    参数:
+        max_size_mb: 文件大小上限（MB），普通导入按 import.max_file_size，分块导入按 MAX_CONTENT_LENGTH
 
     返回: (is_valid, error_message)
     """
@@ -26,100 +41,132 @@ def validate_excel_file(file_path):
         if not file_path.endswith(('.xls', '.xlsx')):
             return False, '文件格式错误，仅支持.xlsx或.xls格式'
 
-        # 检查文件大小（10MB限制）
+        # 检查文件大小
         file_size = os.path.getsize(file_path)
-        if file_size > 10 * 1024 * 1024:
-            return False, '文件大小超过10MB限制'
-
-        # 尝试读取文件
-        wb = load_workbook(file_path, read_only=True, data_only=True)
-        ws = wb.active
-
-        # 检查是否有数据
-        if ws.max_row < 2:
-            return False, 'Excel文件没有数据'
+        if file_size > max_size_mb * 1024 * 1024:
+            return False, f'文件大小超过{max_size_mb}MB限制'
 
         return True, None
 
     except Exception as e:
         return False, f'文件解析失败: {str(e)}'
 
-def read_excel_data(file_path):
-    """
-    读取Excel数据，自动检测并兼容单行表头和双行表头格式
-
-    支持的表头格式：
-    1. 单行表头：第一行即为完整的列名（精简版）
-    2. 双行表头：第二行才是完整的列名，第一行有合并单元格（原始版）
 
-    返回: DataFrame or None
-    """
-    try:
-        # 先读取前3行，检测表头格式
-        df_sample = pd.read_excel(file_path, header=None, nrows=3)
+def _is_empty_row(values):
+    return all(v is None or (isinstance(v, str) and v == '') for v in values)
 
-        # 最关键的区分字段：项目交付-项目名称
-        # 精简版第一行包含此字段
-        # 原始版第一行列12-15是"当前项目交付工时"（重复），第二行才有完整字段名
-        critical_field = '项目交付-项目名称'
 
-        # 检测第一行是否包含关键字段
-        first_row_str = str(df_sample.iloc[0].tolist())
-        has_critical_in_first = critical_field in first_row_str
-
-        # 如果第一行包含"项目交付-项目名称"，说明是精简版（单行表头）
-        if has_critical_in_first:
-            # 单行表头格式，直接读取
-            df = pd.read_excel(file_path, header=0)
-            df.columns = [str(col).strip() for col in df.columns]
-
-            # 将空字符串转换为 pd.NA，便于后续验证处理
-            if '部门' in df.columns:
-                df['部门'] = df['部门'].replace('', pd.NA)
-
-            return df
-
-        # 检测第二行是否包含关键字段（原始版双行表头）
-        second_row_str = str(df_sample.iloc[1].tolist())
-        has_critical_in_second = critical_field in second_row_str
-
-        if has_critical_in_second:
-            # 双行表头格式
-            # 使用openpyxl读取，避免pandas对合并单元格的处理问题
-            wb = load_workbook(file_path, read_only=True, data_only=True)
-            ws = wb.active
+def _dedupe_headers(headers):
+    """重复列名追加 .1/.2 后缀（与 pd.read_excel 一致）"""
+    seen = {}
+    result = []
+    for name in headers:
+        if name in seen:
+            seen[name] += 1
+            candidate = f'{name}.{seen[name]}'
+            while candidate in seen:
+                seen[name] += 1
+                candidate = f'{name}.{seen[name]}'
+            seen[candidate] = 0
+            result.append(candidate)
+        else:
+            seen[name] = 0
+            result.append(name)
+    return result
 
-            # 读取第二行作为列名
-            headers = []
-            for cell in ws[2]:  # 第二行
-                headers.append(str(cell.value).strip() if cell.value else f'列{cell.column}')
 
-            # 读取数据行（从第三行开始）
-            data = []
-            for row in ws.iter_rows(min_row=3, values_only=True):
-                data.append(list(row))
+def iter_excel_batches(file_path, batch_size=1000, max_rows=None):
+    """
+    流式读取Excel数据（openpyxl read_only 模式，工作簿只打开一次），按批次产出 DataFrame
 
-            wb.close()
+    自动检测表头格式：
+    1. 单行表头：第一行即为完整的列名（精简版）
+    2. 双行表头：第二行才是完整的列名，第一行有合并单元格（原始版）
 
-            # 创建DataFrame
-            df = pd.DataFrame(data, columns=headers)
+    参数:
+        batch_size: 每批行数
+        max_rows: 数据行数上限，超过时立即抛出 ImportRowLimitError，不再继续解析
 
-            # 将空字符串转换为 pd.NA，便于后续验证处理
-            if '部门' in df.columns:
-                df['部门'] = df['部门'].replace('', pd.NA)
+    产出: DataFrame（索引为数据行序号，从0开始跨批次连续）
 
-            return df
+    异常:
+        ImportRowLimitError: 超过行数上限
+        ValueError: Excel文件没有数据
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        first_row = next(rows, None)
+        if first_row is None:
+            raise ValueError('Excel文件没有数据')
+        second_row = next(rows, None)
 
-        # 如果都不匹配，尝试默认读取第一行
-        df = pd.read_excel(file_path, header=0)
-        df.columns = [str(col).strip() for col in df.columns]
+        # 如果第一行包含"项目交付-项目名称"，说明是精简版（单行表头）
+        # 否则检测第二行（原始版双行表头）；都不匹配时默认第一行为表头
+        if _CRITICAL_HEADER_FIELD not in str(list(first_row)) and \
+                second_row is not None and _CRITICAL_HEADER_FIELD in str(list(second_row)):
+            headers = [str(v).strip() if v else f'列{i + 1}' for i, v in enumerate(second_row)]
+            pending = []
+        else:
+            headers = [str(v).strip() if v is not None else f'Unnamed: {i}' for i, v in enumerate(first_row)]
+            pending = [second_row] if second_row is not None else []
+        headers = _dedupe_headers(headers)
+        width = len(headers)
+
+        def data_rows():
+            yield from pending
+            yield from rows
+
+        batch = []
+        blank_run = []  # 连续空行暂存：之后出现数据行才保留（与 pd.read_excel 去掉末尾空行一致）
+        row_count = 0
+        for values in data_rows():
+            values = list(values[:width]) + [None] * (width - len(values))
+            if _is_empty_row(values):
+                blank_run.append(values)
+                continue
+            for kept in blank_run + [values]:
+                row_count += 1
+                if max_rows is not None and row_count > max_rows:
+                    raise ImportRowLimitError(f'单次导入不能超过{max_rows}行')
+                batch.append(kept)
+            blank_run = []
+            if len(batch) >= batch_size:
+                yield _build_batch_frame(batch, headers, row_count - len(batch))
+                batch = []
+
+        if row_count == 0:
+            raise ValueError('Excel文件没有数据')
+        if batch:
+            yield _build_batch_frame(batch, headers, row_count - len(batch))
+    finally:
+        wb.close()
+
+
+def _build_batch_frame(batch, headers, offset):
+    df = pd.DataFrame(batch, columns=headers, index=pd.RangeIndex(offset, offset + len(batch)))
+    # 将空字符串转换为 pd.NA，便于后续验证处理
+    if '部门' in df.columns:
+        df['部门'] = df['部门'].replace('', pd.NA)
+    return df
+
+
+def read_excel_data(file_path, max_rows=None):
+    """
+    读取Excel全部数据（iter_excel_batches 各批次合并），自动兼容单行表头和双行表头格式
 
-        # 将空字符串转换为 pd.NA，便于后续验证处理
-        if '部门' in df.columns:
-            df['部门'] = df['部门'].replace('', pd.NA)
+    返回: DataFrame or None（解析失败）
 
-        return df
+    异常:
+        ImportRowLimitError: 超过 max_rows 限制
+        ValueError: Excel文件没有数据
+    """
+    try:
+        batches = list(iter_excel_batches(file_path, max_rows=max_rows))
+        return pd.concat(batches) if len(batches) > 1 else batches[0]
 
+    except ValueError:
+        raise
     except Exception as e:
         print(f"读取Excel失败: {str(e)}")
         return None
@@ -184,6 +231,116 @@ def validate_work_hour_row(row, required_fields):
         return False, errors
     return True, []
 
+def _frame_column(df, field, default):
+    """取列；列不存在时返回填充默认值的列（对应 row.get(field, default)）"""
+    if field in df.columns:
+        return df[field]
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+
+def parse_hours_column(col):
+    """
+    按 float(str(v).strip()) 的规则批量解析时长列，空值视为0
+
+    返回: (hours, error_messages)
+        hours: float Series，无法解析的位置为 NaN
+        error_messages: {index: 异常信息}，仅包含无法解析的单元格
+    """
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        return col.astype(float).fillna(0.0), {}
+
+    text = col.map(str).str.strip()
+    blank = col.isna() | text.eq('')
+    hours = pd.to_numeric(text.where(~blank), errors='coerce')
+
+    # pd.to_numeric 与 float() 的边界行为不完全一致（如 'inf'、'1_0'），逐个复核未解析的单元格
+    error_messages = {}
+    for idx in hours.index[~blank & hours.isna()]:
+        try:
+            hours.at[idx] = float(text.at[idx])
+        except Exception as e:
+            error_messages[idx] = str(e)
+    return hours.where(~blank, 0.0), error_messages
+
+
+def parse_date_column(col):
+    """批量解析日期列（等价于逐个 pd.to_datetime(str(v).strip())），解析失败为 NaT"""
+    text = col.map(str).str.strip()
+    parsed = pd.to_datetime(text, errors='coerce')
+    retry = parsed.isna()
+    if retry.any():
+        # 同一列混用多种格式时，按单元格逐个推断格式
+        parsed[retry] = pd.to_datetime(text[retry], errors='coerce', format='mixed')
+    return parsed
+
+
+def validate_work_hour_frame(df, required_fields):
+    """
+    以整列布尔掩码的方式验证工时数据（validate_work_hour_row 的列式版本），
+    同时解析开始/结束时间
+
+    返回: (valid_mask, errors, start_times, end_times)
+    valid_mask: bool Series，True 表示该行通过验证
+    errors: [{'row': Excel行号, 'field': 'field_name', 'error': 'error_message'}, ...]，按行号排序
+    start_times/end_times: datetime Series，仅对通过验证的行有意义
+    """
+    checks = []  # [(出错掩码, 字段, 错误信息或 index->错误信息 的函数), ...]，顺序与逐行验证一致
+
+    # 检查必填字段
+    for field in required_fields:
+        col = _frame_column(df, field, '')
+        empty = col.isna() | col.map(str).str.strip().eq('')
+        checks.append((empty, field, f'{field}字段为空'))
+
+    # 审批结果必须是"通过"或"审批通过"，审批状态必须是"已完成"或"已结束"
+    approval_result = _frame_column(df, '审批结果', '').map(str).str.strip()
+    approval_status = _frame_column(df, '审批状态', '').map(str).str.strip()
+    checks.append((
+        ~approval_result.isin(['通过', '审批通过']), '审批结果',
+        lambda idx: f"审批结果为'{approval_result.at[idx]}'，仅支持'通过'或'审批通过'"
+    ))
+    checks.append((
+        ~approval_status.isin(['已完成', '已结束']), '审批状态',
+        lambda idx: f"审批状态为'{approval_status.at[idx]}'，仅支持'已完成'或'已结束'"
+    ))
+
+    # 检查工作时长
+    work_hours, work_errors = parse_hours_column(_frame_column(df, '项目交付-工作时长', 0))
+    work_bad = pd.Series(df.index.isin(list(work_errors)), index=df.index)
+    checks.append((work_bad, '项目交付-工作时长', lambda idx: f'工作时长格式错误: {work_errors[idx]}'))
+    checks.append((~work_bad & (work_hours < 0), '项目交付-工作时长', '工作时长不能为负数'))
+    checks.append((~work_bad & (work_hours > 168), '项目交付-工作时长', '工作时长超过168小时（一周最大时长）'))
+
+    # 检查加班时长
+    overtime_hours, overtime_errors = parse_hours_column(_frame_column(df, '项目交付-加班时长', 0))
+    overtime_bad = pd.Series(df.index.isin(list(overtime_errors)), index=df.index)
+    checks.append((overtime_bad, '项目交付-加班时长', lambda idx: f'加班时长格式错误: {overtime_errors[idx]}'))
+    checks.append((~overtime_bad & (overtime_hours < 0), '项目交付-加班时长', '加班时长不能为负数'))
+
+    invalid = pd.Series(False, index=df.index)
+    for mask, _, _ in checks:
+        invalid |= mask
+
+    # 解析时间（仅对通过字段验证的行报错）
+    start_times = parse_date_column(_frame_column(df, '开始时间', ''))
+    end_times = parse_date_column(_frame_column(df, '结束时间', ''))
+    bad_date = ~invalid & (start_times.isna() | end_times.isna())
+    checks.append((bad_date, '开始时间', '时间格式错误'))
+    invalid |= bad_date
+
+    located = []
+    for order, (mask, field, message) in enumerate(checks):
+        for idx in df.index[mask.to_numpy()]:
+            located.append((idx + 2, order, {
+                'row': idx + 2,  # Excel行号(含表头)
+                'field': field,
+                'error': message(idx) if callable(message) else message
+            }))
+    located.sort(key=lambda item: (item[0], item[1]))
+
+    return ~invalid, [item[2] for item in located], start_times, end_times
+
+
 def calculate_date_range(start_date, end_date):
     """
     计算日期范围（已去除天数限制）
@@ -294,6 +451,131 @@ def calculate_workdays(start_date, end_date, workdays=[1, 2, 3, 4, 5], holidays=
 
     return len(workdays_list)
 
+
+class WorkdayCalendar:
+    """
+    工作日索引：按星期的工作日掩码 + 节假日（非工作日）+ 调休（额外工作日），一次构建、反复查询
+
+    内部按日序号（date.toordinal）保存累计工作日数，[a, b] 内工作日数为两次数组查找，
+    工作日列表为一次切片。查询超出构建范围时自动扩展（扩展部分同样套用节假日）。
+    """
+
+    def __init__(self, range_start, range_end, workdays, non_workdays=(), extra_workdays=()):
+        self.workdays = list(workdays)
+        self.non_workdays = set(non_workdays)
+        self.extra_workdays = set(extra_workdays)
+        self._build(range_start.toordinal(), range_end.toordinal())
+
+    def _build(self, first, last):
+        self._first = first
+        self._last = last
+        ordinals = np.arange(first, last + 1)
+        # date(1, 1, 1) 的序号为 1 且是周一，(序号 - 1) % 7 + 1 即 isoweekday
+        mask = np.isin((ordinals - 1) % 7 + 1, self.workdays)
+        for day in self.non_workdays:
+            if first <= day.toordinal() <= last:
+                mask[day.toordinal() - first] = False
+        for day in self.extra_workdays:
+            if first <= day.toordinal() <= last:
+                mask[day.toordinal() - first] = True
+        self._mask = mask
+        self._cumulative = np.concatenate(([0], np.cumsum(mask)))
+
+    def _offsets(self, start_date, end_date):
+        first, last = start_date.toordinal(), end_date.toordinal()
+        if first < self._first or last > self._last:
+            self._build(min(first, self._first), max(last, self._last))
+        return first - self._first, last - self._first + 1
+
+    def count(self, start_date, end_date):
+        """[start_date, end_date] 内的工作日天数"""
+        if start_date > end_date:
+            return 0
+        lo, hi = self._offsets(start_date, end_date)
+        return int(self._cumulative[hi] - self._cumulative[lo])
+
+    def dates(self, start_date, end_date):
+        """[start_date, end_date] 内的工作日列表（升序）"""
+        if start_date > end_date:
+            return []
+        lo, hi = self._offsets(start_date, end_date)
+        base = self._first + lo
+        return [date.fromordinal(base + int(i)) for i in np.flatnonzero(self._mask[lo:hi])]
+
+
+# 单条 IN 查询的参数个数上限（SQLite 默认限制 999）
+IN_CHUNK_SIZE = 500
+
+
+def chunks(items, size=IN_CHUNK_SIZE):
+    """按 size 个一组切分 items，用于拆分 IN 查询的参数"""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def encode_cursor(values):
+    """分页游标：把最后一行的 (排序值, id) 编码为不透明字符串"""
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values],
+                     ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """解析分页游标，按列类型还原日期/时间值；格式不符抛 ValueError"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('分页游标无效')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('分页游标无效')
+    result = []
+    for value, column in zip(values, columns):
+        python_type = column.type.python_type
+        if python_type in (date, datetime) and isinstance(value, str):
+            value = python_type.fromisoformat(value)
+        result.append(value)
+    return result
+
+
+def keyset_paginate(query, sort_col, id_col, descending, cursor, size):
+    """
+    游标（keyset）分页：按 (sort_col, id_col) 排序，从游标所指行之后取 size 条
+
+    用 WHERE 定位起点代替 OFFSET，翻到多深都只扫描一页数据，也不需要 COUNT。
+    可为空的排序列按空串参与排序和比较。cursor 为空串表示第一页。
+
+    返回: (items, next_cursor)，没有下一页时 next_cursor 为 None
+    异常: ValueError 游标无效
+    """
+    sort_expr = func.coalesce(sort_col, '') if sort_col.nullable else sort_col
+    if sort_col is id_col:
+        order_by = [id_col.desc() if descending else id_col.asc()]
+    else:
+        order_by = [sort_expr.desc(), id_col.desc()] if descending else [sort_expr.asc(), id_col.asc()]
+    query = query.order_by(*order_by)
+
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, [sort_col, id_col])
+        if sort_col is id_col:
+            query = query.filter(id_col < last_id if descending else id_col > last_id)
+        elif descending:
+            query = query.filter(or_(sort_expr < sort_value, and_(sort_expr == sort_value, id_col < last_id)))
+        else:
+            query = query.filter(or_(sort_expr > sort_value, and_(sort_expr == sort_value, id_col > last_id)))
+
+    items = query.limit(size + 1).all()
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        last = items[-1]
+        sort_value = getattr(last, sort_col.key)
+        if sort_value is None and sort_col.nullable:
+            sort_value = ''
+        next_cursor = encode_cursor([sort_value, getattr(last, id_col.key)])
+    return items, next_cursor
+
+
 def get_role_by_dept(dept_name):
     """
     根据部门名称确定员工角色
@@ -0,0 +1,3 @@
+"""
+性能基准脚本（手动运行，不参与部署）
+"""
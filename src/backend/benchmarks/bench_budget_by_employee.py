@@ -0,0 +1,108 @@
+"""
+按员工预算统计基准：逐人两次查询（旧） vs 一次 (员工, 项目) 分组查询（新，/budget/statistics/by-employee）。
+
+每名员工 52 周、每周一张工单，按项目交付 + 另一种工时类型拆分，项目在 30 个中随机；
+对比全部角色与单一角色两种筛选，两种方式得到的员工、工时合计与项目分布须一致。
+
+用法：
+    python -m benchmarks.bench_budget_by_employee --sizes 100,1000
+"""
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import func, select
+
+from app.models.db import db
+from app.models.employee import Employee
+from app.models.work_hour_data import WorkHourData
+from app.services.import_service import bulk_insert_records
+from app.services.rollup_service import refresh_rollups, rollup_source
+from app.utils.jwt_utils import generate_token
+from benchmarks.common import make_app, cleanup, parse_sizes, timed, WORK_TYPES
+
+WEEKS = 52
+PROJECTS = 30
+ROLES = ['project_manager', 'data_collection', 'software_dev', 'staff']
+
+
+def _seed(employee_count, seed=0):
+    rnd = random.Random(seed)
+    monday = date(2025, 1, 6)
+    users = [f'员工{i:05d}' for i in range(employee_count)]
+    db.session.add_all([
+        Employee(employee_name=user, dept_name='开发组', role=ROLES[i % len(ROLES)])
+        for i, user in enumerate(users)
+    ])
+    bulk_insert_records([
+        dict(serial_no=f'{i}-{w}', user_name=user, start_time=monday + timedelta(weeks=w),
+             end_time=monday + timedelta(weeks=w, days=6), work_type=work_type,
+             project_name=f'D{1000 + rnd.randrange(PROJECTS)} 项目', project_manager='', project_id=None,
+             work_hours=20.0, overtime_hours=rnd.choice([0.0, 2.0]), leave_hours=0.0, work_content='',
+             approval_result='通过', approval_status='已完成', dept_name='开发组', import_batch_no='IMP_BENCH')
+        for i, user in enumerate(users)
+        for w in range(WEEKS)
+        for work_type in ('project_delivery', rnd.choice(WORK_TYPES[1:]))
+    ])
+    refresh_rollups(users)
+    db.session.commit()
+
+
+def _legacy(target_role):
+    """旧实现：每名员工一次合计 + 一次项目分布"""
+    delivery_users = select(WorkHourData.user_name).where(
+        WorkHourData.work_type == 'project_delivery'
+    ).distinct()
+    employee_query = Employee.query.filter(Employee.employee_name.in_(delivery_users))
+    if target_role:
+        employee_query = employee_query.filter(Employee.role == target_role)
+
+    result = {}
+    for employee in employee_query.all():
+        source = rollup_source(
+            lambda c, name=employee.employee_name: [c.user_name == name, c.work_type == 'project_delivery']
+        )
+        work_sum, overtime_sum = db.session.query(
+            func.sum(source.c.work_hours), func.sum(source.c.overtime_hours)
+        ).first()
+        distribution = db.session.query(
+            source.c.project_name, func.sum(source.c.work_hours), func.sum(source.c.overtime_hours)
+        ).group_by(source.c.project_name).all()
+        total_hours = ((work_sum or 0) + (overtime_sum or 0)) / 8
+        if total_hours > 0:
+            result[employee.employee_name] = (
+                round(total_hours, 2),
+                [(name, round((hours + overtime) / 8, 2)) for name, hours, overtime in distribution]
+            )
+    return result
+
+
+def main():
+    sizes = parse_sizes([100, 1000])
+    for employee_count in sizes:
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                _seed(employee_count)
+                token = generate_token({'userName': 'admin', 'role': 'admin', 'userId': 1})
+            client = app.test_client()
+            headers = {'Authorization': f'Bearer {token}'}
+
+            print(f'{employee_count} 名员工：')
+            for label, budget_type in (('全部角色', ''), ('单一角色', 'software_dev')):
+                with app.app_context():
+                    with timed(f'{label} 逐人查询（旧）'):
+                        expected = _legacy(budget_type)
+                with timed(f'{label} 分组查询（新，含接口开销）'):
+                    data = client.get(f'/api/v1/budget/statistics/by-employee?budgetType={budget_type}',
+                                      headers=headers).get_json()['data']
+                actual = {
+                    item['employeeName']: (item['totalHours'], [(p['projectName'], p['hours']) for p in item['projects']])
+                    for item in data
+                }
+                assert actual == expected, label
+        finally:
+            cleanup(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+数据字典基准：每次请求全表 DISTINCT（旧） vs 进程内缓存 + 版本号 + ETag（新，/data/dict）。
+
+合成 5000 名员工、2000 个项目的工时，对比：旧实现的三次 DISTINCT 扫描、缓存命中、
+携带 If-None-Match 的 304、导入一批新工时后的增量合并、删除工时后的全量重建，
+新旧两种方式得到的部门、人员、工时项目须一致。
+
+用法：
+    python -m benchmarks.bench_data_dict --sizes 200000,1000000
+"""
+import random
+from datetime import date, timedelta
+
+from app.models.db import db
+from app.models.work_hour_data import WorkHourData
+from app.services.dict_service import bump_dict_versions, WORK_HOURS_INSERT, WORK_HOURS_CHANGE
+from app.services.import_service import bulk_insert_records
+from benchmarks.common import make_app, cleanup, parse_sizes, timed, WORK_TYPES, DEPTS
+
+CHUNK_ROWS = 50000
+BATCH_ROWS = 2000
+
+
+def _records(rnd, start, count):
+    monday = date(2025, 1, 6)
+    return [
+        dict(serial_no=str(i), user_name=f'员工{rnd.randrange(5000):05d}',
+             start_time=monday + timedelta(weeks=i % 104), end_time=monday + timedelta(weeks=i % 104, days=6),
+             work_type=rnd.choice(WORK_TYPES), project_name=f'D{rnd.randrange(2000):04d} 项目',
+             project_manager='', project_id=None, work_hours=8.0, overtime_hours=0.0, leave_hours=0.0,
+             work_content='', approval_result='通过', approval_status='已完成',
+             dept_name=rnd.choice(DEPTS), import_batch_no='IMP_BENCH')
+        for i in range(start, start + count)
+    ]
+
+
+def _legacy():
+    """旧实现：每次请求三次 DISTINCT 扫描工时表"""
+    def distinct(column):
+        return sorted({v for (v,) in db.session.query(column).distinct() if v})
+    return {
+        'departments': distinct(WorkHourData.dept_name),
+        'users': distinct(WorkHourData.user_name),
+        'workProjects': distinct(WorkHourData.project_name),
+    }
+
+
+def _fetch(client, etag=None):
+    response = client.get('/api/v1/data/dict', headers={'If-None-Match': etag} if etag else {})
+    data = response.get_json()['data'] if response.status_code == 200 else None
+    return response.status_code, response.headers.get('ETag'), data
+
+
+def _assert_same(data, expected, label):
+    assert {key: data[key] for key in expected} == expected, label
+
+
+def main():
+    sizes = parse_sizes([200000, 1000000])
+    for rows in sizes:
+        rnd = random.Random(0)
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                for offset in range(0, rows, CHUNK_ROWS):
+                    bulk_insert_records(_records(rnd, offset, min(CHUNK_ROWS, rows - offset)))
+                    db.session.commit()
+            client = app.test_client()
+
+            print(f'{rows} 条工时：')
+            with app.app_context():
+                with timed('每次全表 DISTINCT（旧）'):
+                    expected = _legacy()
+            with timed('首次请求（全量构建缓存）'):
+                _, etag, data = _fetch(client)
+            _assert_same(data, expected, '首次')
+            with timed('缓存命中'):
+                _fetch(client)
+            with timed('If-None-Match 命中（304）'):
+                status, _, _ = _fetch(client, etag)
+            assert status == 304
+
+            with app.app_context():
+                bulk_insert_records(_records(rnd, rows, BATCH_ROWS))
+                bump_dict_versions(WORK_HOURS_INSERT)
+                db.session.commit()
+                expected = _legacy()
+            with timed(f'导入 {BATCH_ROWS} 条后（增量合并）'):
+                _, etag, data = _fetch(client)
+            _assert_same(data, expected, '增量')
+
+            with app.app_context():
+                WorkHourData.query.filter(WorkHourData.id <= BATCH_ROWS).delete(synchronize_session=False)
+                bump_dict_versions(WORK_HOURS_CHANGE)
+                db.session.commit()
+                expected = _legacy()
+            with timed('删除工时后（全量重建）'):
+                _, etag, data = _fetch(client)
+            _assert_same(data, expected, '重建')
+        finally:
+            cleanup(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+导入查重基准：逐条 SELECT（旧） vs 批量加载 + 内存哈希索引（新）。
+
+每个 Excel 行按 2 种工时类型拆分为 2 条记录，其中一半在库中已存在。
+
+用法：
+    python -m benchmarks.bench_import_dedup --sizes 1000,10000,50000
+"""
+import random
+from datetime import date, timedelta
+
+from app.models.db import db
+from app.models.work_hour_data import WorkHourData
+from app.services.import_service import load_duplicate_index, find_duplicate, bulk_insert_records
+from benchmarks.common import make_app, cleanup, parse_sizes, timed, WORK_TYPES
+
+
+def _make_records(rows, batch_no, seed=0):
+    rnd = random.Random(seed)
+    records = []
+    monday = date(2025, 1, 6)
+    for i in range(rows):
+        start = monday + timedelta(weeks=i % 52)
+        user = f'员工{i // 52:05d}'
+        for wt in rnd.sample(WORK_TYPES, 2):
+            records.append(dict(
+                serial_no=str(i), user_name=user, start_time=start,
+                end_time=start + timedelta(days=6), work_type=wt,
+                project_name=f'D{1000 + i % 40} 项目', project_manager='',
+                project_id=None, work_hours=20.0, overtime_hours=0.0,
+                leave_hours=0.0, work_content='', approval_result='通过',
+                approval_status='已完成', dept_name='开发组',
+                import_batch_no=batch_no
+            ))
+    return records
+
+
+def _legacy(records, batch_no):
+    hits = 0
+    for record in records:
+        existing = WorkHourData.query.filter(
+            WorkHourData.user_name == record['user_name'],
+            WorkHourData.start_time == record['start_time'],
+            WorkHourData.project_name == record['project_name'],
+            WorkHourData.work_type == record['work_type'],
+            WorkHourData.import_batch_no != batch_no
+        ).first()
+        hits += existing is not None
+    return hits
+
+
+def _indexed(records, batch_no):
+    index = load_duplicate_index(records, batch_no)
+    return sum(find_duplicate(index, r) is not None for r in records)
+
+
+def main():
+    sizes = parse_sizes([1000, 10000, 50000])
+    for rows in sizes:
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                old = _make_records(rows, 'IMP_OLD')
+                bulk_insert_records(old[::2])
+                db.session.commit()
+
+                records = _make_records(rows, 'IMP_NEW')
+                print(f'{rows} 行 / {len(records)} 条记录：')
+                with timed('逐条查询（旧）'):
+                    legacy_hits = _legacy(records, 'IMP_NEW')
+                with timed('批量索引（新）'):
+                    indexed_hits = _indexed(records, 'IMP_NEW')
+                assert legacy_hits == indexed_hits, (legacy_hits, indexed_hits)
+        finally:
+            cleanup(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+完整性检查回归 + 基准：两两比较重叠（旧） vs 扫描线（新）。
+
+回归：随机工单（长度 1~14 天、大量重叠、含单日工单与同日开始）+ 节假日/调休，
+逐员工比较 details 与空缺/重复天数，要求完全一致。
+基准：每人 N 张周报（全量查询场景），比较单员工检查耗时。
+
+用法：
+    python -m benchmarks.bench_integrity_check --sizes 100,500,2000
+"""
+import random
+from datetime import date, timedelta
+
+from app.services.check_service import evaluate_user_orders
+from app.utils.helpers import get_workdays_in_range, WorkdayCalendar
+from benchmarks.common import parse_sizes, timed, weekly_orders
+
+WORKDAYS = [1, 2, 3, 4, 5]
+
+
+def _legacy_user(user, dept, orders, start, end, workdays, non_workdays, extra_workdays):
+    """改造前 run_integrity_check 的单员工逻辑（原样保留，作为对照）"""
+    details = []
+    missing_days = 0
+    duplicate_days = 0
+
+    def collect(gap_start, gap_end):
+        if gap_start > gap_end:
+            return 0
+        workdays_in_gap = get_workdays_in_range(gap_start, gap_end, workdays, non_workdays)
+        for wd in extra_workdays:
+            if gap_start <= wd <= gap_end and wd not in workdays_in_gap:
+                workdays_in_gap.append(wd)
+        workdays_in_gap.sort()
+        if not workdays_in_gap:
+            return 0
+        missing_dates = [d.strftime('%Y-%m-%d') for d in workdays_in_gap]
+        details.append({
+            'deptName': dept,
+            'userName': user,
+            'issueType': 'missing',
+            'serialNo': None,
+            'gapStartDate': gap_start.strftime('%Y-%m-%d'),
+            'gapEndDate': gap_end.strftime('%Y-%m-%d'),
+            'affectedWorkdays': len(workdays_in_gap),
+            'missingDates': missing_dates,
+            'description': f'未提交周报（{len(workdays_in_gap)}个工作日：{", ".join(missing_dates)}）'
+        })
+        return len(workdays_in_gap)
+
+    if not orders:
+        return details, collect(start, end), 0
+    if orders[0][1] > start:
+        missing_days += collect(start, orders[0][1] - timedelta(days=1))
+    for i in range(len(orders) - 1):
+        if orders[i][2] < orders[i + 1][1]:
+            missing_days += collect(orders[i][2] + timedelta(days=1), orders[i + 1][1] - timedelta(days=1))
+    if orders[-1][2] < end:
+        missing_days += collect(orders[-1][2] + timedelta(days=1), end)
+
+    recorded_periods = set()
+    for i in range(len(orders)):
+        for j in range(i + 1, len(orders)):
+            order_a = orders[i]
+            order_b = orders[j]
+            if order_a[1] < order_b[2] and order_a[2] > order_b[1]:
+                overlap_start = max(order_a[1], order_b[1])
+                overlap_end = min(order_a[2], order_b[2])
+                workdays_in_overlap = get_workdays_in_range(overlap_start, overlap_end, workdays, non_workdays)
+                for wd in extra_workdays:
+                    if overlap_start <= wd <= overlap_end and wd not in workdays_in_overlap:
+                        workdays_in_overlap.append(wd)
+                workdays_in_overlap.sort()
+                if workdays_in_overlap:
+                    gap_start_str = overlap_start.strftime('%Y-%m-%d')
+                    gap_end_str = overlap_end.strftime('%Y-%m-%d')
+                    period_key = (user, gap_start_str, gap_end_str)
+                    if period_key not in recorded_periods:
+                        recorded_periods.add(period_key)
+                        duplicate_days += len(workdays_in_overlap)
+                        details.append({
+                            'deptName': dept,
+                            'userName': user,
+                            'issueType': 'duplicate',
+                            'serialNo': f'{order_a[0]},{order_b[0]}',
+                            'gapStartDate': gap_start_str,
+                            'gapEndDate': gap_end_str,
+                            'affectedWorkdays': len(workdays_in_overlap),
+                            'description': f'与序号{order_b[0]}时间重叠'
+                        })
+    return details, missing_days, duplicate_days
+
+
+def _random_orders(rnd, count, start):
+    orders = set()
+    for s in range(count):
+        begin = start + timedelta(days=rnd.randint(0, count * 3))
+        orders.add((str(s), begin, begin + timedelta(days=rnd.randint(0, 13))))
+    return sorted(orders, key=lambda o: o[1])
+
+
+def _holidays(rnd, start, days):
+    dates = [start + timedelta(days=d) for d in range(days)]
+    non_workdays = rnd.sample(dates, days // 30)
+    extra_workdays = [d for d in rnd.sample(dates, days // 60) if d.weekday() >= 5]
+    return non_workdays, extra_workdays
+
+
+def regression(users=200, seed=0):
+    rnd = random.Random(seed)
+    start = date(2025, 1, 1)
+    for u in range(users):
+        orders = _random_orders(rnd, rnd.randint(0, 60), start)
+        window_start = start + timedelta(days=rnd.randint(0, 20))
+        window_end = window_start + timedelta(days=rnd.randint(0, 200))
+        orders = [o for o in orders if o[1] <= window_end and o[2] >= window_start]
+        non_workdays, extra_workdays = _holidays(rnd, start, 250)
+        calendar = WorkdayCalendar(window_start, window_end, WORKDAYS, non_workdays, extra_workdays)
+        expected = _legacy_user('u', 'd', orders, window_start, window_end,
+                                WORKDAYS, non_workdays, extra_workdays)
+        actual = evaluate_user_orders('u', 'd', orders, window_start, window_end, calendar)
+        assert actual == expected, f'员工 {u} 结果不一致'
+    print(f'回归：{users} 名员工随机工单结果一致')
+
+
+def main():
+    sizes = parse_sizes([100, 500, 2000])
+    regression()
+    rnd = random.Random(1)
+    for weeks in sizes:
+        orders = [(o[0], o[3], o[4]) for o in weekly_orders(1, weeks)]
+        start, end = orders[0][1], orders[-1][2]
+        non_workdays, extra_workdays = _holidays(rnd, start, (end - start).days + 1)
+        calendar = WorkdayCalendar(start, end, WORKDAYS, non_workdays, extra_workdays)
+        print(f'单员工 {len(orders)} 张工单：')
+        with timed('两两比较（旧）'):
+            expected = _legacy_user('u', 'd', orders, start, end, WORKDAYS, non_workdays, extra_workdays)
+        with timed('扫描线（新）'):
+            actual = evaluate_user_orders('u', 'd', orders, start, end, calendar)
+        assert actual == expected
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+完整性检查多进程基准：单进程逐人计算 vs 进程池分片计算。
+
+每人 104 周、每周一张工单（含漏交与重叠），全量区间检查。
+进程数取 CPU 核数（至少 2）；首次使用进程池的启动开销单独预热，不计入计时。
+
+用法：
+    python -m benchmarks.bench_integrity_parallel --sizes 1000,5000
+"""
+import os
+from datetime import date, timedelta
+
+from app.models.db import db
+from app.services.check_service import (
+    evaluate_users, load_holidays, load_user_orders, _get_process_pool, _evaluate_shard
+)
+from app.services.import_service import bulk_insert_records
+from app.utils.helpers import WorkdayCalendar
+from benchmarks.common import make_app, cleanup, parse_sizes, timed, weekly_orders
+
+WEEKS = 104
+WORKDAYS = [1, 2, 3, 4, 5]
+
+
+def _seed(user_count):
+    orders = weekly_orders(user_count, WEEKS)
+    bulk_insert_records([
+        dict(serial_no=serial_no, user_name=user, start_time=start, end_time=end,
+             work_type='project_delivery', project_name='D1000 项目', project_manager='',
+             project_id=None, work_hours=40.0, overtime_hours=0.0, leave_hours=0.0,
+             work_content='', approval_result='通过', approval_status='已完成',
+             dept_name=dept, import_batch_no='IMP_BENCH')
+        for serial_no, user, dept, start, end in orders
+    ])
+    db.session.commit()
+    return sorted({(user, dept) for _, user, dept, _, _ in orders})
+
+
+def main():
+    sizes = parse_sizes([1000, 5000])
+    workers = max(os.cpu_count() or 1, 2)
+    start = date(2025, 1, 6)
+    end = start + timedelta(weeks=WEEKS) - timedelta(days=1)
+    for user_count in sizes:
+        app, db_path = make_app()
+        app.config['INTEGRITY_PARALLEL_MIN_USERS'] = 1
+        try:
+            with app.app_context():
+                users = _seed(user_count)
+                holidays = load_holidays(start, end)
+                calendar = WorkdayCalendar(start, end, WORKDAYS, *holidays)
+                orders_by_user = load_user_orders(start, end)
+                window = (start, end, WORKDAYS, [], [])
+                list(_get_process_pool(workers).map(_evaluate_shard, [window] * workers, [[]] * workers))
+
+                print(f'{user_count} 名员工，{workers} 个进程：')
+                with timed('单进程'):
+                    expected = evaluate_users(users, orders_by_user, start, end, WORKDAYS, holidays, calendar, 1)
+                with timed('进程池分片'):
+                    actual = evaluate_users(users, orders_by_user, start, end, WORKDAYS, holidays, calendar, workers)
+                assert actual == expected
+        finally:
+            cleanup(db_path)
+
+
+if __name__ == '__main__':
+    main()
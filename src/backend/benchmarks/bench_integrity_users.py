@@ -0,0 +1,114 @@
+"""
+完整性检查取数基准：逐人查询（旧） vs 单次有序查询 + groupby（新）。
+
+每人 26 周、每周一张工单（含漏交与重叠），核对最近 13 周。
+另测同一窗口再次检查（全部复用缓存）、1% 员工工单变化后的增量检查，
+以及全员新增一周工单后覆盖状态的增量并入（merge_user_orders）与整体重建的对比。
+数据直接批量写入、未经导入流程，首次检查包含为全部员工补建覆盖状态的开销。
+
+用法：
+    python -m benchmarks.bench_integrity_users --sizes 100,1000,5000
+"""
+from datetime import date, timedelta
+
+from app.models.db import db
+from app.models.work_hour_data import WorkHourData
+from app.models.integrity_state import IntegrityUserState
+from app.services.check_service import load_user_orders, run_integrity_check, refresh_user_states, merge_user_orders
+from app.services.import_service import bulk_insert_records
+from benchmarks.common import make_app, cleanup, parse_sizes, timed, weekly_orders
+
+WEEKS = 26
+
+
+def _records(orders):
+    return [
+        dict(serial_no=serial_no, user_name=user, start_time=start, end_time=end,
+             work_type='project_delivery', project_name='D1000 项目', project_manager='',
+             project_id=None, work_hours=40.0, overtime_hours=0.0, leave_hours=0.0,
+             work_content='', approval_result='通过', approval_status='已完成',
+             dept_name=dept, import_batch_no='IMP_BENCH')
+        for serial_no, user, dept, start, end in orders
+    ]
+
+
+def _seed(user_count):
+    bulk_insert_records(_records(weekly_orders(user_count, WEEKS)))
+    db.session.commit()
+
+
+def _coverage():
+    return dict(db.session.query(IntegrityUserState.user_name, IntegrityUserState.coverage).all())
+
+
+def _legacy(start, end):
+    """改造前：先取名单，再逐人查询工单"""
+    user_list = db.session.query(WorkHourData.user_name, WorkHourData.dept_name).distinct().all()
+    result = {}
+    for user, _ in user_list:
+        orders = db.session.query(
+            WorkHourData.serial_no, WorkHourData.start_time, WorkHourData.end_time
+        ).filter(
+            WorkHourData.user_name == user,
+            WorkHourData.start_time <= end,
+            WorkHourData.end_time >= start
+        ).distinct().order_by(WorkHourData.start_time).all()
+        if orders:
+            result[user] = [tuple(o) for o in orders]
+    return result
+
+
+def main():
+    sizes = parse_sizes([100, 1000, 5000])
+    end = date(2025, 1, 6) + timedelta(weeks=WEEKS) - timedelta(days=1)
+    start = end - timedelta(weeks=13) + timedelta(days=1)
+    for user_count in sizes:
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                _seed(user_count)
+                print(f'{user_count} 名员工：')
+                with timed('逐人查询（旧）'):
+                    expected = _legacy(start, end)
+                with timed('单次查询 + groupby（新）'):
+                    actual = load_user_orders(start, end)
+                assert actual == expected
+                with timed('run_integrity_check 全流程（首次）'):
+                    first = run_integrity_check(start_date=start.isoformat(), end_date=end.isoformat())
+                with timed('run_integrity_check 复用缓存'):
+                    again = run_integrity_check(start_date=start.isoformat(), end_date=end.isoformat())
+                assert again[1:] == first[1:]
+
+                changed = sorted(actual)[::100]
+                WorkHourData.query.filter(
+                    WorkHourData.user_name.in_(changed),
+                    WorkHourData.start_time.between(start, start + timedelta(days=6))
+                ).delete(synchronize_session=False)
+                refresh_user_states(changed)
+                db.session.commit()
+                with timed(f'{len(changed)} 名员工变化后增量检查'):
+                    run_integrity_check(start_date=start.isoformat(), end_date=end.isoformat())
+
+                # 全员新增一周工单（相当于导入一批）：增量并入 vs 按全部工单重建
+                new_week = date(2025, 1, 6) + timedelta(weeks=WEEKS)
+                records = _records(
+                    (f'N{serial_no}', user, dept, new_week, new_week + timedelta(days=6))
+                    for serial_no, user, dept, _, _ in weekly_orders(user_count, 1)
+                )
+                bulk_insert_records(records)
+                db.session.flush()
+                with timed('新增一周：按全部工单重建覆盖状态（旧）'):
+                    refresh_user_states({r['user_name'] for r in records})
+                expected = _coverage()
+                db.session.rollback()
+                bulk_insert_records(records)
+                with timed('新增一周：增量并入覆盖状态（新）'):
+                    merge_user_orders(records)
+                assert _coverage() == expected
+                db.session.rollback()
+        finally:
+            cleanup(db_path)
+
+
+if __name__ == '__main__':
+    main()
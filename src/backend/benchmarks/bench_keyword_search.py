@@ -0,0 +1,80 @@
+"""
+关键字子串筛选基准：LIKE '%关键字%' 全表扫描（旧） vs work_hour_search trigram 索引（新）。
+
+合成 5000 名员工、2000 个项目、300 名项目经理，按项目、姓名、部门、项目经理分别筛选并统计条数，
+两种方式结果须一致（部门不在索引中，两种方式相同）。写入耗时与去掉同步触发器的库对比。
+
+用法：
+    python -m benchmarks.bench_keyword_search --sizes 1000000
+"""
+import random
+from datetime import date, timedelta
+
+from app.models.db import db
+from app.models.work_hour_data import WorkHourData
+from app.services.import_service import bulk_insert_records
+from benchmarks.common import make_app, cleanup, parse_sizes, timed, WORK_TYPES, DEPTS
+
+CHUNK_ROWS = 50000
+KEYWORDS = [
+    ('project_name', '智慧园区0123'),
+    ('project_name', '数据采集'),
+    ('user_name', '员工01234'),
+    ('dept_name', '交付部'),
+    ('project_manager', '经理007'),
+]
+
+
+def _seed(rows, seed=0):
+    rnd = random.Random(seed)
+    topics = ['智慧园区', '数据采集', '平台升级', '运维保障', '边缘计算']
+    monday = date(2025, 1, 6)
+    for offset in range(0, rows, CHUNK_ROWS):
+        bulk_insert_records([
+            dict(serial_no=str(i), user_name=f'员工{rnd.randrange(5000):05d}',
+                 start_time=monday + timedelta(weeks=i % 104), end_time=monday + timedelta(weeks=i % 104, days=6),
+                 work_type=rnd.choice(WORK_TYPES),
+                 project_name=f'{rnd.choice(topics)}{rnd.randrange(2000):04d} 项目',
+                 project_manager=f'经理{rnd.randrange(300):03d}', project_id=None,
+                 work_hours=8.0, overtime_hours=0.0, leave_hours=0.0, work_content='',
+                 approval_result='通过', approval_status='已完成',
+                 dept_name=rnd.choice(DEPTS), import_batch_no='IMP_BENCH')
+            for i in range(offset, min(offset + CHUNK_ROWS, rows))
+        ])
+        db.session.commit()
+
+
+def main():
+    sizes = parse_sizes([1000000])
+    for rows in sizes:
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                for trigger in ('ai', 'ad', 'au'):
+                    db.session.execute(db.text(f'DROP TRIGGER work_hour_search_{trigger}'))
+                print(f'{rows} 条工时：')
+                with timed('写入（无索引同步）'):
+                    _seed(rows)
+        finally:
+            cleanup(db_path)
+
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                with timed('写入（含索引同步触发器）'):
+                    _seed(rows)
+                for field, keyword in KEYWORDS:
+                    with timed(f'{field} LIKE 扫描 "{keyword}"'):
+                        expected = WorkHourData.query.filter(
+                            getattr(WorkHourData, field).like(f'%{keyword}%')
+                        ).count()
+                    with timed(f'{field} trigram 索引 "{keyword}"'):
+                        actual = WorkHourData.query.filter(WorkHourData.search_filter(field, keyword)).count()
+                    assert actual == expected, (field, keyword, actual, expected)
+                    print(f'    命中 {actual} 条')
+        finally:
+            cleanup(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+查询结果导出基准：query.all() + DataFrame + ExcelWriter（旧） vs yield_per 流式写出（新，/query/export）。
+
+合成工时后全量导出，每种方式在单独的子进程中执行，记录耗时与进程常驻内存峰值的增量；
+XLSX 读回后与 CSV 逐行比对，行数须等于工时条数。
+
+用法：
+    python -m benchmarks.bench_query_export --sizes 100000,500000
+"""
+import csv
+import io
+import multiprocessing
+import os
+import random
+import resource
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from app.models.db import db
+from app.models.work_hour_data import WorkHourData
+from app.services.import_service import bulk_insert_records
+from benchmarks.common import make_app, cleanup, parse_sizes, WORK_TYPES, DEPTS
+
+CHUNK_ROWS = 50000
+EXPORT_BODY = {'queryType': 'organization', 'filters': {}}
+
+
+def _seed(rows, seed=0):
+    rnd = random.Random(seed)
+    monday = date(2025, 1, 6)
+    for offset in range(0, rows, CHUNK_ROWS):
+        bulk_insert_records([
+            dict(serial_no=str(i), user_name=f'员工{rnd.randrange(5000):05d}',
+                 start_time=monday + timedelta(weeks=i % 104), end_time=monday + timedelta(weeks=i % 104, days=6),
+                 work_type=rnd.choice(WORK_TYPES), project_name=f'D{rnd.randrange(2000):04d} 项目',
+                 project_manager=f'经理{rnd.randrange(300):03d}', project_id=None,
+                 work_hours=8.0, overtime_hours=rnd.choice([0.0, 1.5]), leave_hours=0.0, work_content='',
+                 approval_result='通过', approval_status='已完成',
+                 dept_name=rnd.choice(DEPTS), import_batch_no='IMP_BENCH')
+            for i in range(offset, min(offset + CHUNK_ROWS, rows))
+        ])
+        db.session.commit()
+
+
+def _legacy_export():
+    """旧实现：全部加载为 ORM 对象与 dict，经 DataFrame 写入内存中的 XLSX"""
+    df = pd.DataFrame([item.to_dict() for item in WorkHourData.query.all()])
+    df = df.reindex(columns=['serialNo', 'userName', 'startTime', 'endTime', 'projectName', 'workHours',
+                             'overtimeHours', 'approvalResult', 'approvalStatus', 'projectManager', 'deptName'])
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='工时数据')
+    return output.getvalue()
+
+
+def _normalize(value):
+    """XLSX 读回的 8.0 为 8、空单元格为 None，与 CSV 文本统一后比较"""
+    value = '' if value is None else str(value)
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _rss_kb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def _measure(app, mode, out_path, result_queue):
+    """子进程：执行一种导出并把响应逐块写入 out_path，返回 (耗时秒, 内存峰值增量 MB)"""
+    with app.app_context():
+        db.engine.dispose()  # 不复用父进程的连接
+    baseline = _rss_kb()
+    begin = time.perf_counter()
+    with open(out_path, 'wb') as out:
+        if mode == 'legacy':
+            with app.app_context():
+                out.write(_legacy_export())
+        else:
+            response = app.test_client().post(f'/api/v1/query/export?format={mode}', json=EXPORT_BODY,
+                                              buffered=False)
+            for chunk in response.response:
+                out.write(chunk)
+            response.close()
+    elapsed = time.perf_counter() - begin
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result_queue.put((elapsed, max(peak - baseline, 0) / 1024))
+
+
+def _run(app, mode, out_path):
+    ctx = multiprocessing.get_context('fork')
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(app, mode, out_path, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    with open(out_path, 'rb') as f:
+        content = f.read()
+    os.remove(out_path)
+    return result + (content,)
+
+
+def main():
+    sizes = parse_sizes([100000, 500000])
+    for rows in sizes:
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                _seed(rows)
+                db.engine.dispose()
+
+            print(f'{rows} 条工时：')
+            contents = {}
+            for label, mode in (('DataFrame + ExcelWriter（旧）', 'legacy'),
+                                ('流式 XLSX（新）', 'xlsx'), ('流式 CSV（新）', 'csv')):
+                elapsed, peak_mb, contents[mode] = _run(app, mode, f'{db_path}.{mode}')
+                print(f'  {label:<30s} {elapsed * 1000:10.1f} ms   内存峰值增量 {peak_mb:8.1f} MB')
+
+            sheet = load_workbook(io.BytesIO(contents['xlsx']), read_only=True).worksheets[0]
+            xlsx_rows = [[_normalize(v) for v in row] for row in sheet.iter_rows(values_only=True)]
+            csv_rows = [[_normalize(v) for v in row]
+                        for row in csv.reader(io.StringIO(contents['csv'].decode('utf-8-sig')))]
+            assert len(csv_rows) == rows + 1, len(csv_rows)
+            assert xlsx_rows == csv_rows
+        finally:
+            cleanup(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+工时汇总基准：明细表 SUM（旧） vs 工时周汇总表、项目周汇总表（新）。
+
+合成 2000 名员工、每人每周一张工单，每张工单按 2 种工时类型、项目随机拆分；
+统计全量与非整周日期范围内的工时合计（项目统计、预算统计、查询汇总的读取方式），三种方式结果须一致。
+同时给出全量生成汇总，以及全员新增一周工单后按员工整体重算（旧）与只重算涉及的 (员工, 周)（新）的耗时，
+两种重算得到的汇总须一致。
+
+用法：
+    python -m benchmarks.bench_rollup_summary --sizes 52,104
+（规模为周数）
+"""
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import func
+
+from app.models.db import db
+from app.models.work_hour_data import WorkHourData
+from app.services.import_service import bulk_insert_records
+from app.services.rollup_service import refresh_rollups, refresh_rollup_weeks, rollup_source
+from benchmarks.common import make_app, cleanup, parse_sizes, timed, weekly_orders, WORK_TYPES
+
+USERS = 2000
+PROJECTS = 200
+
+
+def _records(orders, rnd):
+    return [
+        dict(serial_no=serial_no, user_name=user, start_time=start, end_time=end,
+             work_type=work_type, project_name=f'D{1000 + project} 项目', project_manager='',
+             project_id=project + 1, work_hours=20.0, overtime_hours=rnd.choice([0.0, 1.5]), leave_hours=0.0,
+             work_content='', approval_result='通过', approval_status='已完成',
+             dept_name=dept, import_batch_no='IMP_BENCH')
+        for serial_no, user, dept, start, end in orders
+        for work_type, project in zip(rnd.sample(WORK_TYPES, 2), rnd.sample(range(PROJECTS), 2))
+    ]
+
+
+def _seed(weeks, seed=0):
+    rnd = random.Random(seed)
+    orders = weekly_orders(USERS, weeks)
+    bulk_insert_records(_records(orders, rnd))
+    db.session.commit()
+    return sorted({user for _, user, _, _, _ in orders})
+
+
+def _rollup_rows():
+    return db.session.execute(db.text(
+        'SELECT week_start, user_name, dept_name, project_id, work_type, row_count, work_hours, span_days '
+        'FROM work_hour_rollups ORDER BY 1, 2, 3, 4, 5, 8'
+    )).fetchall() + db.session.execute(db.text(
+        'SELECT week_start, project_id, work_type, row_count, work_hours, span_days '
+        'FROM work_hour_project_rollups ORDER BY 1, 2, 3, 6'
+    )).fetchall()
+
+
+def _detail_totals(project_id, start, end):
+    query = db.session.query(func.count(WorkHourData.id), func.sum(WorkHourData.work_hours),
+                             func.sum(WorkHourData.overtime_hours))
+    if project_id:
+        query = query.filter(WorkHourData.project_id == project_id)
+    if start:
+        query = query.filter(WorkHourData.start_time >= start, WorkHourData.end_time <= end)
+    return tuple(query.first())
+
+
+def _rollup_totals(project_id, start, end, by_user=True):
+    source = rollup_source(lambda c: [c.project_id == project_id] if project_id else [], start, end, by_user)
+    return tuple(db.session.query(func.sum(source.c.row_count), func.sum(source.c.work_hours),
+                                  func.sum(source.c.overtime_hours)).first())
+
+
+def main():
+    sizes = parse_sizes([52, 104])
+    first_monday = date(2025, 1, 6)
+    for weeks in sizes:
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                users = _seed(weeks)
+                rows = WorkHourData.query.count()
+                print(f'{rows} 条工时（{USERS} 人 × {weeks} 周）：')
+                with timed('全量生成周汇总'):
+                    refresh_rollups(users)
+                    db.session.commit()
+
+                # 全员新增一周工单（相当于导入一批）后重算汇总
+                records = _records(weekly_orders(USERS, 1, start=first_monday + timedelta(weeks=weeks), seed=1),
+                                   random.Random(1))
+                bulk_insert_records(records)
+                db.session.flush()
+                with timed('新增一周：按员工整体重算（旧）'):
+                    refresh_rollups({r['user_name'] for r in records})
+                expected_rows = _rollup_rows()
+                db.session.rollback()
+                bulk_insert_records(records)
+                with timed('新增一周：按 (员工, 周) 重算（新）'):
+                    refresh_rollup_weeks((r['user_name'], r['start_time']) for r in records)
+                assert _rollup_rows() == expected_rows
+                db.session.rollback()
+
+                last_day = first_monday + timedelta(weeks=weeks) - timedelta(days=1)
+                cases = [
+                    ('全量', None, None, None),
+                    ('非整周日期范围', None, first_monday + timedelta(days=9), last_day - timedelta(days=12)),
+                    ('单项目 + 日期范围', 17, first_monday + timedelta(days=9), last_day - timedelta(days=12)),
+                ]
+                for label, project_id, start, end in cases:
+                    with timed(f'{label} 明细表'):
+                        expected = _detail_totals(project_id, start, end)
+                    with timed(f'{label} 周汇总'):
+                        actual = _rollup_totals(project_id, start, end)
+                    assert actual == expected, (label, actual, expected)
+                    with timed(f'{label} 项目周汇总'):
+                        actual = _rollup_totals(project_id, start, end, by_user=False)
+                    assert actual == expected, (label, actual, expected)
+        finally:
+            cleanup(db_path)
+
+
+if __name__ == '__main__':
+    main()
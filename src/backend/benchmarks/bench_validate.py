@@ -0,0 +1,73 @@
+"""
+导入行验证基准：iterrows + validate_work_hour_row（旧） vs validate_work_hour_frame（新）。
+
+合成数据中约 5% 的行带有空字段、非法审批状态、非法时长或非法日期，
+两种实现的错误列表必须完全一致。
+
+用法：
+    python -m benchmarks.bench_validate --sizes 50000
+"""
+import random
+
+import numpy as np
+import pandas as pd
+
+from app.utils.helpers import validate_work_hour_row, validate_work_hour_frame
+from benchmarks.common import parse_sizes, timed
+
+REQUIRED_FIELDS = ['序号', '创建人', '开始时间', '结束时间', '审批结果', '审批状态']
+
+
+def _make_frame(rows, seed=0):
+    rnd = random.Random(seed)
+    data = {
+        '序号': [str(i) for i in range(rows)],
+        '创建人': [f'员工{i % 400:03d}' for i in range(rows)],
+        '开始时间': ['2025-03-03 00:00:00'] * rows,
+        '结束时间': ['2025-03-09'] * rows,
+        '审批结果': ['通过'] * rows,
+        '审批状态': ['已完成'] * rows,
+        '项目交付-工作时长': [rnd.choice([8, 16, 40, '', None]) for _ in range(rows)],
+        '项目交付-加班时长': [rnd.choice([0, 2, '', np.nan]) for _ in range(rows)],
+    }
+    df = pd.DataFrame(data)
+    for i in rnd.sample(range(rows), rows // 20):
+        col, value = rnd.choice([
+            ('创建人', None), ('审批结果', '拒绝'), ('审批状态', '审批中'),
+            ('项目交付-工作时长', -1), ('项目交付-工作时长', 200), ('项目交付-工作时长', 'abc'),
+            ('项目交付-加班时长', -2), ('开始时间', '2025-13-45'), ('结束时间', '下周'),
+        ])
+        df.at[i, col] = value
+    return df
+
+
+def _legacy(df):
+    errors = []
+    for idx, row in df.iterrows():
+        is_valid, error_list = validate_work_hour_row(row, REQUIRED_FIELDS)
+        if not is_valid:
+            for item in error_list:
+                errors.append({'row': idx + 2, 'field': item['field'], 'error': item['error']})
+            continue
+        try:
+            pd.to_datetime(str(row['开始时间']).strip()).date()
+            pd.to_datetime(str(row['结束时间']).strip()).date()
+        except Exception:
+            errors.append({'row': idx + 2, 'field': '开始时间', 'error': '时间格式错误'})
+    return errors
+
+
+def main():
+    for rows in parse_sizes([50000]):
+        df = _make_frame(rows)
+        print(f'{rows} 行：')
+        with timed('iterrows + validate_work_hour_row（旧）'):
+            legacy = _legacy(df)
+        with timed('validate_work_hour_frame（新）'):
+            _, columnar, _, _ = validate_work_hour_frame(df, REQUIRED_FIELDS)
+        assert legacy == columnar, '错误列表不一致'
+        print(f'  错误条数 {len(columnar)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+基准脚本公共工具：临时数据库应用、合成数据、计时。
+
+用法（在 src/backend 目录下）：
+    python -m benchmarks.<脚本名> [--sizes 1000,10000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from config import Config
+
+WORK_TYPES = ['project_delivery', 'product_research', 'presales_support', 'dept_internal']
+DEPTS = ['项目交付部', '技术支持部', '开发组', '产品设计组', '项目管理部']
+
+
+def make_app():
+    """创建使用临时 SQLite 文件的应用实例，返回 (app, db_path)"""
+    fd, db_path = tempfile.mkstemp(suffix='.db', prefix='bench_')
+    os.close(fd)
+    os.remove(db_path)  # 由 db.create_all() 新建
+
+    class BenchConfig(Config):
+        DATABASE_PATH = db_path
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        TESTING = True
+
+    from app import create_app
+    return create_app(BenchConfig), db_path
+
+
+def cleanup(db_path):
+    for suffix in ('', '-journal', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+
+def weekly_orders(user_count, weeks, start=date(2025, 1, 6), seed=0):
+    """合成每人每周一张工单：[(serial_no, user_name, dept_name, start, end), ...]"""
+    rnd = random.Random(seed)
+    orders = []
+    serial = 1
+    for u in range(user_count):
+        user = f'员工{u:05d}'
+        dept = DEPTS[u % len(DEPTS)]
+        for w in range(weeks):
+            if rnd.random() < 0.05:
+                continue  # 漏交
+            monday = start + timedelta(weeks=w)
+            end = monday + timedelta(days=6)
+            if rnd.random() < 0.03:
+                end += timedelta(days=3)  # 与下周重叠
+            orders.append((str(serial), user, dept, monday, end))
+            serial += 1
+    return orders
+
+
+def parse_sizes(default):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default=','.join(str(s) for s in default),
+                        help='逗号分隔的数据规模')
+    args = parser.parse_args()
+    return [int(s) for s in args.sizes.split(',') if s]
+
+
+@contextmanager
+def timed(label, results=None):
+    begin = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - begin
+    print(f'  {label:<40s} {elapsed * 1000:10.1f} ms')
+    if results is not None:
+        results[label] = elapsed
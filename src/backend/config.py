@@ -22,9 +22,14 @@ class Config:
 
     # 文件上传配置
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'instance/uploads'
-    MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB
+    REPORT_FOLDER = os.environ.get('REPORT_FOLDER') or 'instance/reports'  # 核对结果导出文件目录
+    # 请求体上限：分块导入允许大文件，普通导入受 sys_config 的 import.max_file_size 限制
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', '100')) * 1024 * 1024  # MB
     ALLOWED_EXTENSIONS = {'xls', 'xlsx'}
     MAX_IMPORT_ROWS = 1000
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '1000'))  # 分块导入每块行数（sys_config 未配置时兜底）
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', '2'))  # 每个 web 进程的后台导入线程数
+    IMPORT_STALE_MINUTES = int(os.environ.get('IMPORT_STALE_MINUTES', '30'))  # 未完成的导入超过该时长无进度视为已中断
 
     # 分页配置
     DEFAULT_PAGE_SIZE = 20
@@ -39,6 +44,8 @@ class Config:
 
     # 工时核对规则配置
     INTEGRITY_DEFAULT_WORKDAYS = [1, 2, 3, 4, 5]  # 周一到周五
+    INTEGRITY_WORKERS = int(os.environ.get('INTEGRITY_WORKERS', '1'))  # 完整性检查计算进程数，1 表示在请求进程内计算
+    INTEGRITY_PARALLEL_MIN_USERS = int(os.environ.get('INTEGRITY_PARALLEL_MIN_USERS', '500'))  # 待计算员工数达到此值才启用多进程
     COMPLIANCE_STANDARD_HOURS = 8
     COMPLIANCE_MIN_HOURS = 4
     COMPLIANCE_MAX_OVERTIME = 4
@@ -204,6 +204,26 @@ export const getImportDetail = (batchNo) => {
   return request.get(`/import/record/${batchNo}`)
 }
 
+// 查询后台导入进度
+export const getImportProgress = (batchNo) => {
+  if (MOCK_MODE) {
+    return Promise.resolve({
+      code: 200,
+      message: '操作成功',
+      data: { batchNo, importStatus: 'success', totalRows: 100, processedRows: 100, successRows: 95, repeatRows: 3, invalidRows: 2, errors: [] }
+    })
+  }
+  return request.get(`/import/record/${batchNo}/progress`)
+}
+
+// 续传失败的导入（async 为 true 时在后台续传）
+export const resumeImport = (batchNo, async = true) => {
+  if (MOCK_MODE) {
+    return Promise.resolve({ code: 200, message: '导入任务已提交', data: { batchNo, importStatus: 'queued' } })
+  }
+  return request.post(`/import/record/${batchNo}/resume`, null, { params: { async } })
+}
+
 // 下载原始文件
 export const downloadImportReport = (batchNo) => {
   if (MOCK_MODE) {
@@ -575,8 +595,8 @@ export const getCheckHistory = (params) => {
   return request.get('/check/history', { params })
 }
 
-// 获取核对详情
-export const getCheckDetail = (checkNo) => {
+// 获取核对详情（params: page, size, userName, issueType，明细服务端分页）
+export const getCheckDetail = (checkNo, params = {}) => {
   if (MOCK_MODE) {
     // 根据批次号返回不同的模拟数据
     const isIntegrity = checkNo.includes('0001') || checkNo.includes('0003')
@@ -674,16 +694,17 @@ export const getCheckDetail = (checkNo) => {
       })
     }
   }
-  return request.get(`/check/record/${checkNo}`)
+  return request.get(`/check/record/${checkNo}`, { params })
 }
 
-// 下载核对报告
-export const downloadCheckReport = (checkNo) => {
+// 下载核对报告（format: xlsx / csv，导出全部详情）
+export const downloadCheckReport = (checkNo, format = 'xlsx') => {
   if (MOCK_MODE) {
     ElMessage.info('模拟下载报告: ' + checkNo)
     return Promise.resolve()
   }
-  return request.get(`/check/record/${checkNo}/report`, {
+  return request.get(`/check/record/${checkNo}/export`, {
+    params: { format },
     responseType: 'blob'
   })
 }